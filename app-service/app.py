@@ -18,6 +18,7 @@ from sqlalchemy import create_engine
 from api.TheoremQueue import TheoremQueue
 from controller.ProofSearchController import ProofSearchController
 from domain.EasyLogger import EasyLogger
+from domain.lean.CachingLeanEvaluator import CachingLeanEvaluator
 from domain.lean.LeanInteractFacade import LeanInteractFacade
 from domain.lean.MockLeanExecutor import MockLeanExecutor
 from exception.LeanException import LeanException
@@ -146,7 +147,11 @@ def initialize():
         lean_interact_facade = MockLeanExecutor()
     else:
         # lean_interact_facade = MockLeanExecutor()
-        lean_interact_facade = LeanInteractFacade(test_mode=is_test_mode)
+        lean_interact_facade = LeanInteractFacade(
+            test_mode=is_test_mode,
+            environment_snapshot_directory=os.getenv("LEAN_ENVIRONMENT_SNAPSHOT_DIRECTORY")
+        )
+        lean_interact_facade = CachingLeanEvaluator(lean_interact_facade, lean_interact_facade)
 
     sqs_client = boto3.client(
         'sqs',
@@ -161,6 +166,9 @@ def initialize():
                             os.environ['AWS_RDS_PORT'], os.environ['AWS_RDS_DB_NAME'])
     db_engine = create_engine(db_url, pool_pre_ping=True)
     theorem_repository = TheoremRepository(db_engine, EasyLogger())
+    theorem_repository.upgrade_proof_table()
+    theorem_repository.upgrade_formalization_table()
+    theorem_repository.upgrade_language_model_table()
 
     theorem_proving_service = TheoremProvingService(
         lean_interact_facade,
@@ -271,6 +279,12 @@ def get_proof_history():
     return jsonify({"error": "Bad request"}), 400
 
 
+@app.route('/proof/cache_statistics', methods=['GET'])
+@requires_auth
+def get_proof_cache_statistics():
+    return jsonify(proof_search_controller.handle_get_proof_cache_statistics()), 200
+
+
 @app.route('/language_model', methods=['GET'])
 @requires_auth
 def language_model():
@@ -18,7 +18,7 @@ class ProofSearchController:
         if not self.__theorem_proving_service.is_language_model_available(model_short_name):
             raise NotFoundClientRequestException()
 
-        theorem = LeanUtilities.extract_theorem_statement(theorem)
+        theorem = LeanUtilities.extract_theorem_statement_with_header(theorem)
         if theorem is None:
             raise NotFoundClientRequestException("No theorem in the Lean code")
         is_code_valid, lean_error = self.__theorem_proving_service.is_lean_code_error_free(theorem)
@@ -80,6 +80,11 @@ class ProofSearchController:
         return proof_id
 
 
+    def handle_get_proof_cache_statistics(self) -> dict:
+        proof_cache_statistics = self.__theorem_proving_service.get_proof_cache_statistics()
+        return {"hits": proof_cache_statistics.hits, "misses": proof_cache_statistics.misses}
+
+
     def handle_get_proof_history(self, user_id: int) -> (bool, int):
         self.__logger.debug(f"Getting proof history for user {user_id}")
         proof_history = self.__theorem_proving_service.get_proof_history(user_id)
@@ -3,6 +3,7 @@ from unittest.mock import MagicMock
 
 from controller.ProofSearchController import ProofSearchController
 from exception.NotFoundClientRequestException import NotFoundClientRequestException
+from service.ProofCacheStatistics import ProofCacheStatistics
 from service.TheoremProvingService import TheoremProvingService
 
 
@@ -53,4 +54,9 @@ class TestProofSearchController(TestCase):
         actual_successful, actual_proof = self.proof_search_controller.handle_get_proof(12, "abc")
 
         self.assertEqual(expected_successful, expected_successful)
-        self.assertEqual(expected_proof, actual_proof)
\ No newline at end of file
+        self.assertEqual(expected_proof, actual_proof)
+
+    def test_handle_get_proof_cache_statistics_returns_hits_and_misses(self):
+        self.theorem_proving_service.get_proof_cache_statistics.return_value = ProofCacheStatistics(3, 4)
+
+        self.assertEqual({"hits": 3, "misses": 4}, self.proof_search_controller.handle_get_proof_cache_statistics())
@@ -0,0 +1,7 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class ProofCacheStatistics:
+    hits: int
+    misses: int
@@ -1,12 +1,16 @@
+import hashlib
+
 from lean_interact.interface import LeanError
 
 from api.TheoremQueue import TheoremQueue
 from domain.EasyLogger import EasyLogger
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanUtilities import LeanUtilities
 from dto.client.ProofClientDto import ProofClientDto
 from repository import TheoremRepository
 from repository.orm.Entities import ProofEntity
+from service.ProofCacheStatistics import ProofCacheStatistics
 
 
 class TheoremProvingService:
@@ -23,6 +27,8 @@ class TheoremProvingService:
         self.__theorem_queue = theorem_queue
         self.__theorem_repository: TheoremRepository = theorem_repository
         self.__logger = logger
+        self.__proof_cache_hits = 0
+        self.__proof_cache_misses = 0
 
     def is_language_model_available(self, language_model_name: str):
         return self.__theorem_repository.is_language_model_available(language_model_name)
@@ -37,7 +43,22 @@ class TheoremProvingService:
         return True, ""
 
     def send_proof_request(self, theorem: str, model: str, user_id: str):
-        proof_id = self.__theorem_repository.add_incomplete_proof(theorem, user_id, False)
+        """
+        If the same model already proved the same (normalized) statement, the new proof is completed right away.
+        Otherwise, the proof request is sent to the queue.
+        """
+        normalized_statement_hash = TheoremProvingService.__hash_theorem_statement(theorem)
+
+        cached_formal_proof = self.__find_cached_formal_proof(theorem, model, normalized_statement_hash)
+        if cached_formal_proof is not None:
+            self.__proof_cache_hits += 1
+            self.__logger.debug("Found an existing proof for the theorem. Will not send it to the queue.")
+            return self.__theorem_repository.add_complete_proof(theorem, user_id, model, normalized_statement_hash,
+                                                                cached_formal_proof)
+        self.__proof_cache_misses += 1
+
+        proof_id = self.__theorem_repository.add_incomplete_proof(theorem, user_id, False, model,
+                                                                  normalized_statement_hash)
         self.__theorem_queue.send_proof_request(theorem, proof_id, model)
         return proof_id
 
@@ -67,6 +88,9 @@ class TheoremProvingService:
 
         return informal_proof, proof.successful, formalized_theorem, proof.formal_proof
 
+    def get_proof_cache_statistics(self) -> ProofCacheStatistics:
+        return ProofCacheStatistics(self.__proof_cache_hits, self.__proof_cache_misses)
+
     def get_language_model_names(self) -> list[str]:
         return [model.model_name for model in self.__theorem_repository.get_language_models()]
 
@@ -81,3 +105,14 @@ class TheoremProvingService:
                 )
             )
         return proof_dtos
+
+    def __find_cached_formal_proof(self, theorem: str, model: str, normalized_statement_hash: str) -> str | None:
+        cached_proof: ProofEntity = self.__theorem_repository.find_successful_proof(normalized_statement_hash, model)
+        if cached_proof is None or not cached_proof.formal_proof.startswith(cached_proof.original_theorem_statement):
+            return None
+        # the cached statement may differ in whitespace or name, so only its tactics are reused
+        return theorem + cached_proof.formal_proof[len(cached_proof.original_theorem_statement):]
+
+    @staticmethod
+    def __hash_theorem_statement(theorem: str) -> str:
+        return hashlib.sha256(LeanUtilities.normalize_theorem_statement(theorem).encode()).hexdigest()
@@ -1,5 +1,5 @@
 from unittest import TestCase
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, ANY
 
 from api.TheoremQueue import TheoremQueue
 from domain.EasyLogger import EasyLogger
@@ -37,12 +37,43 @@ class TestTheoremProvingService(TestCase):
         user_id = "user-id"
 
         expected_proof_id = 12
+        self.mock_repository.find_successful_proof.return_value = None
         self.mock_repository.add_incomplete_proof.return_value = expected_proof_id
         actual_proof_id = self.theorem_proving_service.send_proof_request(theorem, model, user_id)
 
-        self.mock_repository.add_incomplete_proof.assert_called_with(theorem, user_id, False)
+        self.mock_repository.add_incomplete_proof.assert_called_with(theorem, user_id, False, model, ANY)
         self.mock_theorem_queue.send_proof_request.assert_called_with(theorem, expected_proof_id, model)
         self.assertEqual(expected_proof_id, actual_proof_id)
+        self.assertEqual(1, self.theorem_proving_service.get_proof_cache_statistics().misses)
+
+    def test_send_proof_request_completes_proof_without_queue_if_statement_was_already_proved(self):
+        theorem = "theorem new_name : 1 + 1 = 2 := by"
+        model = "model-name"
+        user_id = "user-id"
+
+        expected_proof_id = 13
+        self.mock_repository.find_successful_proof.return_value = ProofEntity(
+            original_theorem_statement="theorem old_name :  1 + 1 = 2 := by",
+            formal_proof="theorem old_name :  1 + 1 = 2 := by\nnorm_num",
+            successful=True
+        )
+        self.mock_repository.add_complete_proof.return_value = expected_proof_id
+        actual_proof_id = self.theorem_proving_service.send_proof_request(theorem, model, user_id)
+
+        self.assertEqual(expected_proof_id, actual_proof_id)
+        self.mock_repository.add_complete_proof.assert_called_once_with(theorem, user_id, model, ANY,
+                                                                        theorem + "\nnorm_num")
+        self.mock_theorem_queue.send_proof_request.assert_not_called()
+        self.assertEqual(1, self.theorem_proving_service.get_proof_cache_statistics().hits)
+
+    def test_send_proof_request_uses_same_hash_for_statements_differing_in_whitespace_and_name(self):
+        self.mock_repository.find_successful_proof.return_value = None
+
+        self.theorem_proving_service.send_proof_request("theorem a : 1 + 1 = 2 := by", "model-name", "user-id")
+        self.theorem_proving_service.send_proof_request("theorem b :  1 + 1 = 2\n := by", "model-name", "user-id")
+
+        first_hash, second_hash = [call.args[0] for call in self.mock_repository.find_successful_proof.call_args_list]
+        self.assertEqual(first_hash, second_hash)
 
     def test_send_informal_proof_request_adds_to_queue_and_returns_proof_id(self):
         theorem = "prove that $1+1=2$"
@@ -1,10 +1,13 @@
 import json
+import time
 
 from botocore.client import BaseClient
 
 from domain.EasyLogger import EasyLogger
 from domain.lean.LeanUtilities import LeanUtilities
+from service.FormalizationCache import FormalizationCache
 from service.ProofSearchService import ProofSearchService
+from service.ProofSearchTrace import ProofSearchTrace
 from repository.TheoremRepository import TheoremRepository
 
 IS_FILL_KEY = "is_fill"
@@ -21,6 +24,10 @@ MESSAGE_RECEIPT_HANDLE_KEY = "ReceiptHandle"
 
 MESSAGE_BODY_KEY = "Body"
 
+MESSAGE_ATTRIBUTES_KEY = "Attributes"
+
+SENT_TIMESTAMP_ATTRIBUTE = "SentTimestamp"
+
 QUEUE_RESPONSE_MESSAGE_KEY = "Messages"
 
 
@@ -37,73 +44,100 @@ class TheoremQueueListener:
 
     def listen(self):
         while True:
-            queue_response = self.__sqs_client.receive_message(
-                QueueUrl=self.__sqs_url,
-                MaxNumberOfMessages=1,
-                WaitTimeSeconds=20
+            self.handle_next_message()
+
+    def handle_next_message(self) -> bool:
+        """
+        Waits for one proof request on the queue and runs its proof search.
+        Returns False if no message arrived before the long polling timeout.
+        """
+        queue_response = self.__sqs_client.receive_message(
+            QueueUrl=self.__sqs_url,
+            MaxNumberOfMessages=1,
+            WaitTimeSeconds=20,
+            AttributeNames=[SENT_TIMESTAMP_ATTRIBUTE]
+        )
+        if QUEUE_RESPONSE_MESSAGE_KEY not in queue_response:
+            self.__logger.debug("No messages in queue yet.")
+            return False
+        message = queue_response[QUEUE_RESPONSE_MESSAGE_KEY][0][MESSAGE_BODY_KEY]
+        receipt_handle = queue_response[QUEUE_RESPONSE_MESSAGE_KEY][0][MESSAGE_RECEIPT_HANDLE_KEY]
+        self.__logger.debug(f"Message received on SQS: {message}")
+
+        trace = ProofSearchTrace()
+        sent_timestamp = queue_response[QUEUE_RESPONSE_MESSAGE_KEY][0].get(MESSAGE_ATTRIBUTES_KEY, dict()).get(
+            SENT_TIMESTAMP_ATTRIBUTE)
+        if sent_timestamp is not None:
+            trace.add_time(ProofSearchTrace.QUEUE_WAIT, max(0.0, time.time() - int(sent_timestamp) / 1000))
+
+        self.__sqs_client.delete_message(
+            QueueUrl=self.__sqs_url,
+            ReceiptHandle=receipt_handle
+        )
+        self.__logger.debug(f"Message deleted from SQS: {receipt_handle}")
+
+        message_json = json.loads(message)
+        theorem = message_json[THEOREM_KEY]
+        model_short_name = message_json[MODEL_KEY]
+        proof_id = int(message_json[PROOF_ID_KEY])
+        is_informal = bool(message_json[IS_INFORMAL_KEY])
+        is_fill = bool(message_json[IS_FILL_KEY])
+
+        self.__logger.debug(f"Will begin proof search for proof {proof_id}")
+        if is_informal:
+            informal_proof_search_result = self.__proof_search_service.search_informal_proof(
+                theorem,
+                model_short_name,
+                trace
+            )
+            statement_formalization_id = self.__theorem_repository.add_formalization(
+                theorem,
+                informal_proof_search_result.formal_theorem,
+                FormalizationCache.build_text_hash(theorem),
+                FormalizationCache.build_text_hash(informal_proof_search_result.formal_theorem)
+            )
+            proof_deformalization_id = self.__theorem_repository.add_formalization(
+                informal_proof_search_result.informal_proof,
+                informal_proof_search_result.formal_proof,
+                FormalizationCache.build_text_hash(informal_proof_search_result.informal_proof),
+                FormalizationCache.build_text_hash(informal_proof_search_result.formal_proof),
+                is_proof=True
+            )
+
+            self.__theorem_repository.update_complete_informal_proof(
+                proof_id,
+                informal_proof_search_result,
+                statement_formalization_id,
+                proof_deformalization_id,
+                theorem,
+                trace.to_json()
+            )
+        elif is_fill:
+            proof, successful = self.__proof_search_service.search_proof(
+                theorem,
+                model_short_name,
+                trace
+            )
+            self.__theorem_repository.update_complete_proof(
+                proof_id,
+                proof,
+                successful,
+                trace.to_json()
+            )
+        else:
+            theorem = LeanUtilities.extract_theorem_statement_with_header(theorem)
+            self.__logger.info(f"Cleaned theorem statement: {theorem}")
+
+            proof, successful = self.__proof_search_service.search_proof(
+                theorem,
+                model_short_name,
+                trace
             )
-            if QUEUE_RESPONSE_MESSAGE_KEY not in queue_response:
-                self.__logger.debug("No messages in queue yet.")
-                continue
-            message = queue_response[QUEUE_RESPONSE_MESSAGE_KEY][0][MESSAGE_BODY_KEY]
-            receipt_handle = queue_response[QUEUE_RESPONSE_MESSAGE_KEY][0][MESSAGE_RECEIPT_HANDLE_KEY]
-            self.__logger.debug(f"Message received on SQS: {message}")
-
-            self.__sqs_client.delete_message(
-                QueueUrl=self.__sqs_url,
-                ReceiptHandle=receipt_handle
+            self.__theorem_repository.update_complete_proof(
+                proof_id,
+                proof,
+                successful,
+                trace.to_json()
             )
-            self.__logger.debug(f"Message deleted from SQS: {receipt_handle}")
-
-            message_json = json.loads(message)
-            theorem = message_json[THEOREM_KEY]
-            model_short_name = message_json[MODEL_KEY]
-            proof_id = int(message_json[PROOF_ID_KEY])
-            is_informal = bool(message_json[IS_INFORMAL_KEY])
-            is_fill = bool(message_json[IS_FILL_KEY])
-
-            self.__logger.debug(f"Will begin proof search for proof {proof_id}")
-            if is_informal:
-                informal_proof_search_result = self.__proof_search_service.search_informal_proof(
-                    theorem,
-                    model_short_name
-                )
-                statement_formalization_id = self.__theorem_repository.add_formalization(
-                    theorem,
-                    informal_proof_search_result.formal_theorem
-                )
-                proof_deformalization_id = self.__theorem_repository.add_formalization(
-                    informal_proof_search_result.informal_proof,
-                    informal_proof_search_result.formal_proof
-                )
-
-                self.__theorem_repository.update_complete_informal_proof(
-                    proof_id,
-                    informal_proof_search_result,
-                    statement_formalization_id,
-                    proof_deformalization_id,
-                    theorem
-                )
-            elif is_fill:
-                proof, successful = self.__proof_search_service.search_proof(
-                    theorem,
-                    model_short_name
-                )
-                self.__theorem_repository.update_complete_proof(
-                    proof_id,
-                    proof,
-                    successful
-                )
-            else:
-                theorem = LeanUtilities.extract_theorem_statement(theorem)
-                self.__logger.info(f"Cleaned theorem statement: {theorem}")
-
-                proof, successful = self.__proof_search_service.search_proof(
-                    theorem,
-                    model_short_name
-                )
-                self.__theorem_repository.update_complete_proof(
-                    proof_id,
-                    proof,
-                    successful
-                )
+        self.__logger.info(f"Search summary for proof {proof_id}: {trace.get_summary()}")
+        return True
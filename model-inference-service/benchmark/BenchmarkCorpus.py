@@ -0,0 +1,25 @@
+from benchmark.BenchmarkTheorem import BenchmarkTheorem
+
+BENCHMARK_THEOREMS = [
+    BenchmarkTheorem("theorem benchmark_add_one (x : ℕ) (h : x = 2 * 3) : x + 1 = 7 := by", ["subst h", "norm_num"]),
+    BenchmarkTheorem("theorem benchmark_mul_comm (a b : ℕ) : a * b = b * a := by", ["ring"]),
+    BenchmarkTheorem("theorem benchmark_sq_nonneg (x : ℝ) : 0 ≤ x ^ 2 := by", ["positivity"]),
+    BenchmarkTheorem("theorem benchmark_lt_trans (a b c : ℕ) (h₁ : a < b) (h₂ : b < c) : a < c := by",
+                     ["exact lt_trans h₁ h₂"]),
+    BenchmarkTheorem("theorem benchmark_two_mul (n : ℕ) : 2 * n = n + n := by", ["ring"]),
+    BenchmarkTheorem("theorem benchmark_even_add (m n : ℕ) (hm : Even m) (hn : Even n) : Even (m + n) := by",
+                     ["obtain ⟨a, rfl⟩ := hm", "obtain ⟨b, rfl⟩ := hn", "exact ⟨a + b, by ring⟩"]),
+    BenchmarkTheorem("theorem benchmark_abs_nonneg (x : ℤ) : 0 ≤ |x| := by", ["exact abs_nonneg x"]),
+    BenchmarkTheorem("theorem benchmark_linear (x : ℝ) (h : 3 * x + 2 = 11) : x = 3 := by", ["linarith"]),
+    BenchmarkTheorem("theorem benchmark_dvd_refl (n : ℕ) : n ∣ n := by", ["exact dvd_refl n"]),
+    BenchmarkTheorem("theorem benchmark_succ_pos (n : ℕ) : 0 < n + 1 := by", ["omega"]),
+    BenchmarkTheorem("theorem benchmark_and_comm (p q : Prop) (h : p ∧ q) : q ∧ p := by",
+                     ["obtain ⟨hp, hq⟩ := h", "exact ⟨hq, hp⟩"]),
+    BenchmarkTheorem("theorem benchmark_sum_sq (a b : ℝ) : (a + b) ^ 2 = a ^ 2 + 2 * a * b + b ^ 2 := by", ["ring"]),
+    BenchmarkTheorem("theorem benchmark_le_antisymm (a b : ℕ) (h₁ : a ≤ b) (h₂ : b ≤ a) : a = b := by",
+                     ["exact le_antisymm h₁ h₂"]),
+    BenchmarkTheorem("theorem benchmark_min_le (a b : ℕ) : min a b ≤ a := by", ["exact min_le_left a b"]),
+    BenchmarkTheorem("theorem benchmark_sub_add (n : ℕ) (h : 1 ≤ n) : n - 1 + 1 = n := by",
+                     ["rw [Nat.sub_add_cancel h]"]),
+    BenchmarkTheorem("theorem benchmark_mod_two (n : ℕ) : n % 2 = 0 ∨ n % 2 = 1 := by", ["omega"]),
+]
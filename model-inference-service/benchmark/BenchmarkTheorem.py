@@ -0,0 +1,7 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BenchmarkTheorem:
+    statement: str
+    proof_tactics: list[str]
@@ -0,0 +1,28 @@
+import time
+import uuid
+from collections import deque
+
+
+class InMemorySqsClient:
+    """
+    The subset of the boto3 SQS client used by TheoremQueue and TheoremQueueListener, backed by a local deque.
+    """
+
+    def __init__(self):
+        self.__messages = deque()
+
+    def send_message(self, QueueUrl: str, MessageBody: str, **kwargs) -> dict:
+        self.__messages.append({
+            "Body": MessageBody,
+            "ReceiptHandle": str(uuid.uuid4()),
+            "Attributes": {"SentTimestamp": str(int(time.time() * 1000))}
+        })
+        return dict()
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, **kwargs) -> dict:
+        if not self.__messages:
+            return dict()
+        return {"Messages": [self.__messages[0]]}
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str):
+        self.__messages = deque(message for message in self.__messages if message["ReceiptHandle"] != ReceiptHandle)
@@ -0,0 +1,98 @@
+import time
+from typing import Callable
+
+import torch
+
+from benchmark.PrecisionCalibrationResult import PrecisionCalibrationResult
+from domain.EasyLogger import EasyLogger
+from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+from domain.language_model.model_factory.ModelPrecision import FP32_PRECISION
+from domain.lean.LeanUtilities import GOAL_PROOFSTEP_FORMAT
+
+DEFAULT_CALIBRATION_GOALS = [
+    GOAL_PROOFSTEP_FORMAT.format("x : ℕ\nh : x = 2 * 3\n⊢ x + 1 = 7"),
+    GOAL_PROOFSTEP_FORMAT.format("a b : ℝ\nhab : a < b\n⊢ a + 1 < b + 1"),
+    GOAL_PROOFSTEP_FORMAT.format("n : ℕ\n⊢ n + 0 = n"),
+    GOAL_PROOFSTEP_FORMAT.format("p q : Prop\nhp : p\nhq : q\n⊢ p ∧ q"),
+    GOAL_PROOFSTEP_FORMAT.format("m n : ℕ\nh : Nat.Coprime m n\n⊢ Nat.gcd m n = 1"),
+    GOAL_PROOFSTEP_FORMAT.format("x : ℝ\nhx : 0 ≤ x\n⊢ 0 ≤ x ^ 2 + x"),
+]
+DEFAULT_SCORE_TOLERANCE = 0.5
+CALIBRATION_SEED = 0
+
+
+class PrecisionCalibration:
+    """
+    Compares the precisions of a model. Every precision samples tactics for the same goals with the same seed,
+    which measures its generation throughput. The top tactic of every goal under the reference precision is
+    then scored by every precision, and a precision passes when those scores stay within score_tolerance
+    of the reference scores.
+    """
+
+    def __init__(
+            self,
+            load_language_model: Callable[[str], ProofSearchLanguageModel],
+            count_tokens: Callable[[str], int],
+            goals: list[str],
+            number_of_tactics: int,
+            score_tolerance: float = DEFAULT_SCORE_TOLERANCE,
+            reference_precision: str = FP32_PRECISION
+    ):
+        self.__logger = EasyLogger()
+        self.__load_language_model = load_language_model
+        self.__count_tokens = count_tokens
+        self.__goals = goals
+        self.__number_of_tactics = number_of_tactics
+        self.__score_tolerance = score_tolerance
+        self.__reference_precision = reference_precision
+
+    def run(self, precisions: list[str]) -> list[PrecisionCalibrationResult]:
+        precisions = [self.__reference_precision] + [precision for precision in precisions
+                                                     if precision != self.__reference_precision]
+        top_tactics = None
+        reference_scores = None
+        results = []
+        for precision in precisions:
+            start_time = time.perf_counter()
+            language_model = self.__load_language_model(precision)
+            load_seconds = time.perf_counter() - start_time
+
+            generated_tokens, generation_seconds, tactics_per_goal, scores_per_goal = self.__generate(language_model)
+            if top_tactics is None:
+                top_tactics = [tactics[scores.index(max(scores))] if tactics else ""
+                               for tactics, scores in zip(tactics_per_goal, scores_per_goal)]
+            top_tactic_scores = [language_model.get_tactic_scores(goal, [top_tactic])[0]
+                                 for goal, top_tactic in zip(self.__goals, top_tactics)]
+            if reference_scores is None:
+                reference_scores = top_tactic_scores
+
+            maximum_score_difference = max((abs(score - reference_score)
+                                            for score, reference_score in zip(top_tactic_scores, reference_scores)),
+                                           default=0.0)
+            result = PrecisionCalibrationResult(
+                precision,
+                load_seconds,
+                generated_tokens,
+                generation_seconds,
+                generated_tokens / generation_seconds if generation_seconds > 0 else 0.0,
+                maximum_score_difference,
+                maximum_score_difference <= self.__score_tolerance
+            )
+            self.__logger.info(f"Precision calibration result: {result}")
+            results.append(result)
+            del language_model
+        return results
+
+    def __generate(self, language_model: ProofSearchLanguageModel) \
+            -> tuple[int, float, list[list[str]], list[list[float]]]:
+        torch.manual_seed(CALIBRATION_SEED)
+        tactics_per_goal = []
+        scores_per_goal = []
+        start_time = time.perf_counter()
+        for goal in self.__goals:
+            tactics, scores = language_model.get_several_next_tactics(goal, self.__number_of_tactics)
+            tactics_per_goal.append(tactics)
+            scores_per_goal.append(scores)
+        generation_seconds = time.perf_counter() - start_time
+        generated_tokens = sum(self.__count_tokens(tactic) for tactics in tactics_per_goal for tactic in tactics)
+        return generated_tokens, generation_seconds, tactics_per_goal, scores_per_goal
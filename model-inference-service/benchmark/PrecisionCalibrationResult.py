@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class PrecisionCalibrationResult:
+    precision: str
+    load_seconds: float
+    generated_tokens: int
+    generation_seconds: float
+    tokens_per_second: float
+    # largest absolute difference to the reference precision of the score of a goal's top tactic
+    maximum_score_difference: float
+    within_tolerance: bool
@@ -0,0 +1,150 @@
+import json
+import math
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from TheoremQueueListener import TheoremQueueListener, THEOREM_KEY, PROOF_ID_KEY, MODEL_KEY, IS_INFORMAL_KEY, \
+    IS_FILL_KEY
+from benchmark.BenchmarkTheorem import BenchmarkTheorem
+from benchmark.InMemorySqsClient import InMemorySqsClient
+from benchmark.ProofSearchBenchmarkReport import ProofSearchBenchmarkReport
+from benchmark.StubModelAndPath import StubModelAndPath
+from benchmark.StubProofSearchLanguageModel import StubProofSearchLanguageModel
+from domain.EasyLogger import EasyLogger
+from domain.lean.DeterministicLeanExecutor import DeterministicLeanExecutor
+from repository.TheoremRepository import TheoremRepository
+from repository.orm.Entities import ProofEntity
+from service.ProofSearchService import ProofSearchService
+
+BENCHMARK_MODEL_SHORT_NAME = "benchmark"
+BENCHMARK_SQS_URL = "in-memory"
+BENCHMARK_USER_ID = "benchmark"
+
+
+class ProofSearchBenchmark:
+    """
+    Runs proof searches over a fixed corpus with a DeterministicLeanExecutor and a StubProofSearchLanguageModel,
+    so that the search loop can be measured without a GPU, network access or a Lean toolchain.
+    """
+
+    def __init__(
+            self,
+            benchmark_theorems: list[BenchmarkTheorem],
+            lean_evaluation_latency_seconds: float = 0.0,
+            generate_latency_seconds: float = 0.0,
+            generate_latency_seconds_per_goal: float = 0.0,
+            correct_tactic_percentage: int = 50,
+            frontier_batch_size: int = 1
+    ):
+        self.__benchmark_theorems = benchmark_theorems
+        self.__logger = EasyLogger()
+
+        statement_to_proof_tactics = {benchmark_theorem.statement: benchmark_theorem.proof_tactics
+                                      for benchmark_theorem in benchmark_theorems}
+        self.__lean_executor = DeterministicLeanExecutor(statement_to_proof_tactics, lean_evaluation_latency_seconds)
+        self.__language_model = StubProofSearchLanguageModel(statement_to_proof_tactics, correct_tactic_percentage,
+                                                             generate_latency_seconds,
+                                                             generate_latency_seconds_per_goal)
+        self.__proof_search_service = ProofSearchService(
+            None,
+            self.__lean_executor,
+            self.__lean_executor,
+            {BENCHMARK_MODEL_SHORT_NAME: StubModelAndPath(self.__language_model)},
+            "cpu",
+            frontier_batch_size
+        )
+
+    def run_proof_search(self) -> ProofSearchBenchmarkReport:
+        """
+        Calls ProofSearchService.search_proof directly for every theorem of the corpus.
+        """
+        latencies_seconds = []
+        number_of_proved_theorems = 0
+        initial_number_of_lean_evaluations = self.__lean_executor.get_number_of_evaluations()
+        initial_number_of_generate_calls = self.__language_model.get_number_of_generate_calls()
+        benchmark_start_time = time.perf_counter()
+        for benchmark_theorem in self.__benchmark_theorems:
+            start_time = time.perf_counter()
+            _, successful = self.__proof_search_service.search_proof(benchmark_theorem.statement,
+                                                                     BENCHMARK_MODEL_SHORT_NAME)
+            latencies_seconds.append(time.perf_counter() - start_time)
+            number_of_proved_theorems += successful
+        total_seconds = time.perf_counter() - benchmark_start_time
+        return self.__build_report(
+            latencies_seconds,
+            number_of_proved_theorems,
+            total_seconds,
+            self.__lean_executor.get_number_of_evaluations() - initial_number_of_lean_evaluations,
+            self.__language_model.get_number_of_generate_calls() - initial_number_of_generate_calls
+        )
+
+    def run_queue_listener(self) -> ProofSearchBenchmarkReport:
+        """
+        Sends every theorem of the corpus through an in-memory queue to a TheoremQueueListener, which stores the
+        proofs in an in-memory SQLite database. The latency of a theorem also includes the queue and database work.
+        """
+        db_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        ProofEntity.__table__.create(db_engine)
+        theorem_repository = TheoremRepository(db_engine, self.__logger)
+        sqs_client = InMemorySqsClient()
+        theorem_queue_listener = TheoremQueueListener(sqs_client, BENCHMARK_SQS_URL, self.__proof_search_service,
+                                                      theorem_repository, self.__logger)
+
+        latencies_seconds = []
+        number_of_proved_theorems = 0
+        initial_number_of_lean_evaluations = self.__lean_executor.get_number_of_evaluations()
+        initial_number_of_generate_calls = self.__language_model.get_number_of_generate_calls()
+        benchmark_start_time = time.perf_counter()
+        for benchmark_theorem in self.__benchmark_theorems:
+            start_time = time.perf_counter()
+            proof_id = theorem_repository.add_incomplete_proof(benchmark_theorem.statement, BENCHMARK_USER_ID, False)
+            sqs_client.send_message(
+                QueueUrl=BENCHMARK_SQS_URL,
+                MessageBody=json.dumps({THEOREM_KEY: benchmark_theorem.statement, PROOF_ID_KEY: proof_id,
+                                        MODEL_KEY: BENCHMARK_MODEL_SHORT_NAME, IS_INFORMAL_KEY: False,
+                                        IS_FILL_KEY: False})
+            )
+            theorem_queue_listener.handle_next_message()
+            latencies_seconds.append(time.perf_counter() - start_time)
+            number_of_proved_theorems += bool(theorem_repository.retrieve_proof(proof_id).successful)
+        total_seconds = time.perf_counter() - benchmark_start_time
+        return self.__build_report(
+            latencies_seconds,
+            number_of_proved_theorems,
+            total_seconds,
+            self.__lean_executor.get_number_of_evaluations() - initial_number_of_lean_evaluations,
+            self.__language_model.get_number_of_generate_calls() - initial_number_of_generate_calls
+        )
+
+    def __build_report(
+            self,
+            latencies_seconds: list[float],
+            number_of_proved_theorems: int,
+            total_seconds: float,
+            number_of_lean_evaluations: int,
+            number_of_generate_calls: int
+    ) -> ProofSearchBenchmarkReport:
+        number_of_theorems = len(latencies_seconds)
+        report = ProofSearchBenchmarkReport(
+            number_of_theorems,
+            number_of_proved_theorems,
+            total_seconds,
+            number_of_theorems / total_seconds if total_seconds > 0 else 0.0,
+            ProofSearchBenchmark.__percentile(latencies_seconds, 50),
+            ProofSearchBenchmark.__percentile(latencies_seconds, 95),
+            ProofSearchBenchmark.__percentile(latencies_seconds, 99),
+            number_of_lean_evaluations / max(number_of_theorems, 1),
+            number_of_generate_calls / max(number_of_theorems, 1)
+        )
+        self.__logger.info(f"Benchmark report: {report}")
+        return report
+
+    @staticmethod
+    def __percentile(values: list[float], percentile: int) -> float:
+        # nearest-rank percentile
+        if not values:
+            return 0.0
+        sorted_values = sorted(values)
+        return sorted_values[max(math.ceil(percentile / 100 * len(sorted_values)) - 1, 0)]
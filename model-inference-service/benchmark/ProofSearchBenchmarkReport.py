@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class ProofSearchBenchmarkReport:
+    number_of_theorems: int
+    number_of_proved_theorems: int
+    total_seconds: float
+    theorems_per_second: float
+    p50_latency_seconds: float
+    p95_latency_seconds: float
+    p99_latency_seconds: float
+    lean_evaluations_per_theorem: float
+    generate_calls_per_theorem: float
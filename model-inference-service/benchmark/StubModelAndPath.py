@@ -0,0 +1,17 @@
+from typing import override
+
+from benchmark.StubProofSearchLanguageModel import StubProofSearchLanguageModel
+from domain.language_model.model_configuration.IModelAndPath import IModelAndPath
+
+
+class StubModelAndPath(IModelAndPath):
+    def __init__(self, language_model: StubProofSearchLanguageModel):
+        self.__language_model = language_model
+
+    @override
+    def get_model_path(self) -> str:
+        return "stub"
+
+    @override
+    def get_language_model(self) -> StubProofSearchLanguageModel:
+        return self.__language_model
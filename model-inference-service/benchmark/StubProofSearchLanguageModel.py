@@ -0,0 +1,66 @@
+import time
+import zlib
+
+from domain.lean.DeterministicLeanExecutor import DeterministicLeanExecutor
+from domain.lean.LeanUtilities import GOAL_PROOFSTEP_FORMAT
+
+DISTRACTOR_TACTIC_FORMAT = "distractor_{}_{}"
+
+
+class StubProofSearchLanguageModel:
+    """
+    Stands in for ProofSearchLanguageModel in benchmarks. It knows the proofs of the DeterministicLeanExecutor, and
+    proposes the right next tactic in correct_tactic_percentage percent of the calls (decided by a hash, so runs are
+    reproducible). The remaining proposals are distractors. Every call sleeps like a generate call would.
+    """
+
+    def __init__(
+            self,
+            statement_to_proof_tactics: dict[str, list[str]],
+            correct_tactic_percentage: int = 50,
+            generate_latency_seconds: float = 0.0,
+            generate_latency_seconds_per_goal: float = 0.0
+    ):
+        self.__formatted_goal_to_next_tactic = {
+            GOAL_PROOFSTEP_FORMAT.format(DeterministicLeanExecutor.get_goal(statement, number_of_applied_tactics)):
+                proof_tactic
+            for statement, proof_tactics in statement_to_proof_tactics.items()
+            for number_of_applied_tactics, proof_tactic in enumerate(proof_tactics)
+        }
+        self.__correct_tactic_percentage = correct_tactic_percentage
+        self.__generate_latency_seconds = generate_latency_seconds
+        self.__generate_latency_seconds_per_goal = generate_latency_seconds_per_goal
+        self.__goal_to_number_of_calls = dict()
+        self.__number_of_generate_calls = 0
+
+    def get_several_next_tactics(self, goals: str, number_of_tactics: int) -> tuple[list[str], list[float]]:
+        tactics_per_goal, scores_per_goal = self.get_several_next_tactics_batch([goals], number_of_tactics)
+        return tactics_per_goal[0], scores_per_goal[0]
+
+    def get_several_next_tactics_batch(
+            self,
+            goals_batch: list[str],
+            number_of_tactics: int
+    ) -> tuple[list[list[str]], list[list[float]]]:
+        self.__number_of_generate_calls += 1
+        latency_seconds = self.__generate_latency_seconds + self.__generate_latency_seconds_per_goal * len(goals_batch)
+        if latency_seconds > 0:
+            time.sleep(latency_seconds)
+
+        tactics_per_goal, scores_per_goal = [], []
+        for goals in goals_batch:
+            number_of_calls = self.__goal_to_number_of_calls.get(goals, 0)
+            self.__goal_to_number_of_calls[goals] = number_of_calls + 1
+
+            tactics = [DISTRACTOR_TACTIC_FORMAT.format(number_of_calls, index) for index in range(number_of_tactics)]
+            scores = [-1.0 - index for index in range(number_of_tactics)]
+            next_tactic = self.__formatted_goal_to_next_tactic.get(goals)
+            draw = zlib.crc32(f"{goals}\0{number_of_calls}".encode()) % 100
+            if next_tactic is not None and draw < self.__correct_tactic_percentage:
+                tactics[draw % number_of_tactics] = next_tactic
+            tactics_per_goal.append(tactics)
+            scores_per_goal.append(scores)
+        return tactics_per_goal, scores_per_goal
+
+    def get_number_of_generate_calls(self) -> int:
+        return self.__number_of_generate_calls
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import MagicMock
+
+from benchmark.PrecisionCalibration import PrecisionCalibration
+from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+
+
+class TestPrecisionCalibration(unittest.TestCase):
+
+    @staticmethod
+    def build_language_model(top_tactic_score: float) -> MagicMock:
+        language_model = MagicMock(spec=ProofSearchLanguageModel)
+        language_model.get_several_next_tactics.return_value = (["simp", "linarith"], [-2.0, -1.0])
+        language_model.get_tactic_scores.return_value = [top_tactic_score]
+        return language_model
+
+    def test_run_compares_top_tactic_scores_to_reference_precision(self):
+        precision_to_language_model = {
+            "fp32": self.build_language_model(-1.0),
+            "bf16": self.build_language_model(-1.2),
+            "int8": self.build_language_model(-2.0),
+        }
+        precision_calibration = PrecisionCalibration(
+            lambda precision: precision_to_language_model[precision],
+            len,
+            ["goal 1", "goal 2"],
+            2,
+            score_tolerance=0.5
+        )
+
+        results = precision_calibration.run(["int8", "bf16", "fp32"])
+
+        self.assertEqual(["fp32", "int8", "bf16"], [result.precision for result in results])
+        self.assertEqual([True, False, True], [result.within_tolerance for result in results])
+        self.assertAlmostEqual(1.0, results[1].maximum_score_difference)
+        self.assertEqual(2 * len("simplinarith"), results[0].generated_tokens)
+        precision_to_language_model["int8"].get_tactic_scores.assert_called_with("goal 2", ["linarith"])
+
+
+if __name__ == '__main__':
+    unittest.main()
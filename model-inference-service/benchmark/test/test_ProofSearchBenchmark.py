@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from benchmark.BenchmarkCorpus import BENCHMARK_THEOREMS
+from benchmark.ProofSearchBenchmark import ProofSearchBenchmark
+
+
+class TestProofSearchBenchmark(TestCase):
+    def test_run_proof_search_reports_every_theorem(self):
+        proof_search_benchmark = ProofSearchBenchmark(BENCHMARK_THEOREMS, correct_tactic_percentage=100)
+
+        benchmark_report = proof_search_benchmark.run_proof_search()
+
+        self.assertEqual(len(BENCHMARK_THEOREMS), benchmark_report.number_of_theorems)
+        self.assertEqual(len(BENCHMARK_THEOREMS), benchmark_report.number_of_proved_theorems)
+        self.assertLessEqual(benchmark_report.p50_latency_seconds, benchmark_report.p99_latency_seconds)
+        self.assertGreater(benchmark_report.lean_evaluations_per_theorem, 1)
+        self.assertGreaterEqual(benchmark_report.generate_calls_per_theorem, 1)
+
+    def test_run_proof_search_is_deterministic(self):
+        first_report = ProofSearchBenchmark(BENCHMARK_THEOREMS).run_proof_search()
+        second_report = ProofSearchBenchmark(BENCHMARK_THEOREMS).run_proof_search()
+
+        self.assertEqual(first_report.number_of_proved_theorems, second_report.number_of_proved_theorems)
+        self.assertEqual(first_report.lean_evaluations_per_theorem, second_report.lean_evaluations_per_theorem)
+        self.assertEqual(first_report.generate_calls_per_theorem, second_report.generate_calls_per_theorem)
+
+    def test_run_queue_listener_stores_proofs_found_by_listener(self):
+        proof_search_benchmark = ProofSearchBenchmark(BENCHMARK_THEOREMS[:3], correct_tactic_percentage=100)
+
+        benchmark_report = proof_search_benchmark.run_queue_listener()
+
+        self.assertEqual(3, benchmark_report.number_of_theorems)
+        self.assertEqual(3, benchmark_report.number_of_proved_theorems)
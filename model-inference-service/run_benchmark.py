@@ -0,0 +1,43 @@
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+
+sys.path.append("/shared")
+
+from benchmark.BenchmarkCorpus import BENCHMARK_THEOREMS
+from benchmark.ProofSearchBenchmark import ProofSearchBenchmark
+from domain.EasyLogger import EasyLogger
+
+SEARCH_MODE = "search"
+LISTENER_MODE = "listener"
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description="Offline proof search benchmark with deterministic fakes")
+    argument_parser.add_argument("--mode", choices=[SEARCH_MODE, LISTENER_MODE], default=SEARCH_MODE)
+    argument_parser.add_argument("--repetitions", type=int, default=5)
+    argument_parser.add_argument("--lean-latency", type=float, default=0.01)
+    argument_parser.add_argument("--generate-latency", type=float, default=0.05)
+    argument_parser.add_argument("--generate-latency-per-goal", type=float, default=0.01)
+    argument_parser.add_argument("--correct-tactic-percentage", type=int, default=50)
+    argument_parser.add_argument("--frontier-batch-size", type=int, default=1)
+    arguments = argument_parser.parse_args()
+
+    EasyLogger()
+    # the search logs every step at DEBUG level, which would dominate the measured time
+    logging.getLogger().setLevel(logging.WARNING)
+
+    proof_search_benchmark = ProofSearchBenchmark(
+        BENCHMARK_THEOREMS * arguments.repetitions,
+        arguments.lean_latency,
+        arguments.generate_latency,
+        arguments.generate_latency_per_goal,
+        arguments.correct_tactic_percentage,
+        arguments.frontier_batch_size
+    )
+    if arguments.mode == SEARCH_MODE:
+        benchmark_report = proof_search_benchmark.run_proof_search()
+    else:
+        benchmark_report = proof_search_benchmark.run_queue_listener()
+    print(json.dumps(asdict(benchmark_report), indent=4))
@@ -0,0 +1,67 @@
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+
+sys.path.append("/shared")
+
+from benchmark.PrecisionCalibration import PrecisionCalibration, DEFAULT_CALIBRATION_GOALS, DEFAULT_SCORE_TOLERANCE
+from domain.EasyLogger import EasyLogger
+from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+from domain.language_model.model_factory.LoraModelAndTokenizerFactory import LoraModelAndTokenizerFactory
+from domain.language_model.model_factory.ModelPrecision import PRECISIONS, FP32_PRECISION, BF16_PRECISION, \
+    INT8_PRECISION
+from domain.language_model.model_factory.NonLoraModelAndTokenizerFactory import NonLoraModelAndTokenizerFactory
+from domain.lean.MockLeanExecutor import MockLeanExecutor
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(
+        description="Measures the generation throughput and the tactic scores of a model for several precisions"
+    )
+    argument_parser.add_argument("--model-path", required=True)
+    argument_parser.add_argument("--base-model-name", required=True)
+    argument_parser.add_argument("--lora", action="store_true")
+    argument_parser.add_argument("--device", default="cpu")
+    argument_parser.add_argument("--precisions", default=",".join((FP32_PRECISION, BF16_PRECISION, INT8_PRECISION)))
+    argument_parser.add_argument("--number-of-tactics", type=int, default=8)
+    argument_parser.add_argument("--score-tolerance", type=float, default=DEFAULT_SCORE_TOLERANCE)
+    argument_parser.add_argument("--goals-file", help="file with one goal per paragraph, separated by empty lines")
+    arguments = argument_parser.parse_args()
+
+    EasyLogger()
+    logging.getLogger().setLevel(logging.INFO)
+
+    precisions = [precision.strip() for precision in arguments.precisions.split(",") if precision.strip() != ""]
+    for precision in precisions:
+        if precision not in PRECISIONS:
+            argument_parser.error(f"unknown precision {precision}, expected one of {', '.join(PRECISIONS)}")
+
+    goals = DEFAULT_CALIBRATION_GOALS
+    if arguments.goals_file is not None:
+        with open(arguments.goals_file) as goals_file:
+            goals = [goal.strip() for goal in goals_file.read().split("\n\n") if goal.strip() != ""]
+
+    # the calibration never checks tactics with Lean
+    lean_executor = MockLeanExecutor()
+
+    def build_model_and_tokenizer_factory(precision: str):
+        if arguments.lora:
+            return LoraModelAndTokenizerFactory(merge_adapter=precision == INT8_PRECISION, precision=precision)
+        return NonLoraModelAndTokenizerFactory(precision)
+
+    def load_language_model(precision: str) -> ProofSearchLanguageModel:
+        return ProofSearchLanguageModel(arguments.model_path, arguments.base_model_name, arguments.device,
+                                        build_model_and_tokenizer_factory(precision), lean_executor, lean_executor)
+
+    tokenizer = build_model_and_tokenizer_factory(FP32_PRECISION).get_tokenizer(arguments.model_path,
+                                                                                arguments.base_model_name)
+    precision_calibration = PrecisionCalibration(
+        load_language_model,
+        lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"]),
+        goals,
+        arguments.number_of_tactics,
+        arguments.score_tolerance
+    )
+    results = precision_calibration.run(precisions)
+    print(json.dumps([asdict(result) for result in results], indent=4))
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from domain.EasyLogger import EasyLogger
+from repository.TheoremRepository import TheoremRepository
+from service.FormalizationCacheStatistics import FormalizationCacheStatistics
+
+FORMAL_STATEMENT_KIND = "formal_statement"
+INFORMAL_PROOF_KIND = "informal_proof"
+
+
+class FormalizationCache:
+    """
+    Remembers the formalizations of informal theorem statements and the deformalizations of formal proofs.
+    Lookups go through an in-memory LRU first, then through the indexed hash columns of the formalization table,
+    which the TheoremQueueListener fills after every informal proof search.
+    """
+    DEFAULT_MAXIMUM_ENTRIES = 4096
+
+    def __init__(self, theorem_repository: TheoremRepository, maximum_entries: int = DEFAULT_MAXIMUM_ENTRIES):
+        self.__theorem_repository = theorem_repository
+        self.__maximum_entries = maximum_entries
+        self.__logger = EasyLogger()
+        self.__lock = threading.Lock()
+        self.__key_to_text: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self.__memory_hits = 0
+        self.__database_hits = 0
+        self.__misses = 0
+
+    def get_formal_statement(self, informal_statement: str) -> str | None:
+        return self.__get(FORMAL_STATEMENT_KIND, informal_statement, self.__theorem_repository.find_formal_statement)
+
+    def put_formal_statement(self, informal_statement: str, formal_statement: str):
+        self.__put(FORMAL_STATEMENT_KIND, informal_statement, formal_statement)
+
+    def get_informal_proof(self, formal_proof: str) -> str | None:
+        return self.__get(INFORMAL_PROOF_KIND, formal_proof, self.__theorem_repository.find_informal_proof)
+
+    def put_informal_proof(self, formal_proof: str, informal_proof: str):
+        self.__put(INFORMAL_PROOF_KIND, formal_proof, informal_proof)
+
+    def get_statistics(self) -> FormalizationCacheStatistics:
+        with self.__lock:
+            return FormalizationCacheStatistics(self.__memory_hits, self.__database_hits, self.__misses,
+                                                len(self.__key_to_text))
+
+    @staticmethod
+    def build_text_hash(text: str) -> str:
+        return hashlib.sha256(text.strip().encode()).hexdigest()
+
+    def __get(self, kind: str, text: str, find_in_database) -> str | None:
+        text_hash = FormalizationCache.build_text_hash(text)
+        key = (kind, text_hash)
+        with self.__lock:
+            if key in self.__key_to_text:
+                self.__memory_hits += 1
+                self.__key_to_text.move_to_end(key)
+                return self.__key_to_text[key]
+
+        cached_text = find_in_database(text_hash)
+        with self.__lock:
+            if cached_text is None:
+                self.__misses += 1
+                return None
+            self.__database_hits += 1
+        self.__logger.debug(f"Found {kind} {text_hash} in the database")
+        self.__put(kind, text, cached_text)
+        return cached_text
+
+    def __put(self, kind: str, text: str, cached_text: str):
+        key = (kind, FormalizationCache.build_text_hash(text))
+        with self.__lock:
+            self.__key_to_text[key] = cached_text
+            self.__key_to_text.move_to_end(key)
+            while len(self.__key_to_text) > self.__maximum_entries:
+                self.__key_to_text.popitem(last=False)
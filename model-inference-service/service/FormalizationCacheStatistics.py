@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class FormalizationCacheStatistics:
+    memory_hits: int
+    database_hits: int
+    misses: int
+    entries: int
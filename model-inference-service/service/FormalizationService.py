@@ -1,12 +1,38 @@
 from domain.language_model.FormalizationLanguageModel import FormalizationLanguageModel
+from service.FormalizationCache import FormalizationCache
 
 
 class FormalizationService:
-    def __init__(self, formalization_language_model: FormalizationLanguageModel):
+    def __init__(
+            self,
+            formalization_language_model: FormalizationLanguageModel,
+            formalization_cache: FormalizationCache | None = None
+    ):
         self.__formalization_language_model = formalization_language_model
+        self.__formalization_cache = formalization_cache
 
     def formalize(self, informal_theorem: str) -> (str, bool):
-        return self.__formalization_language_model.formalize_theorem_statement(informal_theorem)
+        if self.__formalization_cache is None:
+            return self.__formalization_language_model.formalize_theorem_statement(informal_theorem)
+
+        formal_theorem = self.__formalization_cache.get_formal_statement(informal_theorem)
+        if formal_theorem is not None:
+            return formal_theorem, True
+
+        formal_theorem, successful = self.__formalization_language_model.formalize_theorem_statement(informal_theorem)
+        if successful:
+            self.__formalization_cache.put_formal_statement(informal_theorem, formal_theorem)
+        return formal_theorem, successful
 
     def deformalize(self, formal_theorem: str) -> (str, bool):
-        return self.__formalization_language_model.deformalize_proof(formal_theorem)
+        if self.__formalization_cache is None:
+            return self.__formalization_language_model.deformalize_proof(formal_theorem)
+
+        informal_proof = self.__formalization_cache.get_informal_proof(formal_theorem)
+        if informal_proof is not None:
+            return informal_proof, True
+
+        informal_proof, successful = self.__formalization_language_model.deformalize_proof(formal_theorem)
+        if successful:
+            self.__formalization_cache.put_informal_proof(formal_theorem, informal_proof)
+        return informal_proof, successful
@@ -3,9 +3,16 @@ from domain.lean.ILeanEvaluator import ILeanEvaluator
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 
 from domain.language_model.model_configuration.IModelAndPath import IModelAndPath
+from domain.language_model.model_configuration.LanguageModelCache import LanguageModelCache
 
 from domain.language_model.model_configuration.NonLoraModelAndPath import NonLoraModelAndPath
 from domain.language_model.model_configuration.LoraModelAndPath import LoraModelAndPath
+from domain.language_model.model_factory.IModelAndTokenizerFactory import IModelAndTokenizerFactory
+from domain.language_model.model_factory.LoraModelAndTokenizerFactory import LoraModelAndTokenizerFactory
+from domain.language_model.model_factory.ModelPrecision import FP16_PRECISION, FP32_PRECISION
+from domain.language_model.model_factory.NonLoraModelAndTokenizerFactory import NonLoraModelAndTokenizerFactory
+from domain.language_model.model_factory.SharedBaseLoraModelAndTokenizerFactory import \
+    SharedBaseLoraModelAndTokenizerFactory
 from domain.EasyLogger import EasyLogger
 from repository.TheoremRepository import TheoremRepository
 from domain.language_model.model_configuration import LoraModelAndPath
@@ -20,20 +27,57 @@ class ModelService:
             self,
             device: str,
             lean_evaluator: ILeanEvaluator,
-            lean_evaluation_interpreter: ILeanEvaluationInterpreter
+            lean_evaluation_interpreter: ILeanEvaluationInterpreter,
+            language_model_cache: LanguageModelCache | None = None,
+            merged_lora_cache_directory: str | None = None
     ) -> dict:
+        """
+        The models are only loaded when first used, and all of them share language_model_cache.
+        LoRA adapters trained on the same base model share a single copy of its weights, unless the model
+        has merge_lora set: then its adapter is merged into its own copy of the base model, and the merged
+        weights are cached under merged_lora_cache_directory if given.
+        The precision of a model defaults to fp32 for LoRA models and to fp16 for the other models.
+        A model with a draft_model_name generates its tactics with speculative decoding, using that model as
+        draft model. The draft model cannot have a draft model itself, nor be a LoRA adapter sharing its base model:
+        assisted generation needs a model it can call directly, so such draft models have to set merge_lora.
+        """
+        if language_model_cache is None:
+            language_model_cache = LanguageModelCache()
+        # models of the same kind and precision share a factory, so that shared LoRA base models are loaded once
+        factory_key_to_factory: dict[tuple[bool, bool, str], IModelAndTokenizerFactory] = dict()
         model_short_name_to_config = dict()
+        shared_base_model_names = set()
         models = self.__theorem_repository.get_language_models()
+        # the draft models are configured first, so that the models using them can refer to their configuration
+        models = sorted(models, key=lambda language_model: language_model.draft_model_name is not None)
         for model in models:
             model_and_path: IModelAndPath
             try:
+                model_and_tokenizer_factory = ModelService.__get_model_and_tokenizer_factory(
+                    model.used_lora,
+                    bool(model.merge_lora),
+                    model.precision,
+                    merged_lora_cache_directory,
+                    factory_key_to_factory
+                )
+                draft_model_and_path = None
+                if model.draft_model_name is not None:
+                    if model.draft_model_name not in model_short_name_to_config:
+                        raise ValueError(f"unknown draft model {model.draft_model_name}")
+                    if model.draft_model_name in shared_base_model_names:
+                        raise ValueError(f"draft model {model.draft_model_name} is a LoRA adapter on a shared base "
+                                         f"model, set its merge_lora")
+                    draft_model_and_path = model_short_name_to_config[model.draft_model_name]
                 if model.used_lora:
                     model_and_path = LoraModelAndPath.LoraModelAndPath(
                         model.hf_path,
                         model.base_model_name,
                         device,
                         lean_evaluator,
-                        lean_evaluation_interpreter
+                        lean_evaluation_interpreter,
+                        language_model_cache,
+                        model_and_tokenizer_factory,
+                        draft_model_and_path
                     )
                 else:
                     model_and_path = NonLoraModelAndPath(
@@ -41,10 +85,36 @@ class ModelService:
                         model.base_model_name,
                         device,
                         lean_evaluator,
-                        lean_evaluation_interpreter
+                        lean_evaluation_interpreter,
+                        language_model_cache,
+                        model_and_tokenizer_factory,
+                        draft_model_and_path
                     )
                 model_short_name_to_config[model.model_name] = model_and_path
+                if model.used_lora and not model.merge_lora:
+                    shared_base_model_names.add(model.model_name)
             except ValueError as error:
                 self.__logger.error(f"Error while loading model {model.model_name}: {error}")
 
         return model_short_name_to_config
+
+    @staticmethod
+    def __get_model_and_tokenizer_factory(
+            used_lora: bool,
+            merge_lora: bool,
+            precision: str | None,
+            merged_lora_cache_directory: str | None,
+            factory_key_to_factory: dict[tuple[bool, bool, str], IModelAndTokenizerFactory]
+    ) -> IModelAndTokenizerFactory:
+        if precision is None:
+            precision = FP32_PRECISION if used_lora else FP16_PRECISION
+        factory_key = (used_lora, merge_lora, precision)
+        if factory_key not in factory_key_to_factory:
+            if not used_lora:
+                factory_key_to_factory[factory_key] = NonLoraModelAndTokenizerFactory(precision)
+            elif merge_lora:
+                factory_key_to_factory[factory_key] = LoraModelAndTokenizerFactory(True, merged_lora_cache_directory,
+                                                                                   precision)
+            else:
+                factory_key_to_factory[factory_key] = SharedBaseLoraModelAndTokenizerFactory(precision)
+        return factory_key_to_factory[factory_key]
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+from domain.lean.LeanProofState import LeanProofState
+
+
+@dataclass
+class ProofSearchNode:
+    priority: float
+    full_program: str
+    formatted_program: str
+    proof_state: LeanProofState | None = None
@@ -2,16 +2,32 @@ import heapq
 
 from domain.EasyLogger import EasyLogger
 from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+from domain.lean.CachingLeanEvaluator import CachingLeanEvaluator
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanEnvironmentCache import LeanEnvironmentCache
+from domain.lean.LeanProofState import LeanProofState
 from domain.lean.LeanUtilities import LeanUtilities
 from service.FormalizationService import FormalizationService
 from service.InformalProofSearchResult import InformalProofSearchResult
+from service.ProofSearchNode import ProofSearchNode
+from service.ProofSearchTrace import ProofSearchTrace
+from service.TacticOutcomeStore import TacticOutcomeStore
 
 
 class ProofSearchService:
     SEARCH_BUDGET = 50
     SEARCH_BUDGET_PER_STEP = 4
+    DEFAULT_AUTOMATION_TACTIC_MAX_HEARTBEATS = 20000
+    AUTOMATION_TACTIC_FORMAT = "set_option maxHeartbeats {} in {}"
+
+    ERROR_OUTCOME = "error"
+    TIMEOUT_OUTCOME = "timeout"
+    NO_CHANGE_OUTCOME = "no_change"
+    ALREADY_EXPANDED_OUTCOME = "already_expanded"
+    NEW_GOAL_OUTCOME = "new_goal"
+    PROVED_OUTCOME = "proved"
+    NOT_PROVED_OUTCOME = "not_proved"
 
     def __init__(
             self,
@@ -19,26 +35,65 @@ class ProofSearchService:
             lean_evaluator: ILeanEvaluator,
             lean_evaluation_interpreter: ILeanEvaluationInterpreter,
             model_short_name_to_config: dict,
-            device
+            device,
+            frontier_batch_size: int = 1,
+            incremental_tactic_checking: bool = False,
+            tactic_outcome_store: TacticOutcomeStore | None = None,
+            automation_tactics: tuple[str, ...] = (),
+            automation_tactic_max_heartbeats: int = DEFAULT_AUTOMATION_TACTIC_MAX_HEARTBEATS
     ):
         self.__formalization_service = formalization_service
         self.__lean_evaluator = lean_evaluator
         self.__lean_evaluation_interpreter = lean_evaluation_interpreter
         self.__device = device
         self.__model_short_name_to_config = model_short_name_to_config
+        # with frontier_batch_size > 1, the best nodes of the frontier are expanded with a single generate call
+        self.__frontier_batch_size = frontier_batch_size
+        # in incremental mode, each node keeps its Lean proof state and only the new tactic is elaborated on top of it
+        self.__incremental_tactic_checking = incremental_tactic_checking
+        # outcomes of (goal, tactic) pairs checked by earlier searches, which do not need Lean anymore
+        self.__tactic_outcome_store = tactic_outcome_store
+        # cheap closing tactics (e.g. norm_num, simp) tried on every goal before asking the language model
+        self.__automation_tactics = automation_tactics
+        self.__automation_tactic_max_heartbeats = automation_tactic_max_heartbeats
         self.__logger = EasyLogger()
 
     # theorem should start with "theorem " and end in ":= by"
-    def search_proof(self, clean_theorem_statement: str, model_short_name: str) -> (str, bool):
+    def search_proof(
+            self,
+            clean_theorem_statement: str,
+            model_short_name: str,
+            trace: ProofSearchTrace | None = None
+    ) -> (str, bool):
+        if trace is None:
+            trace = ProofSearchTrace()
+        initial_hits, initial_misses = self.__get_lean_evaluation_cache_hits_and_misses()
+        try:
+            with trace.measure(ProofSearchTrace.TOTAL):
+                return self.__search_proof(clean_theorem_statement, model_short_name, trace)
+        finally:
+            hits, misses = self.__get_lean_evaluation_cache_hits_and_misses()
+            trace.add_count(ProofSearchTrace.LEAN_EVALUATION_CACHE_HITS, hits - initial_hits)
+            trace.add_count(ProofSearchTrace.LEAN_EVALUATION_CACHE_MISSES, misses - initial_misses)
+
+    # the Lean evaluation cache is shared by the concurrent searches, but each of them runs on its own thread
+    def __get_lean_evaluation_cache_hits_and_misses(self) -> tuple[int, int]:
+        if isinstance(self.__lean_evaluator, CachingLeanEvaluator):
+            return self.__lean_evaluator.get_thread_hits_and_misses()
+        return 0, 0
+
+    def __search_proof(self, clean_theorem_statement: str, model_short_name: str,
+                       trace: ProofSearchTrace) -> (str, bool):
         language_model = self.get_or_load_language_model(model_short_name)
 
         # full_proof = clean_theorem_statement
 
-        initial_formatted_program = LeanUtilities.build_formatted_program(
-            clean_theorem_statement,
-            self.__lean_evaluator,
-            self.__lean_evaluation_interpreter
-        )
+        with trace.measure(ProofSearchTrace.LEAN):
+            initial_formatted_program = LeanUtilities.build_formatted_program(
+                clean_theorem_statement,
+                self.__lean_evaluator,
+                self.__lean_evaluation_interpreter
+            )
 
         if initial_formatted_program == LeanUtilities.PROVED_FORMATTED_PROGRAM:
             self.__logger.debug(
@@ -46,63 +101,80 @@ class ProofSearchService:
             return clean_theorem_statement, True
 
         queue = []
-        heapq.heappush(queue, (0, (clean_theorem_statement, initial_formatted_program)))
+        heapq.heappush(queue, (0, initial_formatted_program))
+
+        # transposition table: formatted goal -> node with the best priority and the shortest program reaching it
+        goal_to_node = {initial_formatted_program: ProofSearchNode(0, clean_theorem_statement, initial_formatted_program)}
+        expanded_goals = set()
 
         consumed_search_budget = 0
 
-        while consumed_search_budget < ProofSearchService.SEARCH_BUDGET:
-            popped_priority, (popped_full_program, popped_formatted_program) = heapq.heappop(queue)
-
-            self.__logger.debug(f"Popped proof state priority={popped_priority}")
-            self.__logger.debug(f"Full program: {popped_full_program}")
-            self.__logger.debug(f"Formatted program: {popped_formatted_program}")
-
-            found_valid_next_tactic = False
-            while not found_valid_next_tactic and consumed_search_budget < ProofSearchService.SEARCH_BUDGET:
-                next_tactics, next_tactics_scores = language_model.get_several_next_tactics(
-                    popped_formatted_program,
-                    ProofSearchService.SEARCH_BUDGET_PER_STEP
-                )
-                consumed_search_budget += ProofSearchService.SEARCH_BUDGET_PER_STEP
-
-                for next_tactic, next_tactic_score in zip(next_tactics, next_tactics_scores):
-                    new_full_program = popped_full_program + "\n" + next_tactic
-                    new_formatted_program = LeanUtilities.build_formatted_program(
-                        new_full_program,
-                        self.__lean_evaluator,
-                        self.__lean_evaluation_interpreter
-                    )
+        while queue and consumed_search_budget < ProofSearchService.SEARCH_BUDGET:
+            nodes_without_valid_next_tactic = self.__pop_frontier(queue, goal_to_node, expanded_goals, trace)
+
+            complete_proof = self.__try_automation_tactics(model_short_name, nodes_without_valid_next_tactic, trace)
+            if complete_proof is not None:
+                self.__logger.debug(
+                    f"Proof completed by an automation tactic after generating {consumed_search_budget} tactics.")
+                return complete_proof, True
 
-                    if new_formatted_program == LeanUtilities.ERROR_FORMATTED_PROGRAM:
-                        self.__logger.debug(f"This tactic resulted in an error. Will ignore it: {next_tactic}")
-                        continue
-                    if new_formatted_program == popped_formatted_program:
-                        self.__logger.debug(f"This tactic did not change anything. Will ignore it: {next_tactic}")
-                        continue
+            while nodes_without_valid_next_tactic and consumed_search_budget < ProofSearchService.SEARCH_BUDGET:
+                remaining_steps = -(-(ProofSearchService.SEARCH_BUDGET - consumed_search_budget)
+                                    // ProofSearchService.SEARCH_BUDGET_PER_STEP)
+                nodes_to_expand = nodes_without_valid_next_tactic[:remaining_steps]
+                nodes_without_valid_next_tactic = nodes_without_valid_next_tactic[remaining_steps:]
 
-                    found_valid_next_tactic = True
+                with trace.measure(ProofSearchTrace.LANGUAGE_MODEL):
+                    next_tactics_per_node, next_tactics_scores_per_node = self.__get_next_tactics(
+                        language_model,
+                        [popped_node.formatted_program for popped_node in nodes_to_expand]
+                    )
+                consumed_search_budget += ProofSearchService.SEARCH_BUDGET_PER_STEP * len(nodes_to_expand)
+                trace.add_count(ProofSearchTrace.GENERATED_TACTICS,
+                                sum(len(next_tactics) for next_tactics in next_tactics_per_node))
+
+                new_formatted_programs_and_proof_states = self.__check_next_tactics(model_short_name,
+                                                                                    nodes_to_expand,
+                                                                                    next_tactics_per_node,
+                                                                                    trace)
 
-                    self.__logger.debug(f"New full program: {new_full_program}")
-                    self.__logger.debug(f"New formatted program: {new_formatted_program}")
-                    self.__logger.debug(f"Score of this new tactic: {next_tactic_score}")
+                for popped_node, next_tactics, next_tactics_scores in zip(nodes_to_expand, next_tactics_per_node,
+                                                                          next_tactics_scores_per_node):
+                    new_formatted_programs_and_proof_states_of_node = \
+                        new_formatted_programs_and_proof_states[:len(next_tactics)]
+                    new_formatted_programs_and_proof_states = \
+                        new_formatted_programs_and_proof_states[len(next_tactics):]
 
-                    if new_formatted_program == LeanUtilities.PROVED_FORMATTED_PROGRAM:
+                    found_valid_next_tactic, complete_proof = self.__expand_node(
+                        popped_node,
+                        next_tactics,
+                        next_tactics_scores,
+                        new_formatted_programs_and_proof_states_of_node,
+                        queue,
+                        goal_to_node,
+                        expanded_goals,
+                        trace
+                    )
+                    if complete_proof is not None:
                         self.__logger.debug(
                             f"Proof completed after generating a total of {consumed_search_budget} tactics.")
-                        return new_full_program, True
-
-                    heapq.heappush(queue,
-                                   (popped_priority - next_tactic_score, (new_full_program, new_formatted_program))
-                                   )
+                        return complete_proof, True
+                    if not found_valid_next_tactic:
+                        nodes_without_valid_next_tactic.append(popped_node)
 
         self.__logger.debug(f"Didn't find a proof with search budget={ProofSearchService.SEARCH_BUDGET}")
         if queue == []:
             return clean_theorem_statement, False
         else:
-            _, (popped_full_program, _) = heapq.heappop(queue)
-            return popped_full_program, False
+            _, popped_formatted_program = heapq.heappop(queue)
+            return goal_to_node[popped_formatted_program].full_program, False
 
-    def search_informal_proof(self, informal_statement: str, model_short_name: str) -> InformalProofSearchResult:
+    def search_informal_proof(
+            self,
+            informal_statement: str,
+            model_short_name: str,
+            trace: ProofSearchTrace | None = None
+    ) -> InformalProofSearchResult:
         # clean_theorem_statement = """theorem example_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
         formal_statement, was_formalization_successful = self.__formalization_service.formalize(informal_statement)
         self.__logger.debug(
@@ -111,7 +183,7 @@ class ProofSearchService:
         if not was_formalization_successful:
             return InformalProofSearchResult(False, False, False, "", "", "")
 
-        formal_proof, was_proof_search_successful = self.search_proof(formal_statement, model_short_name)
+        formal_proof, was_proof_search_successful = self.search_proof(formal_statement, model_short_name, trace)
         if not was_proof_search_successful:
             return InformalProofSearchResult(True, False, False, formal_proof, "", formal_statement)
 
@@ -127,3 +199,241 @@ class ProofSearchService:
 
     def get_language_models(self):
         return list(self.__model_short_name_to_config.keys())
+
+    def __pop_frontier(
+            self,
+            queue: list,
+            goal_to_node: dict[str, ProofSearchNode],
+            expanded_goals: set[str],
+            trace: ProofSearchTrace
+    ) -> list[ProofSearchNode]:
+        popped_nodes = []
+        while queue and len(popped_nodes) < self.__frontier_batch_size:
+            _, popped_formatted_program = heapq.heappop(queue)
+            if popped_formatted_program in expanded_goals:
+                self.__logger.debug(
+                    f"Proof state was already expanded through another path: {popped_formatted_program}")
+                continue
+            expanded_goals.add(popped_formatted_program)
+
+            popped_node = goal_to_node[popped_formatted_program]
+            self.__logger.debug(f"Popped proof state priority={popped_node.priority}")
+            self.__logger.debug(f"Full program: {popped_node.full_program}")
+            self.__logger.debug(f"Formatted program: {popped_node.formatted_program}")
+            trace.add_expansion(popped_node.formatted_program, popped_node.priority)
+            popped_nodes.append(popped_node)
+        return popped_nodes
+
+    def __try_automation_tactics(
+            self,
+            model_short_name: str,
+            nodes: list[ProofSearchNode],
+            trace: ProofSearchTrace
+    ) -> str | None:
+        """
+        Checks all the automation tactics on all the nodes at once, each tactic with a limited number of heartbeats.
+        Returns the complete proof if one of them closed the goal of a node.
+        """
+        if not self.__automation_tactics or not nodes:
+            return None
+
+        limited_automation_tactics = [
+            ProofSearchService.AUTOMATION_TACTIC_FORMAT.format(self.__automation_tactic_max_heartbeats,
+                                                               automation_tactic)
+            for automation_tactic in self.__automation_tactics
+        ]
+        new_formatted_programs_and_proof_states = self.__check_next_tactics(
+            model_short_name,
+            nodes,
+            [limited_automation_tactics for _ in nodes],
+            trace
+        )
+
+        for index, (new_formatted_program, _) in enumerate(new_formatted_programs_and_proof_states):
+            node = nodes[index // len(self.__automation_tactics)]
+            automation_tactic = self.__automation_tactics[index % len(self.__automation_tactics)]
+            is_proved = new_formatted_program == LeanUtilities.PROVED_FORMATTED_PROGRAM
+            trace.add_tactic(node.formatted_program, automation_tactic, None,
+                             ProofSearchService.PROVED_OUTCOME if is_proved else ProofSearchService.NOT_PROVED_OUTCOME)
+            if is_proved:
+                self.__logger.debug(f"Automation tactic {automation_tactic} closed the goal: {node.formatted_program}")
+                # the heartbeat limit is only there to bound the search; the tactic also succeeds without it
+                return node.full_program + "\n" + automation_tactic
+        return None
+
+    def __check_next_tactics(
+            self,
+            model_short_name: str,
+            nodes_to_expand: list[ProofSearchNode],
+            next_tactics_per_node: list[list[str]],
+            trace: ProofSearchTrace
+    ) -> list[tuple[str, LeanProofState | None]]:
+        """
+        Runs the candidates of all the expanded nodes together, so that pooled evaluators check them in parallel.
+        Returns the formatted program (and, in incremental mode, the proof state) reached by every candidate.
+        Candidates whose outcome is already in the tactic outcome store are not sent to Lean.
+        """
+        candidate_nodes = [popped_node for popped_node, next_tactics in zip(nodes_to_expand, next_tactics_per_node)
+                           for _ in next_tactics]
+        next_tactics = [next_tactic for next_tactics in next_tactics_per_node for next_tactic in next_tactics]
+
+        if self.__tactic_outcome_store is None:
+            with trace.measure(ProofSearchTrace.LEAN):
+                return self.__check_next_tactics_with_lean(candidate_nodes, next_tactics)
+
+        goals_and_tactics = [(candidate_node.formatted_program, next_tactic)
+                             for candidate_node, next_tactic in zip(candidate_nodes, next_tactics)]
+        # all the nodes of a search share the header of its theorem, and the same goal can behave differently
+        # under other imports and opens
+        environment_header = LeanEnvironmentCache.split_header(candidate_nodes[0].full_program)[0] \
+            if candidate_nodes else ""
+        with trace.measure(ProofSearchTrace.DATABASE):
+            stored_outcomes = self.__tactic_outcome_store.get_outcomes(model_short_name, goals_and_tactics,
+                                                                       environment_header)
+        missed_indexes = [index for index, stored_outcome in enumerate(stored_outcomes) if stored_outcome is None]
+        self.__logger.debug(f"{len(next_tactics) - len(missed_indexes)} of {len(next_tactics)} tactic outcomes "
+                            f"were already stored")
+        trace.add_count(ProofSearchTrace.TACTIC_OUTCOME_STORE_HITS, len(next_tactics) - len(missed_indexes))
+        trace.add_count(ProofSearchTrace.TACTIC_OUTCOME_STORE_MISSES, len(missed_indexes))
+
+        with trace.measure(ProofSearchTrace.LEAN):
+            checked_formatted_programs_and_proof_states = self.__check_next_tactics_with_lean(
+                [candidate_nodes[index] for index in missed_indexes],
+                [next_tactics[index] for index in missed_indexes]
+            )
+        # only the results of Lean are stored: after a timeout or a server failure, the same tactic may succeed
+        with trace.measure(ProofSearchTrace.DATABASE):
+            self.__tactic_outcome_store.add_outcomes(model_short_name, [
+                (*goals_and_tactics[index], formatted_program)
+                for index, (formatted_program, _) in zip(missed_indexes, checked_formatted_programs_and_proof_states)
+                if formatted_program not in (LeanUtilities.TIMEOUT_FORMATTED_PROGRAM,
+                                             LeanUtilities.TRANSIENT_ERROR_FORMATTED_PROGRAM)
+            ], environment_header)
+
+        new_formatted_programs_and_proof_states = [(stored_outcome, None) for stored_outcome in stored_outcomes]
+        for index, formatted_program_and_proof_state in zip(missed_indexes,
+                                                            checked_formatted_programs_and_proof_states):
+            new_formatted_programs_and_proof_states[index] = formatted_program_and_proof_state
+        return new_formatted_programs_and_proof_states
+
+    def __check_next_tactics_with_lean(
+            self,
+            candidate_nodes: list[ProofSearchNode],
+            next_tactics: list[str]
+    ) -> list[tuple[str, LeanProofState | None]]:
+        full_programs = [candidate_node.full_program for candidate_node in candidate_nodes]
+
+        if not self.__incremental_tactic_checking:
+            new_formatted_programs = LeanUtilities.build_formatted_programs(
+                [full_program + "\n" + next_tactic for full_program, next_tactic in zip(full_programs, next_tactics)],
+                self.__lean_evaluator,
+                self.__lean_evaluation_interpreter
+            )
+            return [(new_formatted_program, None) for new_formatted_program in new_formatted_programs]
+
+        for candidate_node in candidate_nodes:
+            if candidate_node.proof_state is None:
+                candidate_node.proof_state = self.__lean_evaluator.start_proof(candidate_node.full_program)
+        proof_states = [candidate_node.proof_state for candidate_node in candidate_nodes]
+
+        return LeanUtilities.build_formatted_programs_from_proof_states(
+            full_programs,
+            proof_states,
+            next_tactics,
+            self.__lean_evaluator,
+            self.__lean_evaluation_interpreter
+        )
+
+    def __expand_node(
+            self,
+            popped_node: ProofSearchNode,
+            next_tactics: list[str],
+            next_tactics_scores: list[float],
+            new_formatted_programs_and_proof_states: list[tuple[str, LeanProofState | None]],
+            queue: list,
+            goal_to_node: dict[str, ProofSearchNode],
+            expanded_goals: set[str],
+            trace: ProofSearchTrace
+    ) -> tuple[bool, str | None]:
+        """
+        Queues the proof states reached by applying the proposed tactics to the popped node.
+        Returns whether any tactic was valid and, if one of them completed the proof, the complete proof.
+        """
+        found_valid_next_tactic = False
+        for next_tactic, next_tactic_score, (new_formatted_program, new_proof_state) in zip(
+                next_tactics, next_tactics_scores, new_formatted_programs_and_proof_states):
+            new_full_program = popped_node.full_program + "\n" + next_tactic
+
+            if new_formatted_program in (LeanUtilities.ERROR_FORMATTED_PROGRAM,
+                                         LeanUtilities.TRANSIENT_ERROR_FORMATTED_PROGRAM):
+                self.__logger.debug(f"This tactic resulted in an error. Will ignore it: {next_tactic}")
+                trace.add_tactic(popped_node.formatted_program, next_tactic, next_tactic_score,
+                                 ProofSearchService.ERROR_OUTCOME)
+                continue
+            if new_formatted_program == LeanUtilities.TIMEOUT_FORMATTED_PROGRAM:
+                self.__logger.debug(f"This tactic timed out. Will ignore it: {next_tactic}")
+                trace.add_tactic(popped_node.formatted_program, next_tactic, next_tactic_score,
+                                 ProofSearchService.TIMEOUT_OUTCOME)
+                continue
+            if new_formatted_program == popped_node.formatted_program:
+                self.__logger.debug(f"This tactic did not change anything. Will ignore it: {next_tactic}")
+                trace.add_tactic(popped_node.formatted_program, next_tactic, next_tactic_score,
+                                 ProofSearchService.NO_CHANGE_OUTCOME)
+                continue
+            if new_formatted_program in expanded_goals:
+                self.__logger.debug(f"This tactic led to an already expanded state. Will ignore it: {next_tactic}")
+                trace.add_tactic(popped_node.formatted_program, next_tactic, next_tactic_score,
+                                 ProofSearchService.ALREADY_EXPANDED_OUTCOME)
+                continue
+
+            found_valid_next_tactic = True
+            trace.add_tactic(popped_node.formatted_program, next_tactic, next_tactic_score,
+                             ProofSearchService.PROVED_OUTCOME
+                             if new_formatted_program == LeanUtilities.PROVED_FORMATTED_PROGRAM
+                             else ProofSearchService.NEW_GOAL_OUTCOME)
+
+            self.__logger.debug(f"New full program: {new_full_program}")
+            self.__logger.debug(f"New formatted program: {new_formatted_program}")
+            self.__logger.debug(f"Score of this new tactic: {next_tactic_score}")
+
+            if new_formatted_program == LeanUtilities.PROVED_FORMATTED_PROGRAM:
+                return True, new_full_program
+
+            ProofSearchService.__merge_into_transposition_table(
+                queue,
+                goal_to_node,
+                ProofSearchNode(popped_node.priority - next_tactic_score, new_full_program, new_formatted_program,
+                                new_proof_state)
+            )
+
+        return found_valid_next_tactic, None
+
+    def __get_next_tactics(
+            self,
+            language_model: ProofSearchLanguageModel,
+            formatted_programs: list[str]
+    ) -> tuple[list[list[str]], list[list[float]]]:
+        if self.__frontier_batch_size == 1:
+            next_tactics, next_tactics_scores = language_model.get_several_next_tactics(
+                formatted_programs[0],
+                ProofSearchService.SEARCH_BUDGET_PER_STEP
+            )
+            return [next_tactics], [next_tactics_scores]
+        return language_model.get_several_next_tactics_batch(
+            formatted_programs,
+            ProofSearchService.SEARCH_BUDGET_PER_STEP
+        )
+
+    @staticmethod
+    def __merge_into_transposition_table(queue: list, goal_to_node: dict[str, ProofSearchNode], node: ProofSearchNode):
+        known_node = goal_to_node.get(node.formatted_program)
+        if known_node is not None:
+            merged_priority = min(known_node.priority, node.priority)
+            shortest_node = min(known_node, node, key=lambda candidate_node: len(candidate_node.full_program))
+            if merged_priority == known_node.priority and shortest_node is known_node:
+                return
+            node = ProofSearchNode(merged_priority, shortest_node.full_program, node.formatted_program,
+                                   shortest_node.proof_state)
+
+        goal_to_node[node.formatted_program] = node
+        heapq.heappush(queue, (node.priority, node.formatted_program))
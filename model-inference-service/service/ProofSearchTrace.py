@@ -0,0 +1,75 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict
+
+from service.ProofSearchTraceSummary import ProofSearchTraceSummary
+
+
+class ProofSearchTrace:
+    """
+    Records what happened during one proof search (expanded nodes, checked tactics and where the time went),
+    so that it can be stored next to the proof and exported as JSON.
+    """
+    TOTAL = "total"
+    LANGUAGE_MODEL = "language_model"
+    LEAN = "lean"
+    DATABASE = "database"
+    QUEUE_WAIT = "queue_wait"
+
+    GENERATED_TACTICS = "generated_tactics"
+    TACTIC_OUTCOME_STORE_HITS = "tactic_outcome_store_hits"
+    TACTIC_OUTCOME_STORE_MISSES = "tactic_outcome_store_misses"
+    LEAN_EVALUATION_CACHE_HITS = "lean_evaluation_cache_hits"
+    LEAN_EVALUATION_CACHE_MISSES = "lean_evaluation_cache_misses"
+
+    def __init__(self):
+        self.__events = []
+        self.__category_to_seconds = defaultdict(float)
+        self.__counter_to_value = defaultdict(int)
+        self.__expansions = 0
+
+    @contextmanager
+    def measure(self, category: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(category, time.perf_counter() - start_time)
+
+    def add_time(self, category: str, seconds: float):
+        self.__category_to_seconds[category] += seconds
+        self.__events.append({"type": "timing", "category": category, "seconds": seconds})
+
+    def add_count(self, counter: str, amount: int = 1):
+        self.__counter_to_value[counter] += amount
+
+    def add_expansion(self, formatted_program: str, priority: float):
+        self.__expansions += 1
+        self.__events.append({"type": "expansion", "goal": formatted_program, "priority": priority})
+
+    def add_tactic(self, formatted_program: str, tactic: str, score: float | None, outcome: str):
+        self.__events.append({"type": "tactic", "goal": formatted_program, "tactic": tactic, "score": score,
+                              "outcome": outcome})
+
+    def get_summary(self) -> ProofSearchTraceSummary:
+        return ProofSearchTraceSummary(
+            self.__category_to_seconds[ProofSearchTrace.TOTAL],
+            self.__category_to_seconds[ProofSearchTrace.LANGUAGE_MODEL],
+            self.__category_to_seconds[ProofSearchTrace.LEAN],
+            self.__category_to_seconds[ProofSearchTrace.DATABASE],
+            self.__category_to_seconds[ProofSearchTrace.QUEUE_WAIT],
+            self.__expansions,
+            self.__counter_to_value[ProofSearchTrace.GENERATED_TACTICS],
+            self.__counter_to_value[ProofSearchTrace.TACTIC_OUTCOME_STORE_HITS],
+            self.__counter_to_value[ProofSearchTrace.TACTIC_OUTCOME_STORE_MISSES],
+            self.__counter_to_value[ProofSearchTrace.LEAN_EVALUATION_CACHE_HITS],
+            self.__counter_to_value[ProofSearchTrace.LEAN_EVALUATION_CACHE_MISSES]
+        )
+
+    def get_events(self) -> list[dict]:
+        return list(self.__events)
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": asdict(self.get_summary()), "events": self.__events})
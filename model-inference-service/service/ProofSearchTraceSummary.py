@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class ProofSearchTraceSummary:
+    total_seconds: float
+    language_model_seconds: float
+    lean_seconds: float
+    database_seconds: float
+    queue_wait_seconds: float
+    expansions: int
+    generated_tactics: int
+    tactic_outcome_store_hits: int
+    tactic_outcome_store_misses: int
+    lean_evaluation_cache_hits: int
+    lean_evaluation_cache_misses: int
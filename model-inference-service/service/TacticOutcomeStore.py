@@ -0,0 +1,81 @@
+import hashlib
+import re
+import threading
+
+from domain.EasyLogger import EasyLogger
+from repository.TheoremRepository import TheoremRepository
+
+
+class TacticOutcomeStore:
+    """
+    Remembers across searches the formatted program reached by applying a tactic to a goal: an error, the same goal
+    (no change), a new goal, or a completed proof. Entries are keyed by model, environment header (see
+    LeanEnvironmentCache), canonical goal and tactic, and are persisted through a TheoremRepository, which can be
+    backed by SQLite locally or by the main Postgres database. Counting the entries is a full scan on most
+    databases, so the least recently used entries are only evicted every trim_interval stored entries.
+    """
+    DEFAULT_MAXIMUM_ENTRIES = 1_000_000
+    DEFAULT_TRIM_INTERVAL = 10_000
+
+    def __init__(
+            self,
+            theorem_repository: TheoremRepository,
+            maximum_entries: int = DEFAULT_MAXIMUM_ENTRIES,
+            trim_interval: int = DEFAULT_TRIM_INTERVAL
+    ):
+        self.__theorem_repository = theorem_repository
+        self.__maximum_entries = maximum_entries
+        self.__trim_interval = trim_interval
+        self.__number_of_entries_since_trim = 0
+        self.__lock = threading.Lock()
+        self.__logger = EasyLogger()
+
+    def get_outcomes(
+            self,
+            model_short_name: str,
+            goals_and_tactics: list[tuple[str, str]],
+            environment_header: str = ""
+    ) -> list[str | None]:
+        """
+        Returns the stored outcome of every (goal, tactic) pair, or None when it is not known.
+        """
+        outcome_keys = [TacticOutcomeStore.build_outcome_key(model_short_name, goal, tactic, environment_header)
+                        for goal, tactic in goals_and_tactics]
+        outcome_key_to_outcome = self.__theorem_repository.get_tactic_outcomes(list(set(outcome_keys)))
+        self.__logger.debug(f"Found {len(outcome_key_to_outcome)} of {len(outcome_keys)} tactic outcomes")
+        return [outcome_key_to_outcome.get(outcome_key) for outcome_key in outcome_keys]
+
+    def add_outcomes(
+            self,
+            model_short_name: str,
+            goals_tactics_and_outcomes: list[tuple[str, str, str]],
+            environment_header: str = ""
+    ):
+        outcome_key_to_outcome = {
+            TacticOutcomeStore.build_outcome_key(model_short_name, goal, tactic, environment_header): outcome
+            for goal, tactic, outcome in goals_tactics_and_outcomes
+        }
+        self.__logger.debug(f"Will store {len(outcome_key_to_outcome)} tactic outcomes")
+        number_of_new_entries = self.__theorem_repository.add_tactic_outcomes(model_short_name, outcome_key_to_outcome)
+
+        with self.__lock:
+            self.__number_of_entries_since_trim += number_of_new_entries
+            should_trim = self.__number_of_entries_since_trim >= self.__trim_interval
+            if should_trim:
+                self.__number_of_entries_since_trim = 0
+        if should_trim:
+            self.__logger.debug(f"Will trim the tactic outcomes to {self.__maximum_entries} entries")
+            self.__theorem_repository.trim_tactic_outcomes(self.__maximum_entries)
+
+    @staticmethod
+    def build_outcome_key(model_short_name: str, goal: str, tactic: str, environment_header: str = "") -> str:
+        key_parts = (model_short_name, TacticOutcomeStore.canonicalize(goal), tactic.strip())
+        # the keys of the ENV_INIT_CODE environment are the same as before headers existed
+        if environment_header != "":
+            key_parts += (environment_header,)
+        return hashlib.sha256("\0".join(key_parts).encode()).hexdigest()
+
+    @staticmethod
+    def canonicalize(text: str) -> str:
+        # the goals are pretty-printed by Lean, so only the whitespace can differ between equal goals
+        return "\n".join(re.sub(r"\s+", " ", line).strip() for line in text.strip().splitlines())
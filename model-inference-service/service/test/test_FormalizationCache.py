@@ -0,0 +1,41 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from repository.TheoremRepository import TheoremRepository
+from service.FormalizationCache import FormalizationCache
+
+
+class TestFormalizationCache(TestCase):
+    def setUp(self):
+        self.theorem_repository = MagicMock(spec=TheoremRepository)
+        self.theorem_repository.find_formal_statement.return_value = None
+        self.theorem_repository.find_informal_proof.return_value = None
+        self.formalization_cache = FormalizationCache(self.theorem_repository, maximum_entries=2)
+
+    def test_get_formal_statement_reads_database_once(self):
+        self.theorem_repository.find_formal_statement.return_value = "theorem a : 1 = 1 := by"
+
+        self.assertEqual("theorem a : 1 = 1 := by", self.formalization_cache.get_formal_statement("1 = 1"))
+        self.assertEqual("theorem a : 1 = 1 := by", self.formalization_cache.get_formal_statement(" 1 = 1\n"))
+
+        self.theorem_repository.find_formal_statement.assert_called_once_with(
+            FormalizationCache.build_text_hash("1 = 1")
+        )
+        statistics = self.formalization_cache.get_statistics()
+        self.assertEqual((1, 1, 0), (statistics.memory_hits, statistics.database_hits, statistics.misses))
+
+    def test_directions_do_not_share_entries(self):
+        self.formalization_cache.put_formal_statement("text", "theorem a : 1 = 1 := by")
+
+        self.assertIsNone(self.formalization_cache.get_informal_proof("text"))
+        self.assertEqual(1, self.formalization_cache.get_statistics().misses)
+
+    def test_put_evicts_least_recently_used_entries(self):
+        self.formalization_cache.put_informal_proof("first", "1")
+        self.formalization_cache.put_informal_proof("second", "2")
+        self.formalization_cache.get_informal_proof("first")
+        self.formalization_cache.put_informal_proof("third", "3")
+
+        self.assertEqual("1", self.formalization_cache.get_informal_proof("first"))
+        self.assertIsNone(self.formalization_cache.get_informal_proof("second"))
+        self.assertEqual(2, self.formalization_cache.get_statistics().entries)
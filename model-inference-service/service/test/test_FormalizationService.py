@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 from domain.language_model.FormalizationLanguageModel import FormalizationLanguageModel
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
+from service.FormalizationCache import FormalizationCache
 from service.FormalizationService import FormalizationService
 
 
@@ -31,3 +32,19 @@ class TestFormalizationService(TestCase):
         actual_informalized_proof = self.formalization_service.deformalize("formal proof")
         self.assertEqual(expected_informal_proof, actual_informalized_proof)
 
+    def test_formalize_uses_cache_before_language_model(self):
+        formalization_cache = MagicMock(spec=FormalizationCache)
+        formalization_cache.get_formal_statement.return_value = "cached theorem"
+        formalization_service = FormalizationService(self.formalization_language_model, formalization_cache)
+
+        self.assertEqual(("cached theorem", True), formalization_service.formalize("informal theorem"))
+        self.formalization_language_model.formalize_theorem_statement.assert_not_called()
+
+    def test_deformalize_caches_successful_deformalization(self):
+        formalization_cache = MagicMock(spec=FormalizationCache)
+        formalization_cache.get_informal_proof.return_value = None
+        self.formalization_language_model.deformalize_proof.return_value = ("informal proof", True)
+        formalization_service = FormalizationService(self.formalization_language_model, formalization_cache)
+
+        self.assertEqual(("informal proof", True), formalization_service.deformalize("formal proof"))
+        formalization_cache.put_informal_proof.assert_called_once_with("formal proof", "informal proof")
@@ -4,6 +4,9 @@ from unittest.mock import MagicMock, patch
 from domain.EasyLogger import EasyLogger
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.language_model.model_factory.LoraModelAndTokenizerFactory import LoraModelAndTokenizerFactory
+from domain.language_model.model_factory.SharedBaseLoraModelAndTokenizerFactory import \
+    SharedBaseLoraModelAndTokenizerFactory
 from repository.TheoremRepository import TheoremRepository
 from repository.orm.Entities import LanguageModelEntity
 from service.ModelService import ModelService
@@ -41,3 +44,60 @@ class TestModelService(TestCase):
         actual_config = self.model_service.get_model_short_name_to_config("cpu", mock_lean_evaluator,
                                                                           mock_lean_evaluation_interpreter)
         self.assertEqual(len(self.models), len(actual_config))
+
+    @patch("domain.language_model.model_configuration.LoraModelAndPath.LoraModelAndPath.__init__")
+    def test_get_model_short_name_to_config_uses_merging_factory_for_merge_lora_models(self, mock_lora_init):
+        mock_lora_init.return_value = None
+        self.theorem_repository.get_language_models.return_value = [
+            LanguageModelEntity(model_id=1, model_name="merged", base_model_name="base", used_lora=True,
+                                hf_path="http", merge_lora=True),
+            LanguageModelEntity(model_id=2, model_name="shared", base_model_name="base", used_lora=True,
+                                hf_path="http2", merge_lora=False),
+        ]
+
+        self.model_service.get_model_short_name_to_config("cpu", MagicMock(spec=ILeanEvaluator),
+                                                          MagicMock(spec=ILeanEvaluationInterpreter))
+
+        self.assertIsInstance(mock_lora_init.call_args_list[0].args[-2], LoraModelAndTokenizerFactory)
+        self.assertIsInstance(mock_lora_init.call_args_list[1].args[-2], SharedBaseLoraModelAndTokenizerFactory)
+
+    @patch("domain.language_model.model_configuration.NonLoraModelAndPath.NonLoraModelAndPath.__init__")
+    def test_get_model_short_name_to_config_passes_draft_model(self, mock_non_lora_init):
+        mock_non_lora_init.return_value = None
+        self.theorem_repository.get_language_models.return_value = [
+            LanguageModelEntity(model_id=1, model_name="large", base_model_name="pythia-410m", used_lora=False,
+                                hf_path="http", draft_model_name="small"),
+            LanguageModelEntity(model_id=2, model_name="small", base_model_name="pythia-70m", used_lora=False,
+                                hf_path="http2"),
+            LanguageModelEntity(model_id=3, model_name="broken", base_model_name="pythia-410m", used_lora=False,
+                                hf_path="http3", draft_model_name="unknown"),
+        ]
+
+        actual_config = self.model_service.get_model_short_name_to_config("cpu", MagicMock(spec=ILeanEvaluator),
+                                                                          MagicMock(spec=ILeanEvaluationInterpreter))
+
+        self.assertEqual({"large", "small"}, set(actual_config.keys()))
+        large_model_arguments = next(call.args for call in mock_non_lora_init.call_args_list if call.args[0] == "http")
+        self.assertIs(actual_config["small"], large_model_arguments[-1])
+
+    @patch("domain.language_model.model_configuration.LoraModelAndPath.LoraModelAndPath.__init__")
+    @patch("domain.language_model.model_configuration.NonLoraModelAndPath.NonLoraModelAndPath.__init__")
+    def test_get_model_short_name_to_config_rejects_lora_adapter_draft_models(self, mock_non_lora_init,
+                                                                               mock_lora_init):
+        mock_non_lora_init.return_value = None
+        mock_lora_init.return_value = None
+        self.theorem_repository.get_language_models.return_value = [
+            LanguageModelEntity(model_id=1, model_name="large", base_model_name="pythia-410m", used_lora=False,
+                                hf_path="http", draft_model_name="adapter"),
+            LanguageModelEntity(model_id=2, model_name="adapter", base_model_name="pythia-70m", used_lora=True,
+                                hf_path="http2"),
+            LanguageModelEntity(model_id=3, model_name="merged_large", base_model_name="pythia-410m",
+                                used_lora=False, hf_path="http3", draft_model_name="merged_adapter"),
+            LanguageModelEntity(model_id=4, model_name="merged_adapter", base_model_name="pythia-70m",
+                                used_lora=True, merge_lora=True, hf_path="http4"),
+        ]
+
+        actual_config = self.model_service.get_model_short_name_to_config("cpu", MagicMock(spec=ILeanEvaluator),
+                                                                          MagicMock(spec=ILeanEvaluationInterpreter))
+
+        self.assertEqual({"adapter", "merged_large", "merged_adapter"}, set(actual_config.keys()))
@@ -3,15 +3,29 @@ from unittest.mock import patch, MagicMock
 
 from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel, THEOREM_WAS_PROVED_TACTIC
 from domain.language_model.model_configuration.NonLoraModelAndPath import NonLoraModelAndPath
+from domain.lean.CachingLeanEvaluator import CachingLeanEvaluator
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanProofState import LeanProofState
 from domain.lean.LeanUtilities import LeanUtilities
 from service.FormalizationService import FormalizationService
 from service.ProofSearchService import ProofSearchService
+from service.ProofSearchTrace import ProofSearchTrace
+from service.TacticOutcomeStore import TacticOutcomeStore
+
+
+def build_formatted_programs_one_by_one(programs, lean_evaluator, lean_evaluation_interpreter):
+    return [LeanUtilities.build_formatted_program(program, lean_evaluator, lean_evaluation_interpreter)
+            for program in programs]
 
 
 class TestProofSearchService(TestCase):
     def setUp(self):
+        build_formatted_programs_patcher = patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_programs",
+                                                 side_effect=build_formatted_programs_one_by_one)
+        build_formatted_programs_patcher.start()
+        self.addCleanup(build_formatted_programs_patcher.stop)
+
         self.model_and_path = MagicMock(spec=NonLoraModelAndPath)
         self.formalization_service = MagicMock(spec=FormalizationService)
         self.lean_evaluator = MagicMock(spec=ILeanEvaluator)
@@ -96,6 +110,341 @@ linarith"""
             count_tactics += 1
         self.assertEqual(theorem + ("\n" + mock_tactic) * count_tactics, proof)
 
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_expands_duplicate_proof_states_once_keeping_shortest_program(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", "[GOAL]b[PROOFSTEP]", "[GOAL]b[PROOFSTEP]",
+                                                    LeanUtilities.PROVED_FORMATTED_PROGRAM,
+                                                    LeanUtilities.ERROR_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["long tactic", "t"], [1.0, 2.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        proof, is_proof_found = self.proof_search_service.search_proof(theorem, "model1")
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\nt\nlong tactic", proof)
+        self.assertEqual(2, mock_proof_search_language_model.get_several_next_tactics.call_count)
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_ignores_tactics_leading_back_to_expanded_proof_states(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", "[GOAL]b[PROOFSTEP]", "[GOAL]a[PROOFSTEP]",
+                                                    "[GOAL]c[PROOFSTEP]", LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["tactic"], [1.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        proof, is_proof_found = self.proof_search_service.search_proof(theorem, "model1")
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\ntactic\ntactic\ntactic", proof)
+        self.assertEqual(4, mock_proof_search_language_model.get_several_next_tactics.call_count)
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_with_frontier_batch_expands_several_nodes_per_generate_call(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        proof_search_service = ProofSearchService(
+            self.formalization_service,
+            self.lean_evaluator,
+            self.lean_evaluation_interpreter,
+            {"model1": self.model_and_path},
+            "cpu",
+            frontier_batch_size=2
+        )
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", "[GOAL]b[PROOFSTEP]", "[GOAL]c[PROOFSTEP]",
+                                                    LeanUtilities.ERROR_FORMATTED_PROGRAM,
+                                                    LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics_batch.side_effect = [
+            ([["first", "second"]], [[1.0, 2.0]]),
+            ([["third"], ["fourth"]], [[1.0], [1.0]])
+        ]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        proof, is_proof_found = proof_search_service.search_proof(theorem, "model1")
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\nfirst\nfourth", proof)
+        mock_proof_search_language_model.get_several_next_tactics_batch.assert_called_with(
+            ["[GOAL]c[PROOFSTEP]", "[GOAL]b[PROOFSTEP]"],
+            ProofSearchService.SEARCH_BUDGET_PER_STEP
+        )
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_programs_from_proof_states")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_in_incremental_mode_runs_tactics_on_parent_proof_states(
+            self,
+            mock_build_formatted_program,
+            mock_build_formatted_programs_from_proof_states,
+            mock_get_or_load_language_model
+    ):
+        proof_search_service = ProofSearchService(
+            self.formalization_service,
+            self.lean_evaluator,
+            self.lean_evaluation_interpreter,
+            {"model1": self.model_and_path},
+            "cpu",
+            incremental_tactic_checking=True
+        )
+        root_proof_state = LeanProofState(1, 0)
+        child_proof_state = LeanProofState(1, 1)
+        self.lean_evaluator.start_proof.return_value = root_proof_state
+        mock_build_formatted_program.return_value = "[GOAL]a[PROOFSTEP]"
+        mock_build_formatted_programs_from_proof_states.side_effect = [
+            [("[GOAL]b[PROOFSTEP]", child_proof_state)],
+            [(LeanUtilities.PROVED_FORMATTED_PROGRAM, None)]
+        ]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["tactic"], [1.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        proof, is_proof_found = proof_search_service.search_proof(theorem, "model1")
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\ntactic\ntactic", proof)
+        self.lean_evaluator.start_proof.assert_called_once_with(theorem)
+        mock_build_formatted_programs_from_proof_states.assert_called_with(
+            [theorem + "\ntactic"], [child_proof_state], ["tactic"], self.lean_evaluator,
+            self.lean_evaluation_interpreter
+        )
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_with_tactic_outcome_store_only_checks_unknown_tactics_with_lean(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        tactic_outcome_store = MagicMock(spec=TacticOutcomeStore)
+        tactic_outcome_store.get_outcomes.return_value = [LeanUtilities.ERROR_FORMATTED_PROGRAM, None]
+        proof_search_service = ProofSearchService(
+            self.formalization_service,
+            self.lean_evaluator,
+            self.lean_evaluation_interpreter,
+            {"model1": self.model_and_path},
+            "cpu",
+            tactic_outcome_store=tactic_outcome_store
+        )
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["known", "unknown"], [1.0, 2.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        proof, is_proof_found = proof_search_service.search_proof(theorem, "model1")
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\nunknown", proof)
+        self.assertEqual(2, mock_build_formatted_program.call_count)
+        tactic_outcome_store.get_outcomes.assert_called_once_with(
+            "model1", [("[GOAL]a[PROOFSTEP]", "known"), ("[GOAL]a[PROOFSTEP]", "unknown")], ""
+        )
+        tactic_outcome_store.add_outcomes.assert_called_once_with(
+            "model1", [("[GOAL]a[PROOFSTEP]", "unknown", LeanUtilities.PROVED_FORMATTED_PROGRAM)], ""
+        )
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_ignores_timed_out_tactics_and_does_not_store_their_outcome(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        tactic_outcome_store = MagicMock(spec=TacticOutcomeStore)
+        tactic_outcome_store.get_outcomes.return_value = [None, None]
+        proof_search_service = ProofSearchService(
+            self.formalization_service,
+            self.lean_evaluator,
+            self.lean_evaluation_interpreter,
+            {"model1": self.model_and_path},
+            "cpu",
+            tactic_outcome_store=tactic_outcome_store
+        )
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", LeanUtilities.TIMEOUT_FORMATTED_PROGRAM,
+                                                    LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["simp", "linarith"], [2.0, 1.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        trace = ProofSearchTrace()
+        proof, is_proof_found = proof_search_service.search_proof(theorem, "model1", trace=trace)
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\nlinarith", proof)
+        tactic_outcome_store.add_outcomes.assert_called_once_with(
+            "model1", [("[GOAL]a[PROOFSTEP]", "linarith", LeanUtilities.PROVED_FORMATTED_PROGRAM)], ""
+        )
+        self.assertIn({"type": "tactic", "goal": "[GOAL]a[PROOFSTEP]", "tactic": "simp", "score": 2.0,
+                       "outcome": ProofSearchService.TIMEOUT_OUTCOME}, trace.get_events())
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_does_not_store_the_outcome_of_tactics_failed_by_a_lean_server_error(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        tactic_outcome_store = MagicMock(spec=TacticOutcomeStore)
+        tactic_outcome_store.get_outcomes.return_value = [None, None]
+        proof_search_service = ProofSearchService(
+            self.formalization_service,
+            self.lean_evaluator,
+            self.lean_evaluation_interpreter,
+            {"model1": self.model_and_path},
+            "cpu",
+            tactic_outcome_store=tactic_outcome_store
+        )
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]",
+                                                    LeanUtilities.TRANSIENT_ERROR_FORMATTED_PROGRAM,
+                                                    LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["simp", "linarith"], [2.0, 1.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        trace = ProofSearchTrace()
+        proof, is_proof_found = proof_search_service.search_proof(theorem, "model1", trace=trace)
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\nlinarith", proof)
+        tactic_outcome_store.add_outcomes.assert_called_once_with(
+            "model1", [("[GOAL]a[PROOFSTEP]", "linarith", LeanUtilities.PROVED_FORMATTED_PROGRAM)], ""
+        )
+        self.assertIn({"type": "tactic", "goal": "[GOAL]a[PROOFSTEP]", "tactic": "simp", "score": 2.0,
+                       "outcome": ProofSearchService.ERROR_OUTCOME}, trace.get_events())
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_returns_automation_tactic_proof_without_generating_tactics(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        proof_search_service = ProofSearchService(
+            self.formalization_service,
+            self.lean_evaluator,
+            self.lean_evaluation_interpreter,
+            {"model1": self.model_and_path},
+            "cpu",
+            automation_tactics=("simp", "norm_num"),
+            automation_tactic_max_heartbeats=100
+        )
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", LeanUtilities.ERROR_FORMATTED_PROGRAM,
+                                                    LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        proof, is_proof_found = proof_search_service.search_proof(theorem, "model1")
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\nnorm_num", proof)
+        mock_build_formatted_program.assert_called_with(theorem + "\nset_option maxHeartbeats 100 in norm_num",
+                                                        self.lean_evaluator, self.lean_evaluation_interpreter)
+        mock_proof_search_language_model.get_several_next_tactics.assert_not_called()
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_tries_automation_tactics_on_new_goals(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        proof_search_service = ProofSearchService(
+            self.formalization_service,
+            self.lean_evaluator,
+            self.lean_evaluation_interpreter,
+            {"model1": self.model_and_path},
+            "cpu",
+            automation_tactics=("simp",)
+        )
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", "[GOAL]a[PROOFSTEP]",
+                                                    "[GOAL]b[PROOFSTEP]", LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["tactic"], [1.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+
+        proof, is_proof_found = proof_search_service.search_proof(theorem, "model1")
+        self.assertTrue(is_proof_found)
+        self.assertEqual(theorem + "\ntactic\nsimp", proof)
+        mock_proof_search_language_model.get_several_next_tactics.assert_called_once()
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_records_expansions_and_tactic_outcomes_in_trace(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        mock_build_formatted_program.side_effect = ["[GOAL]a[PROOFSTEP]", LeanUtilities.ERROR_FORMATTED_PROGRAM,
+                                                    LeanUtilities.PROVED_FORMATTED_PROGRAM]
+
+        mock_proof_search_language_model = MagicMock(spec=ProofSearchLanguageModel)
+        mock_proof_search_language_model.get_several_next_tactics.return_value = ["bad", "good"], [-1.0, -2.0]
+        mock_get_or_load_language_model.return_value = mock_proof_search_language_model
+
+        theorem = """theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by"""
+        trace = ProofSearchTrace()
+
+        self.proof_search_service.search_proof(theorem, "model1", trace)
+
+        summary = trace.get_summary()
+        self.assertEqual(1, summary.expansions)
+        self.assertEqual(2, summary.generated_tactics)
+        self.assertGreater(summary.total_seconds, 0)
+        tactic_events = [event for event in trace.get_events() if event["type"] == "tactic"]
+        self.assertEqual([("bad", ProofSearchService.ERROR_OUTCOME), ("good", ProofSearchService.PROVED_OUTCOME)],
+                         [(event["tactic"], event["outcome"]) for event in tactic_events])
+
+    @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
+    @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
+    def test_search_proof_records_lean_evaluation_cache_hits_of_the_search_in_trace(
+            self,
+            mock_build_formatted_program,
+            mock_get_or_load_language_model
+    ):
+        mock_build_formatted_program.return_value = LeanUtilities.PROVED_FORMATTED_PROGRAM
+        caching_lean_evaluator = MagicMock(spec=CachingLeanEvaluator)
+        caching_lean_evaluator.get_thread_hits_and_misses.side_effect = [(3, 5), (7, 6)]
+        proof_search_service = ProofSearchService(self.formalization_service, caching_lean_evaluator,
+                                                  self.lean_evaluation_interpreter, {"model1": self.model_and_path},
+                                                  "cpu")
+        trace = ProofSearchTrace()
+
+        proof_search_service.search_proof("theorem my_theorem : 1 = 1 := by", "model1", trace)
+
+        summary = trace.get_summary()
+        self.assertEqual((4, 1), (summary.lean_evaluation_cache_hits, summary.lean_evaluation_cache_misses))
 
     @patch("service.ProofSearchService.ProofSearchService.get_or_load_language_model")
     @patch("domain.lean.LeanUtilities.LeanUtilities.build_formatted_program")
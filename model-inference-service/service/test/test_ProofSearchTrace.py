@@ -0,0 +1,46 @@
+import json
+from unittest import TestCase
+
+from service.ProofSearchTrace import ProofSearchTrace
+
+
+class TestProofSearchTrace(TestCase):
+    def test_get_summary_aggregates_times_and_counters(self):
+        trace = ProofSearchTrace()
+
+        trace.add_time(ProofSearchTrace.LEAN, 1.5)
+        trace.add_time(ProofSearchTrace.LEAN, 0.5)
+        trace.add_time(ProofSearchTrace.LANGUAGE_MODEL, 3.0)
+        trace.add_count(ProofSearchTrace.GENERATED_TACTICS, 4)
+        trace.add_count(ProofSearchTrace.TACTIC_OUTCOME_STORE_HITS)
+        trace.add_count(ProofSearchTrace.LEAN_EVALUATION_CACHE_HITS, 2)
+        trace.add_expansion("[GOAL]a[PROOFSTEP]", 0)
+
+        summary = trace.get_summary()
+        self.assertEqual(2.0, summary.lean_seconds)
+        self.assertEqual(3.0, summary.language_model_seconds)
+        self.assertEqual(0.0, summary.database_seconds)
+        self.assertEqual(4, summary.generated_tactics)
+        self.assertEqual(1, summary.tactic_outcome_store_hits)
+        self.assertEqual(2, summary.lean_evaluation_cache_hits)
+        self.assertEqual(1, summary.expansions)
+
+    def test_measure_adds_time_even_if_block_raises(self):
+        trace = ProofSearchTrace()
+
+        with self.assertRaises(ValueError):
+            with trace.measure(ProofSearchTrace.DATABASE):
+                raise ValueError()
+
+        self.assertGreaterEqual(trace.get_summary().database_seconds, 0)
+        self.assertEqual(1, len(trace.get_events()))
+
+    def test_to_json_exports_summary_and_events(self):
+        trace = ProofSearchTrace()
+        trace.add_tactic("[GOAL]a[PROOFSTEP]", "simp", -0.5, "proved")
+
+        exported_trace = json.loads(trace.to_json())
+
+        self.assertEqual(0, exported_trace["summary"]["expansions"])
+        self.assertEqual([{"type": "tactic", "goal": "[GOAL]a[PROOFSTEP]", "tactic": "simp", "score": -0.5,
+                           "outcome": "proved"}], exported_trace["events"])
@@ -0,0 +1,60 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from repository.TheoremRepository import TheoremRepository
+from service.TacticOutcomeStore import TacticOutcomeStore
+
+
+class TestTacticOutcomeStore(TestCase):
+    def setUp(self):
+        self.theorem_repository = MagicMock(spec=TheoremRepository)
+        self.theorem_repository.add_tactic_outcomes.side_effect = \
+            lambda _, outcome_key_to_outcome: len(outcome_key_to_outcome)
+        self.tactic_outcome_store = TacticOutcomeStore(self.theorem_repository, maximum_entries=100, trim_interval=3)
+
+    def test_get_outcomes_returns_none_for_unknown_tactics(self):
+        known_key = TacticOutcomeStore.build_outcome_key("model1", "[GOAL]a[PROOFSTEP]", "simp")
+        self.theorem_repository.get_tactic_outcomes.return_value = {known_key: "error"}
+
+        outcomes = self.tactic_outcome_store.get_outcomes(
+            "model1", [("[GOAL]a[PROOFSTEP]", "simp"), ("[GOAL]a[PROOFSTEP]", "linarith")]
+        )
+
+        self.assertEqual(["error", None], outcomes)
+
+    def test_add_outcomes_stores_outcomes_in_repository(self):
+        self.tactic_outcome_store.add_outcomes("model1", [("[GOAL]a[PROOFSTEP]", "simp", "error")])
+
+        self.theorem_repository.add_tactic_outcomes.assert_called_once_with(
+            "model1",
+            {TacticOutcomeStore.build_outcome_key("model1", "[GOAL]a[PROOFSTEP]", "simp"): "error"}
+        )
+
+    def test_add_outcomes_trims_repository_every_trim_interval_entries(self):
+        self.tactic_outcome_store.add_outcomes("model1", [("[GOAL]a[PROOFSTEP]", "simp", "error"),
+                                                          ("[GOAL]a[PROOFSTEP]", "ring", "error")])
+        self.theorem_repository.trim_tactic_outcomes.assert_not_called()
+
+        self.tactic_outcome_store.add_outcomes("model1", [("[GOAL]a[PROOFSTEP]", "linarith", "error")])
+        self.theorem_repository.trim_tactic_outcomes.assert_called_once_with(100)
+
+        self.tactic_outcome_store.add_outcomes("model1", [("[GOAL]a[PROOFSTEP]", "omega", "error")])
+        self.theorem_repository.trim_tactic_outcomes.assert_called_once_with(100)
+
+    def test_build_outcome_key_ignores_whitespace_differences_in_goal(self):
+        self.assertEqual(
+            TacticOutcomeStore.build_outcome_key("model1", "[GOAL]x : ℕ\n⊢  x = 6[PROOFSTEP]", "simp"),
+            TacticOutcomeStore.build_outcome_key("model1", "[GOAL]x : ℕ\n  ⊢ x = 6[PROOFSTEP]", " simp")
+        )
+
+    def test_build_outcome_key_depends_on_model(self):
+        self.assertNotEqual(
+            TacticOutcomeStore.build_outcome_key("model1", "[GOAL]a[PROOFSTEP]", "simp"),
+            TacticOutcomeStore.build_outcome_key("model2", "[GOAL]a[PROOFSTEP]", "simp")
+        )
+
+    def test_build_outcome_key_depends_on_environment_header(self):
+        self.assertNotEqual(
+            TacticOutcomeStore.build_outcome_key("model1", "[GOAL]a[PROOFSTEP]", "simp"),
+            TacticOutcomeStore.build_outcome_key("model1", "[GOAL]a[PROOFSTEP]", "simp", "open Finset")
+        )
@@ -1,14 +1,23 @@
 import os
 import sys
+import threading
 
 sys.path.append("/shared")
 
 from domain.lean.LeanInteractFacade import LeanInteractFacade
+from domain.lean.LeanEnvironmentCache import LeanEnvironmentCache
+from domain.lean.CachingLeanEvaluator import CachingLeanEvaluator
+from domain.lean.LeanServerPool import LeanServerPool
 
 from sqlalchemy import create_engine
 
+from domain.language_model.BatchingInferenceServer import BatchingInferenceServer
 from domain.language_model.FormalizationLanguageModel import FormalizationLanguageModel
+from domain.language_model.OpenAIChatClient import OpenAIChatClient
+from domain.language_model.model_configuration.BatchingModelAndPath import BatchingModelAndPath
+from domain.language_model.model_configuration.LanguageModelCache import LanguageModelCache
 from repository.TheoremRepository import TheoremRepository
+from service.FormalizationCache import FormalizationCache
 from service.FormalizationService import FormalizationService
 from service.ModelService import ModelService
 from domain.lean.MockLeanExecutor import MockLeanExecutor
@@ -20,8 +29,32 @@ from domain.EasyLogger import EasyLogger
 
 from dotenv import load_dotenv
 from service.ProofSearchService import ProofSearchService
+from service.TacticOutcomeStore import TacticOutcomeStore
 
 FORMALIZATION_MODEL_NAME = "gpt-4.1-mini-2025-04-14"
+DEFAULT_PROOF_SEARCH_FRONTIER_BATCH_SIZE = "1"
+DEFAULT_LEAN_SERVER_POOL_SIZE = "1"
+DEFAULT_PROOF_SEARCH_INCREMENTAL_TACTIC_CHECKING = "true"
+DEFAULT_TACTIC_OUTCOME_STORE_ENABLED = "true"
+DEFAULT_PROOF_SEARCH_AUTOMATION_TACTICS = "norm_num,simp,linarith,omega,decide,aesop"
+DEFAULT_PROOF_SEARCH_AUTOMATION_TACTIC_MAX_HEARTBEATS = str(ProofSearchService.DEFAULT_AUTOMATION_TACTIC_MAX_HEARTBEATS)
+DEFAULT_LANGUAGE_MODEL_MEMORY_BUDGET_MB = "8192"
+DEFAULT_LANGUAGE_MODEL_IDLE_UNLOAD_SECONDS = "1800"
+DEFAULT_TACTIC_OUTCOME_STORE_MAXIMUM_ENTRIES = str(TacticOutcomeStore.DEFAULT_MAXIMUM_ENTRIES)
+DEFAULT_TACTIC_OUTCOME_STORE_TRIM_INTERVAL = str(TacticOutcomeStore.DEFAULT_TRIM_INTERVAL)
+DEFAULT_CONCURRENT_PROOF_SEARCHES = "1"
+DEFAULT_LEAN_REPL_MAXIMUM_MEMORY_MB = str(LeanInteractFacade.DEFAULT_MAXIMUM_MEMORY_MB)
+DEFAULT_LEAN_REPL_MAXIMUM_SERVER_ERROR_RATE = str(LeanInteractFacade.DEFAULT_MAXIMUM_SERVER_ERROR_RATE)
+DEFAULT_LEAN_COMMAND_TIMEOUT_SECONDS = str(LeanInteractFacade.DEFAULT_COMMAND_TIMEOUT_SECONDS)
+DEFAULT_LEAN_MAX_HEARTBEATS = str(LeanInteractFacade.DEFAULT_MAX_HEARTBEATS)
+DEFAULT_LEAN_ENVIRONMENT_CACHE_MAXIMUM_ENTRIES = str(LeanEnvironmentCache.DEFAULT_MAXIMUM_ENVIRONMENTS)
+DEFAULT_FORMALIZATION_CANDIDATES_PER_REQUEST = "4"
+DEFAULT_FORMALIZATION_CACHE_ENABLED = "true"
+DEFAULT_OPENAI_MAXIMUM_CONCURRENT_REQUESTS = str(OpenAIChatClient.DEFAULT_MAXIMUM_CONCURRENT_REQUESTS)
+DEFAULT_OPENAI_DEADLINE_SECONDS = str(OpenAIChatClient.DEFAULT_DEADLINE_SECONDS)
+DEFAULT_FORMALIZATION_CACHE_MAXIMUM_ENTRIES = str(FormalizationCache.DEFAULT_MAXIMUM_ENTRIES)
+DEFAULT_INFERENCE_SERVER_MAXIMUM_BATCH_SIZE = str(BatchingInferenceServer.DEFAULT_MAXIMUM_BATCH_SIZE)
+DEFAULT_INFERENCE_SERVER_MAXIMUM_WAIT_MS = str(int(BatchingInferenceServer.DEFAULT_MAXIMUM_WAIT_SECONDS * 1000))
 
 
 def __build_db_url(username: str, password: str, endpoint: str, port: str, db_name: str) -> str:
@@ -40,41 +73,135 @@ if __name__ == '__main__':
         aws_secret_access_key=os.environ['AWS_IAM_SECRET_ACCESS_KEY']
     )
 
-    lean_interact_facade = LeanInteractFacade()
+    # every concurrent search runs its own TheoremQueueListener thread, and they share the models
+    concurrent_proof_searches = int(os.getenv("CONCURRENT_PROOF_SEARCHES", DEFAULT_CONCURRENT_PROOF_SEARCHES))
+
+    # the REPL is recycled on a standby server once it uses too much memory or keeps failing
+    lean_repl_maximum_memory_mb = int(os.getenv("LEAN_REPL_MAXIMUM_MEMORY_MB", DEFAULT_LEAN_REPL_MAXIMUM_MEMORY_MB))
+    lean_repl_maximum_server_error_rate = float(os.getenv("LEAN_REPL_MAXIMUM_SERVER_ERROR_RATE",
+                                                          DEFAULT_LEAN_REPL_MAXIMUM_SERVER_ERROR_RATE))
+    # a command which runs out of time kills its REPL, so a single looping tactic cannot stall the queue
+    lean_command_timeout_seconds = float(os.getenv("LEAN_COMMAND_TIMEOUT_SECONDS",
+                                                   DEFAULT_LEAN_COMMAND_TIMEOUT_SECONDS))
+    lean_max_heartbeats = int(os.getenv("LEAN_MAX_HEARTBEATS", DEFAULT_LEAN_MAX_HEARTBEATS))
+    # environments of theorems with their own imports, options or opens
+    lean_environment_cache_maximum_entries = int(os.getenv("LEAN_ENVIRONMENT_CACHE_MAXIMUM_ENTRIES",
+                                                           DEFAULT_LEAN_ENVIRONMENT_CACHE_MAXIMUM_ENTRIES))
+
+    def lean_server_factory():
+        return LeanInteractFacade(maximum_memory_mb=lean_repl_maximum_memory_mb,
+                                  maximum_server_error_rate=lean_repl_maximum_server_error_rate,
+                                  environment_snapshot_directory=os.getenv("LEAN_ENVIRONMENT_SNAPSHOT_DIRECTORY"),
+                                  command_timeout_seconds=lean_command_timeout_seconds,
+                                  max_heartbeats=lean_max_heartbeats,
+                                  maximum_environments=lean_environment_cache_maximum_entries)
+
+    lean_server_pool_size = int(os.getenv("LEAN_SERVER_POOL_SIZE", DEFAULT_LEAN_SERVER_POOL_SIZE))
+    # unlike LeanInteractFacade, the pool can be used by several threads
+    if lean_server_pool_size > 1 or concurrent_proof_searches > 1:
+        lean_interact_facade = LeanServerPool(lean_server_pool_size, lean_server_factory)
+        formalization_verification_parallelism = lean_server_pool_size
+    else:
+        formalization_verification_parallelism = 1
+        lean_interact_facade = lean_server_factory()
     # lean_interact_facade = MockLeanExecutor()
     # lean_interact_facade = LakeReplFacade()
-
-    formalization_language_model = FormalizationLanguageModel(
-        FORMALIZATION_MODEL_NAME,
-        os.getenv('OPENAI_KEY'),
-        lean_interact_facade,
-        lean_interact_facade
-    )
-    formalization_service = FormalizationService(formalization_language_model)
+    lean_interact_facade = CachingLeanEvaluator(lean_interact_facade, lean_interact_facade)
 
     db_url = __build_db_url(os.environ["AWS_RDS_USERNAME"], os.environ["AWS_RDS_PASSWORD"],
                             os.environ['AWS_RDS_ENDPOINT'],
                             os.environ['AWS_RDS_PORT'], os.environ['AWS_RDS_DB_NAME'])
     db_engine = create_engine(db_url, pool_pre_ping=True)
     theorem_repository = TheoremRepository(db_engine, EasyLogger())
+    theorem_repository.upgrade_proof_table()
+    theorem_repository.upgrade_formalization_table()
+    theorem_repository.upgrade_language_model_table()
+
+    openai_chat_client = None
+    if os.getenv('OPENAI_KEY'):
+        openai_chat_client = OpenAIChatClient(
+            os.getenv('OPENAI_KEY'),
+            None,
+            int(os.getenv("OPENAI_MAXIMUM_CONCURRENT_REQUESTS", DEFAULT_OPENAI_MAXIMUM_CONCURRENT_REQUESTS)),
+            float(os.getenv("OPENAI_DEADLINE_SECONDS", DEFAULT_OPENAI_DEADLINE_SECONDS))
+        )
+    formalization_language_model = FormalizationLanguageModel(
+        FORMALIZATION_MODEL_NAME,
+        os.getenv('OPENAI_KEY'),
+        lean_interact_facade,
+        lean_interact_facade,
+        int(os.getenv("FORMALIZATION_CANDIDATES_PER_REQUEST", DEFAULT_FORMALIZATION_CANDIDATES_PER_REQUEST)),
+        formalization_verification_parallelism,
+        openai_chat_client
+    )
+    formalization_cache = None
+    if os.getenv("FORMALIZATION_CACHE_ENABLED", DEFAULT_FORMALIZATION_CACHE_ENABLED).lower() == "true":
+        formalization_cache = FormalizationCache(
+            theorem_repository,
+            int(os.getenv("FORMALIZATION_CACHE_MAXIMUM_ENTRIES", DEFAULT_FORMALIZATION_CACHE_MAXIMUM_ENTRIES))
+        )
+    formalization_service = FormalizationService(formalization_language_model, formalization_cache)
 
     model_service = ModelService(EasyLogger(), theorem_repository)
 
+    tactic_outcome_store = None
+    if os.getenv("TACTIC_OUTCOME_STORE_ENABLED", DEFAULT_TACTIC_OUTCOME_STORE_ENABLED).lower() == "true":
+        # e.g. sqlite:///tactic_outcomes.db when running locally; the main database is used otherwise
+        tactic_outcome_db_url = os.getenv("TACTIC_OUTCOME_STORE_DB_URL")
+        tactic_outcome_repository = theorem_repository if tactic_outcome_db_url is None \
+            else TheoremRepository(create_engine(tactic_outcome_db_url), EasyLogger())
+        tactic_outcome_repository.create_tactic_outcome_table()
+        tactic_outcome_store = TacticOutcomeStore(
+            tactic_outcome_repository,
+            int(os.getenv("TACTIC_OUTCOME_STORE_MAXIMUM_ENTRIES", DEFAULT_TACTIC_OUTCOME_STORE_MAXIMUM_ENTRIES)),
+            int(os.getenv("TACTIC_OUTCOME_STORE_TRIM_INTERVAL", DEFAULT_TACTIC_OUTCOME_STORE_TRIM_INTERVAL))
+        )
+
+    language_model_cache = LanguageModelCache(
+        int(os.getenv("LANGUAGE_MODEL_MEMORY_BUDGET_MB", DEFAULT_LANGUAGE_MODEL_MEMORY_BUDGET_MB)) * 1024 * 1024,
+        float(os.getenv("LANGUAGE_MODEL_IDLE_UNLOAD_SECONDS", DEFAULT_LANGUAGE_MODEL_IDLE_UNLOAD_SECONDS))
+    )
     model_short_name_to_config = model_service.get_model_short_name_to_config(device, lean_interact_facade,
-                                                                              lean_interact_facade)
+                                                                              lean_interact_facade,
+                                                                              language_model_cache,
+                                                                              os.getenv("MERGED_LORA_CACHE_DIRECTORY"))
+    if concurrent_proof_searches > 1:
+        inference_server = BatchingInferenceServer(
+            int(os.getenv("INFERENCE_SERVER_MAXIMUM_BATCH_SIZE", DEFAULT_INFERENCE_SERVER_MAXIMUM_BATCH_SIZE)),
+            int(os.getenv("INFERENCE_SERVER_MAXIMUM_WAIT_MS", DEFAULT_INFERENCE_SERVER_MAXIMUM_WAIT_MS)) / 1000
+        )
+        model_short_name_to_config = {
+            model_short_name: BatchingModelAndPath(model_and_path, inference_server)
+            for model_short_name, model_and_path in model_short_name_to_config.items()
+        }
     proof_search_service = ProofSearchService(
         formalization_service,
         lean_interact_facade,
         lean_interact_facade,
         model_short_name_to_config,
-        device
+        device,
+        int(os.getenv("PROOF_SEARCH_FRONTIER_BATCH_SIZE", DEFAULT_PROOF_SEARCH_FRONTIER_BATCH_SIZE)),
+        os.getenv("PROOF_SEARCH_INCREMENTAL_TACTIC_CHECKING",
+                  DEFAULT_PROOF_SEARCH_INCREMENTAL_TACTIC_CHECKING).lower() == "true",
+        tactic_outcome_store,
+        tuple(automation_tactic.strip() for automation_tactic in os.getenv(
+            "PROOF_SEARCH_AUTOMATION_TACTICS", DEFAULT_PROOF_SEARCH_AUTOMATION_TACTICS
+        ).split(",") if automation_tactic.strip()),
+        int(os.getenv("PROOF_SEARCH_AUTOMATION_TACTIC_MAX_HEARTBEATS",
+                      DEFAULT_PROOF_SEARCH_AUTOMATION_TACTIC_MAX_HEARTBEATS))
     )
 
-    theorem_queue_listener = TheoremQueueListener(
-        sqs_client,
-        sqs_url,
-        proof_search_service,
-        theorem_repository,
-        EasyLogger()
-    )
-    theorem_queue_listener.listen()
+    theorem_queue_listener_threads = [
+        threading.Thread(target=TheoremQueueListener(
+            sqs_client,
+            sqs_url,
+            proof_search_service,
+            theorem_repository,
+            EasyLogger()
+        ).listen)
+        for _ in range(concurrent_proof_searches)
+    ]
+    for theorem_queue_listener_thread in theorem_queue_listener_threads:
+        theorem_queue_listener_thread.start()
+    for theorem_queue_listener_thread in theorem_queue_listener_threads:
+        theorem_queue_listener_thread.join()
@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from domain.EasyLogger import EasyLogger
+from domain.language_model.BatchingInferenceServerStatistics import BatchingInferenceServerStatistics
+from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+
+
+class BatchingInferenceServer:
+    """
+    Serves get_several_next_tactics_batch requests of concurrent proof searches from a single thread.
+    Once a request arrives, the server waits at most maximum_wait_seconds for more requests, then runs the goals
+    of all the requests for the same model and number of tactics as one generate call of at most
+    maximum_batch_size goals. A request is never split, so a larger request is run as a batch on its own.
+    """
+    DEFAULT_MAXIMUM_BATCH_SIZE = 32
+    DEFAULT_MAXIMUM_WAIT_SECONDS = 0.01
+
+    def __init__(
+            self,
+            maximum_batch_size: int = DEFAULT_MAXIMUM_BATCH_SIZE,
+            maximum_wait_seconds: float = DEFAULT_MAXIMUM_WAIT_SECONDS
+    ):
+        self.__logger = EasyLogger()
+        self.__maximum_batch_size = maximum_batch_size
+        self.__maximum_wait_seconds = maximum_wait_seconds
+        # (language model, goals, number of tactics, future), or None to stop the server
+        self.__requests: queue.Queue[tuple[ProofSearchLanguageModel, list[str], int, Future] | None] = queue.Queue()
+        self.__statistics_lock = threading.Lock()
+        self.__number_of_requests = 0
+        self.__number_of_batches = 0
+        self.__number_of_batched_goals = 0
+
+        self.__thread = threading.Thread(target=self.__serve, daemon=True)
+        self.__thread.start()
+
+    def get_several_next_tactics_batch(
+            self,
+            language_model: ProofSearchLanguageModel,
+            goals_batch: list[str],
+            number_of_tactics: int
+    ) -> tuple[list[list[str]], list[list[float]]]:
+        """
+        Blocks until the batch holding goals_batch has been generated, and returns the same result as
+        language_model.get_several_next_tactics_batch(goals_batch, number_of_tactics).
+        """
+        future = Future()
+        self.__requests.put((language_model, goals_batch, number_of_tactics, future))
+        return future.result()
+
+    def get_statistics(self) -> BatchingInferenceServerStatistics:
+        with self.__statistics_lock:
+            return BatchingInferenceServerStatistics(
+                self.__number_of_requests,
+                self.__number_of_batches,
+                self.__number_of_batched_goals,
+                self.__number_of_batched_goals / self.__number_of_batches if self.__number_of_batches > 0 else 0.0
+            )
+
+    def shutdown(self):
+        self.__requests.put(None)
+        self.__thread.join()
+
+    def __serve(self):
+        while True:
+            request = self.__requests.get()
+            if request is None:
+                return
+            pending_requests = [request]
+            number_of_pending_goals = len(request[1])
+            deadline = time.monotonic() + self.__maximum_wait_seconds
+            stopping = False
+            while number_of_pending_goals < self.__maximum_batch_size:
+                remaining_seconds = deadline - time.monotonic()
+                if remaining_seconds <= 0:
+                    break
+                try:
+                    request = self.__requests.get(timeout=remaining_seconds)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                pending_requests.append(request)
+                number_of_pending_goals += len(request[1])
+
+            for batch in self.__build_batches(pending_requests):
+                self.__run_batch(batch)
+            if stopping:
+                return
+
+    def __build_batches(self, requests: list[tuple]) -> list[list[tuple]]:
+        model_key_to_batches: dict[tuple[int, int], list[list[tuple]]] = dict()
+        for request in requests:
+            language_model, goals_batch, number_of_tactics, _ = request
+            batches = model_key_to_batches.setdefault((id(language_model), number_of_tactics), [[]])
+            number_of_batch_goals = sum(len(batch_request[1]) for batch_request in batches[-1])
+            if batches[-1] and number_of_batch_goals + len(goals_batch) > self.__maximum_batch_size:
+                batches.append([])
+            batches[-1].append(request)
+        return [batch for batches in model_key_to_batches.values() for batch in batches]
+
+    def __run_batch(self, batch: list[tuple]):
+        language_model, _, number_of_tactics, _ = batch[0]
+        goals = [goal for _, goals_batch, _, _ in batch for goal in goals_batch]
+        self.__logger.debug(f"Will generate tactics for {len(goals)} goals of {len(batch)} requests")
+        with self.__statistics_lock:
+            self.__number_of_requests += len(batch)
+            self.__number_of_batches += 1
+            self.__number_of_batched_goals += len(goals)
+
+        try:
+            tactics_per_goal, scores_per_goal = language_model.get_several_next_tactics_batch(goals,
+                                                                                              number_of_tactics)
+        except Exception as error:
+            self.__logger.error(f"Error while generating a batch of {len(goals)} goals: {error}")
+            for _, _, _, future in batch:
+                future.set_exception(error)
+            return
+
+        start = 0
+        for _, goals_batch, _, future in batch:
+            end = start + len(goals_batch)
+            future.set_result((tactics_per_goal[start:end], scores_per_goal[start:end]))
+            start = end
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BatchingInferenceServerStatistics:
+    requests: int
+    batches: int
+    batched_goals: int
+    average_batch_size: float
@@ -0,0 +1,35 @@
+from domain.language_model.BatchingInferenceServer import BatchingInferenceServer
+from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+from domain.language_model.SpeculativeDecodingStatistics import SpeculativeDecodingStatistics
+
+
+class BatchingProofSearchLanguageModel:
+    """
+    Stands in for a ProofSearchLanguageModel shared by concurrent proof searches. The tactics are generated by a
+    BatchingInferenceServer, which batches the goals of all the searches together.
+    """
+
+    def __init__(self, language_model: ProofSearchLanguageModel, inference_server: BatchingInferenceServer):
+        self.__language_model = language_model
+        self.__inference_server = inference_server
+
+    def get_several_next_tactics(self, goals: str, number_of_tactics: int) -> tuple[list[str], list[float]]:
+        tactics_per_goal, scores_per_goal = self.get_several_next_tactics_batch([goals], number_of_tactics)
+        return tactics_per_goal[0], scores_per_goal[0]
+
+    def get_several_next_tactics_batch(
+            self,
+            goals_batch: list[str],
+            number_of_tactics: int
+    ) -> tuple[list[list[str]], list[list[float]]]:
+        return self.__inference_server.get_several_next_tactics_batch(self.__language_model, goals_batch,
+                                                                      number_of_tactics)
+
+    def get_tactic_scores(self, goals: str, tactics: list[str]) -> list[float]:
+        return self.__language_model.get_tactic_scores(goals, tactics)
+
+    def get_memory_footprint_bytes(self) -> int:
+        return self.__language_model.get_memory_footprint_bytes()
+
+    def get_speculative_decoding_statistics(self) -> SpeculativeDecodingStatistics | None:
+        return self.__language_model.get_speculative_decoding_statistics()
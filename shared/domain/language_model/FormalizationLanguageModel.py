@@ -1,5 +1,9 @@
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from openai import OpenAIError
+
 from domain.EasyLogger import EasyLogger
+from domain.language_model.OpenAIChatClient import OpenAIChatClient
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
 
@@ -54,16 +58,29 @@ class FormalizationLanguageModel:
             model_name: str,
             openai_api_key: str,
             lean_evaluator: ILeanEvaluator,
-            lean_evaluation_interpreter: ILeanEvaluationInterpreter
+            lean_evaluation_interpreter: ILeanEvaluationInterpreter,
+            candidates_per_request: int = 1,
+            verification_parallelism: int = 1,
+            openai_chat_client: OpenAIChatClient | None = None
     ):
+        """
+        Every OpenAI request samples candidates_per_request formalizations, until
+        MAXIMUM_NUMBER_OF_FORMALIZATION_ATTEMPTS candidates were tried. The candidates of a request are checked by up
+        to verification_parallelism concurrent Lean evaluations, which requires a lean_evaluator that can be used by
+        several threads, like LeanServerPool.
+        """
         self.__model_name = model_name
+        self.__candidates_per_request = max(candidates_per_request, 1)
+        self.__verification_executor = ThreadPoolExecutor(max_workers=verification_parallelism) \
+            if verification_parallelism > 1 else None
         self.__logger = EasyLogger()
 
-        try:
-            self.__openai_client = OpenAI(api_key=openai_api_key)
-        except TypeError as error:
-            self.__logger.error(f"Couldn't initialize OpenAI client. Error: {error}")
-            self.__openai_client = None
+        self.__openai_client = openai_chat_client
+        if self.__openai_client is None:
+            try:
+                self.__openai_client = OpenAIChatClient(openai_api_key)
+            except (TypeError, OpenAIError) as error:
+                self.__logger.error(f"Couldn't initialize OpenAI client. Error: {error}")
 
         self.__lean_evaluator = lean_evaluator
         self.__lean_evaluation_interpreter = lean_evaluation_interpreter
@@ -72,21 +89,30 @@ class FormalizationLanguageModel:
         prompt = FORMALIZATION_PROMPT.format(informal_theorem_statement)
         self.__logger.debug(f"Formalizer prompt: {prompt}")
 
-        found_correct_formalization = False
         formal_theorem_statement = ""
         attempt_count = 0
-        while not found_correct_formalization and attempt_count < FormalizationLanguageModel.MAXIMUM_NUMBER_OF_FORMALIZATION_ATTEMPTS:
-            text_model_response = self.__query_model(prompt)
-            self.__logger.debug(f"Formalization model response: {text_model_response}")
-
-            formal_theorem_statement = text_model_response.split("[FORMAL]")[-1].strip()
-
-            evaluation_output = self.__lean_evaluator.evaluate(formal_theorem_statement)
-            if not self.__lean_evaluation_interpreter.has_errors(evaluation_output):
-                found_correct_formalization = True
-            attempt_count += 1
-
-        return formal_theorem_statement, found_correct_formalization
+        while attempt_count < FormalizationLanguageModel.MAXIMUM_NUMBER_OF_FORMALIZATION_ATTEMPTS:
+            number_of_candidates = min(
+                self.__candidates_per_request,
+                FormalizationLanguageModel.MAXIMUM_NUMBER_OF_FORMALIZATION_ATTEMPTS - attempt_count
+            )
+            text_model_responses = self.__query_model_candidates(prompt, number_of_candidates)
+            self.__logger.debug(f"Formalization model responses: {text_model_responses}")
+            if not text_model_responses:
+                break
+            attempt_count += number_of_candidates
+
+            # the same candidate is only checked once
+            formal_theorem_statements = list(dict.fromkeys(
+                text_model_response.split("[FORMAL]")[-1].strip() for text_model_response in text_model_responses
+            ))
+            correct_formal_theorem_statement = self.__find_correct_formalization(formal_theorem_statements)
+            if correct_formal_theorem_statement is not None:
+                return correct_formal_theorem_statement, True
+            if formal_theorem_statements:
+                formal_theorem_statement = formal_theorem_statements[-1]
+
+        return formal_theorem_statement, False
 
     def deformalize_proof(self, formal_proof: str) -> (str, bool):
         # return "test response"
@@ -94,19 +120,48 @@ class FormalizationLanguageModel:
         prompt = DEFORMALIZATION_PROMPT.format(formal_proof)
         self.__logger.debug(f"Deformalizer prompt: {prompt}")
 
-        text_model_response = self.__query_model(prompt)
-        self.__logger.debug(f"Deformalization model response: {text_model_response}")
-        return text_model_response.split("[INFORMAL]")[-1].strip(), True
-
-    def __query_model(self, prompt):
+        text_model_responses = self.__query_model_candidates(prompt, 1)
+        if not text_model_responses:
+            return "", False
+        self.__logger.debug(f"Deformalization model response: {text_model_responses[0]}")
+        return text_model_responses[0].split("[INFORMAL]")[-1].strip(), True
+
+    def __find_correct_formalization(self, formal_theorem_statements: list[str]) -> str | None:
+        """
+        Returns the first candidate found to type-check. The evaluations of the other candidates which have
+        not started yet are cancelled; the ones already running finish in the background.
+        """
+        if self.__verification_executor is None or len(formal_theorem_statements) <= 1:
+            for formal_theorem_statement in formal_theorem_statements:
+                if self.__is_correct_formalization(formal_theorem_statement):
+                    return formal_theorem_statement
+            return None
+
+        future_to_statement = {
+            self.__verification_executor.submit(self.__is_correct_formalization, formal_theorem_statement):
+                formal_theorem_statement
+            for formal_theorem_statement in formal_theorem_statements
+        }
+        try:
+            for future in as_completed(future_to_statement):
+                if future.result():
+                    return future_to_statement[future]
+        finally:
+            for future in future_to_statement:
+                future.cancel()
+        return None
+
+    def __is_correct_formalization(self, formal_theorem_statement: str) -> bool:
+        evaluation_output = self.__lean_evaluator.evaluate(formal_theorem_statement)
+        return not self.__lean_evaluation_interpreter.has_errors(evaluation_output)
+
+    def __query_model_candidates(self, prompt, number_of_candidates: int) -> list[str]:
         if self.__openai_client is None:
             self.__logger.error("OpenAI client wasn't initialized.")
-            return "OpenAI client not initialized. Can't query the model."
-
-        raw_model_response = self.__openai_client.chat.completions.create(
-            model=self.__model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=1,
-            max_tokens=512
-        )
-        return raw_model_response.choices[0].message.content
+            return ["OpenAI client not initialized. Can't query the model."]
+
+        try:
+            return self.__openai_client.create_chat_completions(self.__model_name, prompt, 1, 512, number_of_candidates)
+        except (OpenAIError, TimeoutError) as error:
+            self.__logger.error(f"Error while querying the model: {error}")
+            return []
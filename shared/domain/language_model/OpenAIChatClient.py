@@ -0,0 +1,132 @@
+import asyncio
+import random
+import threading
+import time
+
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError, DefaultAsyncHttpxClient
+
+from domain.EasyLogger import EasyLogger
+
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+class OpenAIChatClient:
+    """
+    Sends chat completion requests through a single AsyncOpenAI client, which keeps its HTTP connections open
+    between requests. The client runs on its own event loop thread, so any number of threads can call
+    create_chat_completions at the same time; at most maximum_concurrent_requests requests are in flight.
+    Failed attempts (timeouts, connection errors, 429 and 5xx responses) are retried with full-jitter exponential
+    backoff, or after the Retry-After delay of the response, until maximum_attempts or the deadline of the call.
+    """
+    DEFAULT_MAXIMUM_CONCURRENT_REQUESTS = 8
+    DEFAULT_DEADLINE_SECONDS = 120.0
+    DEFAULT_ATTEMPT_TIMEOUT_SECONDS = 60.0
+    DEFAULT_MAXIMUM_ATTEMPTS = 5
+    DEFAULT_INITIAL_BACKOFF_SECONDS = 0.5
+    DEFAULT_MAXIMUM_BACKOFF_SECONDS = 20.0
+
+    def __init__(
+            self,
+            api_key: str,
+            base_url: str | None = None,
+            maximum_concurrent_requests: int = DEFAULT_MAXIMUM_CONCURRENT_REQUESTS,
+            deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+            attempt_timeout_seconds: float = DEFAULT_ATTEMPT_TIMEOUT_SECONDS,
+            maximum_attempts: int = DEFAULT_MAXIMUM_ATTEMPTS,
+            initial_backoff_seconds: float = DEFAULT_INITIAL_BACKOFF_SECONDS,
+            maximum_backoff_seconds: float = DEFAULT_MAXIMUM_BACKOFF_SECONDS
+    ):
+        self.__logger = EasyLogger()
+        self.__deadline_seconds = deadline_seconds
+        self.__attempt_timeout_seconds = attempt_timeout_seconds
+        self.__maximum_attempts = maximum_attempts
+        self.__initial_backoff_seconds = initial_backoff_seconds
+        self.__maximum_backoff_seconds = maximum_backoff_seconds
+
+        # the retries of the openai library would ignore the deadline and the concurrency limit
+        self.__async_openai_client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                                                 http_client=DefaultAsyncHttpxClient())
+
+        self.__event_loop = asyncio.new_event_loop()
+        self.__concurrency_limiter = asyncio.Semaphore(maximum_concurrent_requests)
+        threading.Thread(target=self.__event_loop.run_forever, daemon=True).start()
+
+    def create_chat_completions(
+            self,
+            model: str,
+            prompt: str,
+            temperature: float,
+            max_tokens: int,
+            n: int = 1,
+            deadline_seconds: float | None = None
+    ) -> list[str]:
+        """
+        Blocks the calling thread until the completions arrive. Raises the error of the last attempt, or
+        TimeoutError once the deadline has passed.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.create_chat_completions_async(model, prompt, temperature, max_tokens, n, deadline_seconds),
+            self.__event_loop
+        ).result()
+
+    async def create_chat_completions_async(
+            self,
+            model: str,
+            prompt: str,
+            temperature: float,
+            max_tokens: int,
+            n: int = 1,
+            deadline_seconds: float | None = None
+    ) -> list[str]:
+        deadline = time.monotonic() + (deadline_seconds if deadline_seconds is not None else self.__deadline_seconds)
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining_seconds = deadline - time.monotonic()
+            if remaining_seconds <= 0:
+                raise TimeoutError(f"No chat completion from {model} before the deadline")
+            try:
+                async with self.__concurrency_limiter:
+                    attempt_timeout_seconds = min(self.__attempt_timeout_seconds, deadline - time.monotonic())
+                    if attempt_timeout_seconds <= 0:
+                        raise TimeoutError(f"No chat completion from {model} before the deadline")
+                    response = await asyncio.wait_for(self.__async_openai_client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        n=n,
+                        timeout=attempt_timeout_seconds
+                    ), attempt_timeout_seconds)
+                return [choice.message.content or "" for choice in response.choices]
+            except (APITimeoutError, APIConnectionError, APIStatusError, asyncio.TimeoutError) as error:
+                if not OpenAIChatClient.__is_retryable(error) or attempt >= self.__maximum_attempts:
+                    raise
+                backoff_seconds = self.__get_backoff_seconds(attempt, error)
+                if time.monotonic() + backoff_seconds >= deadline:
+                    raise TimeoutError(f"No chat completion from {model} before the deadline") from error
+                self.__logger.warn(f"Attempt {attempt} of the chat completion failed: {error}. "
+                                   f"Will retry in {backoff_seconds:.2f} seconds.")
+                await asyncio.sleep(backoff_seconds)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.__async_openai_client.close(), self.__event_loop).result()
+        self.__event_loop.call_soon_threadsafe(self.__event_loop.stop)
+
+    def __get_backoff_seconds(self, attempt: int, error: Exception) -> float:
+        backoff_seconds = random.uniform(
+            0, min(self.__maximum_backoff_seconds, self.__initial_backoff_seconds * 2 ** (attempt - 1))
+        )
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                backoff_seconds = max(backoff_seconds, min(float(retry_after), self.__maximum_backoff_seconds))
+            except (TypeError, ValueError):
+                pass
+        return backoff_seconds
+
+    @staticmethod
+    def __is_retryable(error: Exception) -> bool:
+        if isinstance(error, APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return True
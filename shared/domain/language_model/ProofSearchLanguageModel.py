@@ -1,15 +1,24 @@
+import contextlib
+import itertools
 import random
+import threading
 
 import torch
+from transformers import StoppingCriteriaList
 
 from domain.EasyLogger import EasyLogger
+from domain.language_model.SpeculativeDecodingStatistics import SpeculativeDecodingStatistics
+from domain.language_model.TacticStoppingCriteria import TacticStoppingCriteria
 from domain.language_model.model_factory import IModelAndTokenizerFactory
+from domain.language_model.model_factory.LoraAdapterModel import LoraAdapterModel
+from domain.language_model.model_factory.ModelPrecision import ModelPrecision
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
 from domain.lean.LeanUtilities import LeanUtilities
 
 ERROR_TACTIC = "error_tactic"
 THEOREM_WAS_PROVED_TACTIC = "theorem_already_proved"
+DEFAULT_TACTIC_SEPARATORS = ("\n",)
 
 
 class ProofSearchLanguageModel:
@@ -17,15 +26,39 @@ class ProofSearchLanguageModel:
             self, finetuned_model_path, base_model_name: str, device,
             model_and_tokenizer_factory: IModelAndTokenizerFactory,
             lean_evaluator: ILeanEvaluator,
-            lean_evaluation_interpreter: ILeanEvaluationInterpreter
+            lean_evaluation_interpreter: ILeanEvaluationInterpreter,
+            tactic_separators: tuple[str, ...] = DEFAULT_TACTIC_SEPARATORS,
+            draft_language_model: "ProofSearchLanguageModel | None" = None
     ):
+        """
+        Generation of a tactic stops at the first of tactic_separators; an empty tuple lets the model
+        generate until EOS or max_new_tokens.
+        With a draft_language_model, a smaller model sharing the tokenizer, the tactics are generated with
+        assisted generation: the draft model proposes tokens which this model only verifies. Assisted generation
+        only supports one sequence per generate call, so every tactic is sampled by its own call.
+        """
         self.__device = device
         self.__logger = EasyLogger()
         self.__tokenizer = model_and_tokenizer_factory.get_tokenizer(finetuned_model_path, base_model_name)
+        # decoder-only models continue from the last prompt token, so batched prompts are padded on the left
+        self.__tokenizer.padding_side = "left"
+        if self.__tokenizer.pad_token is None:
+            self.__tokenizer.pad_token = self.__tokenizer.eos_token
         self.__model = model_and_tokenizer_factory.get_model(finetuned_model_path, base_model_name, device,
                                                              len(self.__tokenizer))
         self.__lean_evaluator = lean_evaluator
         self.__lean_evaluation_interpreter = lean_evaluation_interpreter
+        self.__tactic_separators = tactic_separators
+        self.__stop_token_ids = TacticStoppingCriteria.find_stop_token_ids(self.__tokenizer, tactic_separators)
+
+        self.__draft_language_model = draft_language_model
+        self.__statistics_lock = threading.Lock()
+        self.__number_of_generate_calls = 0
+        self.__number_of_generated_tokens = 0
+        self.__number_of_target_forward_passes = 0
+        self.__number_of_draft_tokens = 0
+        if draft_language_model is not None:
+            self.__logger.info(f"Will use a draft model for {finetuned_model_path}")
 
     def get_next_tactic(self, theorem: str) -> str:
         """
@@ -49,9 +82,12 @@ class ProofSearchLanguageModel:
                 num_return_sequences=3,
                 do_sample=True,
                 temperature=1,
-                pad_token_id=self.__tokenizer.eos_token_id
+                pad_token_id=self.__tokenizer.eos_token_id,
+                stopping_criteria=self.__build_stopping_criteria(input_ids.shape[1])
+            )
+            next_tactic = self.__cut_at_first_tactic_separator(
+                self.__tokenizer.decode(random.choice(out)[input_ids.shape[1]:], skip_special_tokens=True)
             )
-            next_tactic = self.__tokenizer.decode(random.choice(out)[input_ids.shape[1]:], skip_special_tokens=True)
         except ValueError as error:
             self.__logger.error(f"Error while generating model's response: {error}. Will return {ERROR_TACTIC}.")
             return ERROR_TACTIC
@@ -61,53 +97,226 @@ class ProofSearchLanguageModel:
         new_proof = theorem + "\n" + next_tactic
         new_formatted_proof = LeanUtilities.build_formatted_program(new_proof, self.__lean_evaluator,
                                                                     self.__lean_evaluation_interpreter)
-        if new_formatted_proof != LeanUtilities.ERROR_FORMATTED_PROGRAM:
+        if new_formatted_proof not in (LeanUtilities.ERROR_FORMATTED_PROGRAM, LeanUtilities.TIMEOUT_FORMATTED_PROGRAM,
+                                       LeanUtilities.TRANSIENT_ERROR_FORMATTED_PROGRAM):
             return next_tactic
         return ERROR_TACTIC
 
+    def get_memory_footprint_bytes(self) -> int:
+        if isinstance(self.__model, torch.nn.Module):
+            return ModelPrecision.get_memory_footprint_bytes(self.__model)
+        return sum(tensor.numel() * tensor.element_size()
+                   for tensor in itertools.chain(self.__model.parameters(), self.__model.buffers()))
+
+    def get_shared_memory_footprint(self) -> tuple[str, int] | None:
+        """
+        Returns the key and the size of the weights shared with other language models, which
+        get_memory_footprint_bytes does not count: the base model of a LoRA adapter loaded by
+        SharedBaseLoraModelAndTokenizerFactory. None if the model shares no weights.
+        """
+        if isinstance(self.__model, LoraAdapterModel):
+            return self.__model.get_base_model_key(), self.__model.get_base_model_footprint_bytes()
+        return None
+
+    def release(self):
+        """
+        Called by LanguageModelCache when it unloads the model, so that shared weights can be dropped.
+        """
+        if isinstance(self.__model, LoraAdapterModel):
+            self.__model.release()
+
     def get_several_next_tactics(self, goals: str, number_of_tactics: int) -> tuple[list[str], list[float]]:
+        tactics_per_goal, scores_per_goal = self.get_several_next_tactics_batch([goals], number_of_tactics)
+        return tactics_per_goal[0], scores_per_goal[0]
+
+    def get_several_next_tactics_batch(
+            self,
+            goals_batch: list[str],
+            number_of_tactics: int
+    ) -> tuple[list[list[str]], list[list[float]]]:
+        """
+        Samples number_of_tactics tactics for each goal string with a single generate call.
+        The i-th returned lists hold the tactics and scores proposed for goals_batch[i].
+        """
+        if self.__draft_language_model is not None:
+            return self.__get_several_next_tactics_batch_with_draft_model(goals_batch, number_of_tactics)
+
         try:
-            inputs = self.__tokenizer.encode(goals, return_tensors="pt").to(self.__device)
-            tactics, scores = [], []
-            output = self.__model.generate(inputs, max_new_tokens=256, pad_token_id=self.__tokenizer.eos_token_id,
+            inputs = self.__tokenizer(goals_batch, return_tensors="pt", padding=True).to(self.__device)
+            output = self.__model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                                           max_new_tokens=256, pad_token_id=self.__tokenizer.pad_token_id,
                                            num_return_sequences=number_of_tactics,
                                            # num_beams=number_of_tactics,
                                            return_dict_in_generate=True,
                                            do_sample=True,
                                            output_scores=True,
-                                           temperature=1
+                                           temperature=1,
+                                           stopping_criteria=self.__build_stopping_criteria(
+                                               inputs["input_ids"].shape[1])
                                            )
 
-            output_tokens = output.sequences[:, inputs.shape[1]:]
-            tactics.extend(self.__tokenizer.batch_decode(
+            output_tokens = output.sequences[:, inputs["input_ids"].shape[1]:]
+            tactics = [self.__cut_at_first_tactic_separator(tactic) for tactic in self.__tokenizer.batch_decode(
                 output_tokens,
                 skip_special_tokens=True
-            ))
+            )]
         except ValueError as error:
             self.__logger.error(f"Error while generating model's response: {error}. Will return empty lists.")
-            return [], []
-        # scores.extend([0 for _ in range(number_of_tactics)])
+            return [[] for _ in goals_batch], [[] for _ in goals_batch]
 
         if output.scores:
             self.__logger.debug("Will compute scores of the model's output")
-            new_scores = []
-            for tactic_index in range(number_of_tactics):
-                tactic_log_prob = 0
-                generated_tokens = output_tokens[tactic_index]
-                for step in range(generated_tokens.shape[0]):
-                    if step >= len(output.scores):
-                        break
-                    token_id = generated_tokens[step].item()
-                    token_scores = output.scores[step]
-                    log_prob = torch.nn.functional.log_softmax(token_scores, dim=-1)
-                    tactic_log_prob += log_prob[tactic_index, token_id].item()
-                    if token_id == self.__tokenizer.eos_token_id:
-                        break
-                new_scores.append(tactic_log_prob)
-            scores.extend(new_scores)
+            scores = self.__compute_tactic_scores(output.scores, output_tokens)
             self.__logger.debug("Computed scores for model's output")
         else:
             self.__logger.warn("Model output has no scores")
-            scores.extend([0 for _ in range(number_of_tactics)])
+            scores = [0 for _ in range(len(tactics))]
+
+        return ([tactics[goal_index * number_of_tactics:(goal_index + 1) * number_of_tactics]
+                 for goal_index in range(len(goals_batch))],
+                [scores[goal_index * number_of_tactics:(goal_index + 1) * number_of_tactics]
+                 for goal_index in range(len(goals_batch))])
+
+    def get_speculative_decoding_statistics(self) -> SpeculativeDecodingStatistics | None:
+        """
+        Returns None without a draft model. A forward pass of this model accepts some draft tokens and adds one
+        token of its own, so the accepted draft tokens are the generated tokens minus the forward passes.
+        """
+        if self.__draft_language_model is None:
+            return None
+        with self.__statistics_lock:
+            accepted_draft_tokens = max(self.__number_of_generated_tokens - self.__number_of_target_forward_passes, 0)
+            return SpeculativeDecodingStatistics(
+                self.__number_of_generate_calls,
+                self.__number_of_generated_tokens,
+                self.__number_of_target_forward_passes,
+                self.__number_of_draft_tokens,
+                accepted_draft_tokens,
+                accepted_draft_tokens / self.__number_of_draft_tokens if self.__number_of_draft_tokens > 0 else 0.0
+            )
+
+    def __get_several_next_tactics_batch_with_draft_model(
+            self,
+            goals_batch: list[str],
+            number_of_tactics: int
+    ) -> tuple[list[list[str]], list[list[float]]]:
+        draft_model = self.__draft_language_model.__model
+        tactics_per_goal = []
+        scores_per_goal = []
+        for goals in goals_batch:
+            tactics = []
+            scores = []
+            try:
+                inputs = self.__tokenizer(goals, return_tensors="pt").to(self.__device)
+                prompt_length = inputs["input_ids"].shape[1]
+                for _ in range(number_of_tactics):
+                    target_forward_passes, draft_tokens = [0], [0]
+                    with (ProofSearchLanguageModel.__count_forward_passes(self.__model, target_forward_passes),
+                          ProofSearchLanguageModel.__count_forward_passes(draft_model, draft_tokens)):
+                        output = self.__model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                                                       assistant_model=draft_model,
+                                                       max_new_tokens=256, pad_token_id=self.__tokenizer.pad_token_id,
+                                                       return_dict_in_generate=True,
+                                                       do_sample=True,
+                                                       output_scores=True,
+                                                       temperature=1,
+                                                       stopping_criteria=self.__build_stopping_criteria(prompt_length))
+                    output_tokens = output.sequences[:, prompt_length:]
+                    tactics.append(self.__cut_at_first_tactic_separator(
+                        self.__tokenizer.decode(output_tokens[0], skip_special_tokens=True)
+                    ))
+                    scores.append(self.__compute_tactic_scores(output.scores, output_tokens)[0]
+                                  if output.scores else 0)
+                    with self.__statistics_lock:
+                        self.__number_of_generate_calls += 1
+                        self.__number_of_generated_tokens += output_tokens.shape[1]
+                        self.__number_of_target_forward_passes += target_forward_passes[0]
+                        self.__number_of_draft_tokens += draft_tokens[0]
+            except ValueError as error:
+                self.__logger.error(f"Error while generating model's response with the draft model: {error}.")
+            tactics_per_goal.append(tactics)
+            scores_per_goal.append(scores)
+        self.__logger.debug(f"Speculative decoding statistics: {self.get_speculative_decoding_statistics()}")
+        return tactics_per_goal, scores_per_goal
+
+    @staticmethod
+    @contextlib.contextmanager
+    def __count_forward_passes(model, number_of_forward_passes: list[int]):
+        if not isinstance(model, torch.nn.Module):
+            yield
+            return
+
+        def count_forward_pass(module, args, output):
+            number_of_forward_passes[0] += 1
+
+        hook_handle = model.register_forward_hook(count_forward_pass)
+        try:
+            yield
+        finally:
+            hook_handle.remove()
+
+    def get_tactic_scores(self, goals: str, tactics: list[str]) -> list[float]:
+        """
+        Returns the sum of the log-probabilities of the tokens of every tactic following goals, like the scores
+        returned by get_several_next_tactics, with a single forward pass instead of sampling.
+        """
+        prompt_ids = self.__tokenizer(goals)["input_ids"]
+        sequences = [prompt_ids + self.__tokenizer(tactic, add_special_tokens=False)["input_ids"] for tactic in tactics]
+        sequence_length = max(len(sequence) for sequence in sequences)
+
+        # padded on the right, so the positions of the prompt tokens are the same in every sequence
+        input_ids = torch.full((len(sequences), sequence_length), self.__tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), sequence_length), dtype=torch.long)
+        for sequence_index, sequence in enumerate(sequences):
+            input_ids[sequence_index, :len(sequence)] = torch.tensor(sequence, dtype=torch.long)
+            attention_mask[sequence_index, :len(sequence)] = 1
+        input_ids = input_ids.to(self.__device)
+        attention_mask = attention_mask.to(self.__device)
+
+        with torch.no_grad():
+            logits = self.__model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+        # the logits at position i predict the token at position i + 1
+        log_probs = torch.nn.functional.log_softmax(logits[:, :-1].float(), dim=-1)
+        token_log_probs = log_probs.gather(-1, input_ids[:, 1:].unsqueeze(-1)).squeeze(-1)
+        is_tactic_token = attention_mask[:, 1:].bool()
+        is_tactic_token[:, :len(prompt_ids) - 1] = False
+        return token_log_probs.masked_fill(~is_tactic_token, 0).sum(dim=1).tolist()
+
+    def __compute_tactic_scores(self, step_scores: tuple, output_tokens) -> list[float]:
+        """
+        Sums the log-probabilities of the generated tokens of every sequence, up to and including the token which
+        ended it: its first EOS or its first stop token (see TacticStoppingCriteria). The tokens after it are
+        padding (EOS when the tokenizer has no padding token), so they are not counted.
+        """
+        number_of_steps = min(len(step_scores), output_tokens.shape[1])
+        generated_tokens = output_tokens[:, :number_of_steps]
+
+        # (sequences, steps, vocabulary)
+        log_probs = torch.nn.functional.log_softmax(torch.stack(step_scores[:number_of_steps], dim=1).float(), dim=-1)
+        token_log_probs = log_probs.gather(-1, generated_tokens.unsqueeze(-1)).squeeze(-1)
+
+        is_end = generated_tokens == self.__tokenizer.eos_token_id
+        if self.__stop_token_ids:
+            # the first generated token never ends a sequence, like in TacticStoppingCriteria
+            is_stop_token = torch.isin(generated_tokens, torch.tensor(self.__stop_token_ids,
+                                                                      device=generated_tokens.device))
+            is_stop_token[:, 0] = False
+            is_end |= is_stop_token
+        is_ignored = (is_end.cumsum(dim=1) - is_end.long()) > 0
+        if self.__tokenizer.pad_token_id != self.__tokenizer.eos_token_id:
+            is_ignored |= generated_tokens == self.__tokenizer.pad_token_id
+        return token_log_probs.masked_fill(is_ignored, 0).sum(dim=1).tolist()
+
+    def __build_stopping_criteria(self, prompt_length: int) -> StoppingCriteriaList:
+        if not self.__stop_token_ids:
+            return StoppingCriteriaList()
+        return StoppingCriteriaList([TacticStoppingCriteria(self.__stop_token_ids, prompt_length)])
 
-        return tactics, scores
+    def __cut_at_first_tactic_separator(self, tactic: str) -> str:
+        # a separator at the very start does not end the tactic, like in TacticStoppingCriteria
+        separator_positions = [tactic.find(tactic_separator, 1) for tactic_separator in self.__tactic_separators]
+        separator_positions = [position for position in separator_positions if position != -1]
+        if not separator_positions:
+            return tactic
+        return tactic[:min(separator_positions)]
@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class SpeculativeDecodingStatistics:
+    generate_calls: int
+    generated_tokens: int
+    # forward passes of the proof search model; without a draft model, there is one per generated token
+    target_forward_passes: int
+    draft_tokens: int
+    accepted_draft_tokens: int
+    acceptance_rate: float
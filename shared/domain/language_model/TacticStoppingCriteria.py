@@ -0,0 +1,32 @@
+from typing import override
+
+import torch
+from transformers import StoppingCriteria
+
+
+class TacticStoppingCriteria(StoppingCriteria):
+    """
+    Marks a sequence as finished once it generates a token containing a tactic separator (e.g. a newline),
+    so only the first tactic is decoded. The first generated token never ends a sequence.
+    """
+
+    def __init__(self, stop_token_ids: list[int], prompt_length: int):
+        self.__stop_token_ids = torch.tensor(stop_token_ids, dtype=torch.long)
+        self.__prompt_length = prompt_length
+
+    @override
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if input_ids.shape[1] - self.__prompt_length <= 1:
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        return torch.isin(input_ids[:, -1], self.__stop_token_ids.to(input_ids.device))
+
+    @staticmethod
+    def find_stop_token_ids(tokenizer, tactic_separators: tuple[str, ...]) -> list[int]:
+        """
+        Returns the ids of the vocabulary tokens whose decoded text contains one of the tactic separators.
+        """
+        if not tactic_separators:
+            return []
+        decoded_tokens = tokenizer.batch_decode([[token_id] for token_id in range(len(tokenizer))])
+        return [token_id for token_id, decoded_token in enumerate(decoded_tokens)
+                if any(tactic_separator in decoded_token for tactic_separator in tactic_separators)]
@@ -0,0 +1,19 @@
+from typing import override
+
+from domain.language_model.BatchingInferenceServer import BatchingInferenceServer
+from domain.language_model.BatchingProofSearchLanguageModel import BatchingProofSearchLanguageModel
+from domain.language_model.model_configuration.IModelAndPath import IModelAndPath
+
+
+class BatchingModelAndPath(IModelAndPath):
+    def __init__(self, model_and_path: IModelAndPath, inference_server: BatchingInferenceServer):
+        self.__model_and_path = model_and_path
+        self.__inference_server = inference_server
+
+    @override
+    def get_model_path(self) -> str:
+        return self.__model_and_path.get_model_path()
+
+    @override
+    def get_language_model(self) -> BatchingProofSearchLanguageModel:
+        return BatchingProofSearchLanguageModel(self.__model_and_path.get_language_model(), self.__inference_server)
@@ -0,0 +1,202 @@
+import gc
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+
+import torch
+
+from domain.EasyLogger import EasyLogger
+from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+from domain.language_model.model_configuration.LanguageModelCacheStatistics import LanguageModelCacheStatistics
+
+
+class LanguageModelCache:
+    """
+    Keeps the loaded language models in LRU order. Least recently used models are unloaded when the total size of
+    the loaded weights exceeds memory_budget_bytes, and models not used for idle_unload_seconds are unloaded too.
+    A budget or idle time of 0 disables the corresponding limit. Weights shared by several models (see
+    ProofSearchLanguageModel.get_shared_memory_footprint) are counted once, until the last of these models is unloaded.
+    Models are loaded outside of the lock, so a slow load only blocks the callers waiting for the same model.
+    The models another model depends on (its draft model) are neither evicted nor unloaded while it is loaded.
+    """
+    DEFAULT_IDLE_CHECK_INTERVAL_SECONDS = 60
+
+    def __init__(
+            self,
+            memory_budget_bytes: int = 0,
+            idle_unload_seconds: float = 0,
+            idle_check_interval_seconds: float = DEFAULT_IDLE_CHECK_INTERVAL_SECONDS
+    ):
+        self.__logger = EasyLogger()
+        self.__memory_budget_bytes = memory_budget_bytes
+        self.__idle_unload_seconds = idle_unload_seconds
+        self.__lock = threading.Lock()
+
+        # key -> (language model, size in bytes, last use time)
+        self.__key_to_entry: OrderedDict[str, tuple[ProofSearchLanguageModel, int, float]] = OrderedDict()
+        # key -> key of the weights the model shares with other models
+        self.__key_to_shared_weights_key: dict[str, str] = dict()
+        # shared weights key -> (size in bytes, number of loaded models sharing them)
+        self.__shared_weights_key_to_entry: dict[str, tuple[int, int]] = dict()
+        # key -> keys of the models it depends on
+        self.__key_to_dependency_keys: dict[str, tuple[str, ...]] = dict()
+        # key -> number of loaded or loading models depending on it
+        self.__key_to_number_of_dependents: dict[str, int] = dict()
+        # key -> the model being loaded, for the other callers asking for it meanwhile
+        self.__key_to_loading_future: dict[str, Future] = dict()
+        self.__loaded_bytes = 0
+        self.__hits = 0
+        self.__loads = 0
+        self.__evictions = 0
+        self.__idle_unloads = 0
+        self.__total_load_seconds = 0.0
+
+        if idle_unload_seconds > 0 and idle_check_interval_seconds > 0:
+            threading.Thread(target=self.__unload_idle_models_periodically, args=(idle_check_interval_seconds,),
+                             daemon=True).start()
+
+    def get_or_load(
+            self,
+            key: str,
+            load_language_model: Callable[[], ProofSearchLanguageModel],
+            dependency_keys: tuple[str, ...] = ()
+    ) -> ProofSearchLanguageModel:
+        """
+        dependency_keys are the keys of the models load_language_model gets from this cache, like a draft model.
+        They stay loaded from the start of the load until this model is unloaded.
+        """
+        with self.__lock:
+            if key in self.__key_to_entry:
+                self.__hits += 1
+                language_model, size_in_bytes, _ = self.__key_to_entry.pop(key)
+                self.__key_to_entry[key] = (language_model, size_in_bytes, time.monotonic())
+                return language_model
+
+            loading_future = self.__key_to_loading_future.get(key)
+            is_loading_elsewhere = loading_future is not None
+            if not is_loading_elsewhere:
+                loading_future = Future()
+                self.__key_to_loading_future[key] = loading_future
+                self.__add_dependencies(key, dependency_keys)
+
+        if is_loading_elsewhere:
+            self.__logger.debug(f"Will wait for language model {key} to be loaded by another caller")
+            return loading_future.result()
+
+        try:
+            self.__logger.info(f"Will load language model {key}")
+            start_time = time.perf_counter()
+            language_model = load_language_model()
+            load_seconds = time.perf_counter() - start_time
+            size_in_bytes = language_model.get_memory_footprint_bytes()
+            shared_memory_footprint = language_model.get_shared_memory_footprint()
+        except BaseException as error:
+            with self.__lock:
+                del self.__key_to_loading_future[key]
+                self.__remove_dependencies(key)
+            loading_future.set_exception(error)
+            raise
+
+        with self.__lock:
+            del self.__key_to_loading_future[key]
+            self.__loads += 1
+            self.__total_load_seconds += load_seconds
+            self.__key_to_entry[key] = (language_model, size_in_bytes, time.monotonic())
+            self.__loaded_bytes += size_in_bytes
+            if shared_memory_footprint is not None:
+                self.__add_shared_weights(key, *shared_memory_footprint)
+            self.__logger.info(f"Loaded language model {key} ({size_in_bytes} bytes) in {load_seconds:.2f} seconds")
+
+            self.__evict_over_budget(key)
+        loading_future.set_result(language_model)
+        return language_model
+
+    def unload_idle_models(self):
+        if self.__idle_unload_seconds <= 0:
+            return
+        with self.__lock:
+            now = time.monotonic()
+            idle_keys = [key for key, (_, _, last_use_time) in self.__key_to_entry.items()
+                         if now - last_use_time >= self.__idle_unload_seconds and not self.__has_dependents(key)]
+            for key in idle_keys:
+                self.__unload(key)
+                self.__idle_unloads += 1
+                self.__logger.info(f"Unloaded idle language model {key}")
+
+    def get_statistics(self) -> LanguageModelCacheStatistics:
+        with self.__lock:
+            return LanguageModelCacheStatistics(
+                self.__hits,
+                self.__loads,
+                self.__evictions,
+                self.__idle_unloads,
+                len(self.__key_to_entry),
+                self.__loaded_bytes,
+                self.__total_load_seconds
+            )
+
+    def __evict_over_budget(self, loaded_key: str):
+        if self.__memory_budget_bytes <= 0:
+            return
+        for key in list(self.__key_to_entry.keys()):
+            if self.__loaded_bytes <= self.__memory_budget_bytes:
+                return
+            if key == loaded_key or self.__has_dependents(key):
+                continue
+            self.__unload(key)
+            self.__evictions += 1
+            self.__logger.info(f"Evicted language model {key} to stay within the memory budget")
+        if self.__loaded_bytes > self.__memory_budget_bytes:
+            self.__logger.warn(f"Language model {loaded_key} alone exceeds the memory budget of "
+                               f"{self.__memory_budget_bytes} bytes")
+
+    def __add_dependencies(self, key: str, dependency_keys: tuple[str, ...]):
+        self.__key_to_dependency_keys[key] = dependency_keys
+        for dependency_key in dependency_keys:
+            self.__key_to_number_of_dependents[dependency_key] = \
+                self.__key_to_number_of_dependents.get(dependency_key, 0) + 1
+
+    def __remove_dependencies(self, key: str):
+        for dependency_key in self.__key_to_dependency_keys.pop(key, ()):
+            if self.__key_to_number_of_dependents[dependency_key] > 1:
+                self.__key_to_number_of_dependents[dependency_key] -= 1
+            else:
+                del self.__key_to_number_of_dependents[dependency_key]
+
+    def __has_dependents(self, key: str) -> bool:
+        return key in self.__key_to_number_of_dependents
+
+    def __add_shared_weights(self, key: str, shared_weights_key: str, shared_size_in_bytes: int):
+        self.__key_to_shared_weights_key[key] = shared_weights_key
+        if shared_weights_key in self.__shared_weights_key_to_entry:
+            shared_size_in_bytes, number_of_models = self.__shared_weights_key_to_entry[shared_weights_key]
+            self.__shared_weights_key_to_entry[shared_weights_key] = (shared_size_in_bytes, number_of_models + 1)
+            return
+        self.__shared_weights_key_to_entry[shared_weights_key] = (shared_size_in_bytes, 1)
+        self.__loaded_bytes += shared_size_in_bytes
+        self.__logger.info(f"Loaded shared weights {shared_weights_key} ({shared_size_in_bytes} bytes)")
+
+    def __unload(self, key: str):
+        language_model, size_in_bytes, _ = self.__key_to_entry.pop(key)
+        self.__loaded_bytes -= size_in_bytes
+        language_model.release()
+        self.__remove_dependencies(key)
+        if key in self.__key_to_shared_weights_key:
+            shared_weights_key = self.__key_to_shared_weights_key.pop(key)
+            shared_size_in_bytes, number_of_models = self.__shared_weights_key_to_entry[shared_weights_key]
+            if number_of_models > 1:
+                self.__shared_weights_key_to_entry[shared_weights_key] = (shared_size_in_bytes, number_of_models - 1)
+            else:
+                del self.__shared_weights_key_to_entry[shared_weights_key]
+                self.__loaded_bytes -= shared_size_in_bytes
+                self.__logger.info(f"Unloaded shared weights {shared_weights_key}")
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def __unload_idle_models_periodically(self, idle_check_interval_seconds: float):
+        while True:
+            time.sleep(idle_check_interval_seconds)
+            self.unload_idle_models()
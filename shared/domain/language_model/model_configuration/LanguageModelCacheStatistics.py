@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class LanguageModelCacheStatistics:
+    hits: int
+    loads: int
+    evictions: int
+    idle_unloads: int
+    loaded_models: int
+    loaded_bytes: int
+    total_load_seconds: float
@@ -2,6 +2,8 @@ from typing import override
 
 from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
 from domain.language_model.model_configuration.IModelAndPath import IModelAndPath
+from domain.language_model.model_configuration.LanguageModelCache import LanguageModelCache
+from domain.language_model.model_factory.IModelAndTokenizerFactory import IModelAndTokenizerFactory
 from domain.language_model.model_factory.NonLoraModelAndTokenizerFactory import NonLoraModelAndTokenizerFactory
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
@@ -10,13 +12,22 @@ class NonLoraModelAndPath(IModelAndPath):
     def __init__(
             self, model_path: str, base_model_name: str, device: str,
             lean_evaluator: ILeanEvaluator,
-            lean_evaluation_interpreter: ILeanEvaluationInterpreter
+            lean_evaluation_interpreter: ILeanEvaluationInterpreter,
+            language_model_cache: LanguageModelCache | None = None,
+            model_and_tokenizer_factory: IModelAndTokenizerFactory | None = None,
+            draft_model_and_path: IModelAndPath | None = None
     ):
         self.__model_path = model_path
-        self.__language_model = ProofSearchLanguageModel(
-            model_path, base_model_name, device, NonLoraModelAndTokenizerFactory(),
-            lean_evaluator, lean_evaluation_interpreter
-        )
+        self.__base_model_name = base_model_name
+        self.__device = device
+        self.__lean_evaluator = lean_evaluator
+        self.__lean_evaluation_interpreter = lean_evaluation_interpreter
+        # the weights are only loaded on the first get_language_model call
+        self.__language_model_cache = language_model_cache if language_model_cache is not None \
+            else LanguageModelCache()
+        self.__model_and_tokenizer_factory = model_and_tokenizer_factory if model_and_tokenizer_factory is not None \
+            else NonLoraModelAndTokenizerFactory()
+        self.__draft_model_and_path = draft_model_and_path
 
     @override
     def get_model_path(self) -> str:
@@ -24,4 +35,15 @@ class NonLoraModelAndPath(IModelAndPath):
 
     @override
     def get_language_model(self) -> ProofSearchLanguageModel:
-        return self.__language_model
+        # the draft model is kept loaded as long as this model is, the cache does not see it being used
+        dependency_keys = (self.__draft_model_and_path.get_model_path(),) \
+            if self.__draft_model_and_path is not None else ()
+        return self.__language_model_cache.get_or_load(self.__model_path, self.__load_language_model, dependency_keys)
+
+    def __load_language_model(self) -> ProofSearchLanguageModel:
+        return ProofSearchLanguageModel(
+            self.__model_path, self.__base_model_name, self.__device, self.__model_and_tokenizer_factory,
+            self.__lean_evaluator, self.__lean_evaluation_interpreter,
+            draft_language_model=self.__draft_model_and_path.get_language_model()
+            if self.__draft_model_and_path is not None else None
+        )
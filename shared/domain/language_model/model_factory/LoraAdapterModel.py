@@ -0,0 +1,62 @@
+import itertools
+import threading
+from typing import Callable, Iterator
+
+import torch
+from peft import PeftModel
+
+
+class LoraAdapterModel:
+    """
+    View of one named adapter of a PeftModel whose base model is shared with other adapters.
+    The adapter is activated before every generate call, under a lock shared by all the views of the PeftModel.
+    release tells the factory that the view is not used anymore, so it can drop the base model after the last one.
+    """
+
+    def __init__(
+            self,
+            peft_model: PeftModel,
+            adapter_name: str,
+            lock: threading.Lock,
+            base_model_key: str = "",
+            release: Callable[[], None] = lambda: None
+    ):
+        self.__peft_model = peft_model
+        self.__adapter_name = adapter_name
+        self.__lock = lock
+        self.__base_model_key = base_model_key
+        self.__release = release
+
+    def generate(self, *args, **kwargs):
+        with self.__lock:
+            self.__peft_model.set_adapter(self.__adapter_name)
+            return self.__peft_model.generate(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        with self.__lock:
+            self.__peft_model.set_adapter(self.__adapter_name)
+            return self.__peft_model(*args, **kwargs)
+
+    def get_adapter_name(self) -> str:
+        return self.__adapter_name
+
+    # only the adapter weights belong to this view, the base model weights are shared
+    def parameters(self) -> Iterator[torch.nn.Parameter]:
+        return (parameter for name, parameter in self.__peft_model.named_parameters()
+                if f".{self.__adapter_name}." in name)
+
+    def buffers(self) -> Iterator[torch.Tensor]:
+        return iter(())
+
+    def get_base_model_key(self) -> str:
+        return self.__base_model_key
+
+    def get_base_model_footprint_bytes(self) -> int:
+        base_model_tensors = itertools.chain(
+            (parameter for name, parameter in self.__peft_model.named_parameters() if "lora_" not in name),
+            self.__peft_model.buffers()
+        )
+        return sum(tensor.numel() * tensor.element_size() for tensor in base_model_tensors)
+
+    def release(self):
+        self.__release()
@@ -1,15 +1,49 @@
+import hashlib
+import os
+import shutil
 from typing import override
 
 import transformers
 from peft import PeftConfig, PeftModel
 
+from domain.EasyLogger import EasyLogger
 from domain.language_model.model_factory.IModelAndTokenizerFactory import IModelAndTokenizerFactory
+from domain.language_model.model_factory.ModelPrecision import ModelPrecision, FP32_PRECISION
 
 
 class LoraModelAndTokenizerFactory(IModelAndTokenizerFactory):
+    def __init__(
+            self,
+            merge_adapter: bool = False,
+            merged_model_cache_directory: str | None = None,
+            precision: str = FP32_PRECISION
+    ):
+        """
+        With merge_adapter, the adapter weights are merged into the base model weights at load time, so the forward
+        passes no longer pay for the adapter matmuls. The merged weights are saved as safetensors under
+        merged_model_cache_directory, if given, and loaded from there by later calls.
+        The weights are loaded and merged in fp32, and only then converted to precision.
+        """
+        ModelPrecision.validate(precision)
+        self.__logger = EasyLogger()
+        self.__precision = precision
+        self.__merge_adapter = merge_adapter
+        self.__merged_model_cache_directory = merged_model_cache_directory
+
     @override
     def get_model(self, model_path: str, base_model_name: str, device: str, token_embeddings_length: int = 0):
         config = PeftConfig.from_pretrained(model_path)
+
+        merged_model_path = None
+        if self.__merge_adapter and self.__merged_model_cache_directory is not None:
+            merged_model_path = self.__get_merged_model_path(model_path, config.base_model_name_or_path,
+                                                             token_embeddings_length)
+            if os.path.isdir(merged_model_path):
+                self.__logger.info(f"Will load merged model {model_path} from {merged_model_path}")
+                return self.__apply_precision(
+                    transformers.GPTNeoXForCausalLM.from_pretrained(merged_model_path).to(device), device
+                )
+
         # quantization_config = BitsAndBytesConfig(load_in_8bit=True, device=device)
 
         base_model = transformers.GPTNeoXForCausalLM.from_pretrained(
@@ -20,8 +54,38 @@ class LoraModelAndTokenizerFactory(IModelAndTokenizerFactory):
         base_model.resize_token_embeddings(token_embeddings_length)
 
         print(f"Will load peft model from path {model_path} with base model {base_model_name}")
-        return PeftModel.from_pretrained(base_model, model_path, device_map="auto").to(device)
+        peft_model = PeftModel.from_pretrained(base_model, model_path, device_map="auto").to(device)
+        if not self.__merge_adapter:
+            return self.__apply_precision(peft_model, device)
+
+        self.__logger.info(f"Will merge adapter {model_path} into base model {config.base_model_name_or_path}")
+        merged_model = peft_model.merge_and_unload()
+        if merged_model_path is not None:
+            self.__save_merged_model(merged_model, merged_model_path)
+        return self.__apply_precision(merged_model, device)
 
     @override
     def get_tokenizer(self, model_path: str, base_model_name: str):
         return transformers.GPTNeoXTokenizerFast.from_pretrained(model_path)
+
+    def __apply_precision(self, model, device: str):
+        if self.__precision == FP32_PRECISION:
+            return model
+        return ModelPrecision.apply(model, self.__precision, device)
+
+    def __get_merged_model_path(self, model_path: str, base_model_name: str, token_embeddings_length: int) -> str:
+        merged_model_key = hashlib.sha256(
+            "\0".join((model_path, base_model_name, str(token_embeddings_length))).encode()
+        ).hexdigest()
+        return os.path.join(self.__merged_model_cache_directory, merged_model_key)
+
+    def __save_merged_model(self, merged_model, merged_model_path: str):
+        # written next to the final directory and renamed, so a crash never leaves a partial model to load
+        temporary_path = f"{merged_model_path}.{os.getpid()}.tmp"
+        try:
+            merged_model.save_pretrained(temporary_path, safe_serialization=True)
+            os.replace(temporary_path, merged_model_path)
+            self.__logger.info(f"Saved merged model to {merged_model_path}")
+        except OSError as error:
+            self.__logger.error(f"Could not save merged model to {merged_model_path}: {error}")
+            shutil.rmtree(temporary_path, ignore_errors=True)
@@ -0,0 +1,55 @@
+import torch
+
+FP32_PRECISION = "fp32"
+FP16_PRECISION = "fp16"
+BF16_PRECISION = "bf16"
+INT8_PRECISION = "int8"
+PRECISIONS = (FP32_PRECISION, FP16_PRECISION, BF16_PRECISION, INT8_PRECISION)
+
+
+class ModelPrecision:
+    """
+    Precision policies of the language models. int8 loads the weights in fp32 and then dynamically quantizes
+    the Linear layers, which only runs on CPU. fp16 is emulated on most CPUs, so prefer bf16 or int8 there.
+    """
+
+    @staticmethod
+    def get_load_dtype(precision: str) -> torch.dtype:
+        ModelPrecision.validate(precision)
+        return {
+            FP32_PRECISION: torch.float32,
+            FP16_PRECISION: torch.float16,
+            BF16_PRECISION: torch.bfloat16,
+            INT8_PRECISION: torch.float32
+        }[precision]
+
+    @staticmethod
+    def apply(model, precision: str, device: str):
+        """
+        Converts an already loaded model to precision.
+        """
+        ModelPrecision.validate(precision)
+        if precision == INT8_PRECISION:
+            if not str(device).startswith("cpu"):
+                raise ValueError(f"{INT8_PRECISION} precision is only supported on cpu, not on {device}")
+            return torch.ao.quantization.quantize_dynamic(model.float(), {torch.nn.Linear}, dtype=torch.qint8)
+        return model.to(ModelPrecision.get_load_dtype(precision))
+
+    @staticmethod
+    def get_memory_footprint_bytes(model: torch.nn.Module) -> int:
+        """
+        Returns the size of the weights of model. The weights of dynamically quantized Linear layers are packed
+        outside of parameters() and buffers(), but they are in the state dict.
+        """
+        tensors = dict()
+        for value in model.state_dict(keep_vars=True).values():
+            for tensor in value if isinstance(value, tuple) else (value,):
+                if isinstance(tensor, torch.Tensor):
+                    # tied weights are the same tensor under several names
+                    tensors[id(tensor)] = tensor
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors.values())
+
+    @staticmethod
+    def validate(precision: str):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision}, expected one of {', '.join(PRECISIONS)}")
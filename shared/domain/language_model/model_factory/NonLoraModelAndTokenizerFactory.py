@@ -1,20 +1,29 @@
 from typing import override
 
-import torch
 from transformers import GPTNeoXForCausalLM, GPTNeoXTokenizerFast
 
+from domain.EasyLogger import EasyLogger
 from domain.language_model.model_factory.IModelAndTokenizerFactory import IModelAndTokenizerFactory
+from domain.language_model.model_factory.ModelPrecision import ModelPrecision, FP16_PRECISION, INT8_PRECISION
 
 
 class NonLoraModelAndTokenizerFactory(IModelAndTokenizerFactory):
+    def __init__(self, precision: str = FP16_PRECISION):
+        ModelPrecision.validate(precision)
+        self.__precision = precision
+        self.__logger = EasyLogger()
+
     @override
     def get_model(self, model_path: str, base_model_name: str, device: str, token_embeddings_length: int = 0):
-        print(f"load model: {model_path}")
-        return GPTNeoXForCausalLM.from_pretrained(
+        self.__logger.info(f"Will load model {model_path} with precision {self.__precision}")
+        model = GPTNeoXForCausalLM.from_pretrained(
             model_path,
-            torch_dtype=torch.float16,
+            torch_dtype=ModelPrecision.get_load_dtype(self.__precision),
             device_map="auto"
         )
+        if self.__precision == INT8_PRECISION:
+            return ModelPrecision.apply(model, self.__precision, device)
+        return model
 
     @override
     def get_tokenizer(self, model_path: str, base_model_name: str):
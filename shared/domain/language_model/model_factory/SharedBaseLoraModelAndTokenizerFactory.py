@@ -0,0 +1,85 @@
+import re
+import threading
+from typing import override
+
+import transformers
+from peft import PeftConfig, PeftModel
+
+from domain.EasyLogger import EasyLogger
+from domain.language_model.model_factory.IModelAndTokenizerFactory import IModelAndTokenizerFactory
+from domain.language_model.model_factory.LoraAdapterModel import LoraAdapterModel
+from domain.language_model.model_factory.ModelPrecision import ModelPrecision, FP32_PRECISION, INT8_PRECISION
+
+
+class SharedBaseLoraModelAndTokenizerFactory(IModelAndTokenizerFactory):
+    """
+    Loads every base model once and attaches all the LoRA adapters trained on it to a single PeftModel
+    as named adapters, instead of loading a copy of the base model per adapter like LoraModelAndTokenizerFactory.
+    A base model is dropped once all the adapter views returned for it are released, the adapters stay attached to
+    it until then.
+    """
+
+    def __init__(self, precision: str = FP32_PRECISION):
+        ModelPrecision.validate(precision)
+        if precision == INT8_PRECISION:
+            # adapters cannot be attached to quantized Linear layers, merge them with LoraModelAndTokenizerFactory
+            raise ValueError(f"{INT8_PRECISION} precision is not supported for shared LoRA base models")
+        self.__logger = EasyLogger()
+        self.__precision = precision
+        self.__lock = threading.Lock()
+        # (base model name, token embeddings length) -> (PeftModel, lock used to switch its adapters)
+        self.__base_model_key_to_peft_model: dict[tuple[str, int], tuple[PeftModel, threading.Lock]] = dict()
+        self.__base_model_key_to_number_of_views: dict[tuple[str, int], int] = dict()
+
+    @override
+    def get_model(self, model_path: str, base_model_name: str, device: str, token_embeddings_length: int = 0):
+        config = PeftConfig.from_pretrained(model_path)
+        adapter_name = SharedBaseLoraModelAndTokenizerFactory.build_adapter_name(model_path)
+        # adapters with different vocabularies cannot share the resized embeddings
+        base_model_key = (config.base_model_name_or_path, token_embeddings_length)
+
+        with self.__lock:
+            if base_model_key not in self.__base_model_key_to_peft_model:
+                self.__logger.info(f"Will load base model {config.base_model_name_or_path} with adapter {model_path}")
+                base_model = transformers.GPTNeoXForCausalLM.from_pretrained(
+                    config.base_model_name_or_path,
+                    return_dict=True
+                ).to(device)
+                base_model.resize_token_embeddings(token_embeddings_length)
+                peft_model = PeftModel.from_pretrained(base_model, model_path, adapter_name=adapter_name).to(device)
+                ModelPrecision.apply(peft_model, self.__precision, device)
+                self.__base_model_key_to_peft_model[base_model_key] = (peft_model, threading.Lock())
+                self.__base_model_key_to_number_of_views[base_model_key] = 0
+
+            peft_model, adapter_lock = self.__base_model_key_to_peft_model[base_model_key]
+            if adapter_name not in peft_model.peft_config:
+                self.__logger.info(f"Will add adapter {model_path} to base model {config.base_model_name_or_path}")
+                with adapter_lock:
+                    peft_model.load_adapter(model_path, adapter_name=adapter_name)
+                    peft_model.to(device)
+                    ModelPrecision.apply(peft_model, self.__precision, device)
+            self.__base_model_key_to_number_of_views[base_model_key] += 1
+
+        return LoraAdapterModel(peft_model, adapter_name, adapter_lock, f"{base_model_key[0]}:{base_model_key[1]}",
+                                lambda: self.__release_view(base_model_key))
+
+    def get_number_of_base_models(self) -> int:
+        with self.__lock:
+            return len(self.__base_model_key_to_peft_model)
+
+    def __release_view(self, base_model_key: tuple[str, int]):
+        with self.__lock:
+            self.__base_model_key_to_number_of_views[base_model_key] -= 1
+            if self.__base_model_key_to_number_of_views[base_model_key] == 0:
+                self.__logger.info(f"Will drop base model {base_model_key[0]}, none of its adapters is used anymore")
+                del self.__base_model_key_to_number_of_views[base_model_key]
+                del self.__base_model_key_to_peft_model[base_model_key]
+
+    @override
+    def get_tokenizer(self, model_path: str, base_model_name: str):
+        return transformers.GPTNeoXTokenizerFast.from_pretrained(model_path)
+
+    @staticmethod
+    def build_adapter_name(model_path: str) -> str:
+        # adapter names become module names, which cannot contain dots
+        return re.sub(r"\W", "_", model_path)
@@ -0,0 +1,83 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from domain.language_model.BatchingInferenceServer import BatchingInferenceServer
+from domain.language_model.BatchingProofSearchLanguageModel import BatchingProofSearchLanguageModel
+from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel
+
+
+class TestBatchingInferenceServer(unittest.TestCase):
+
+    def setUp(self):
+        self.language_model = MagicMock(spec=ProofSearchLanguageModel)
+        self.language_model.get_several_next_tactics_batch.side_effect = lambda goals_batch, number_of_tactics: (
+            [[f"{goal} tactic {index}" for index in range(number_of_tactics)] for goal in goals_batch],
+            [[float(index) for index in range(number_of_tactics)] for _ in goals_batch]
+        )
+        self.inference_server = None
+
+    def tearDown(self):
+        if self.inference_server is not None:
+            self.inference_server.shutdown()
+
+    def run_concurrently(self, goals_batches: list[list[str]], number_of_tactics: int = 2) -> list:
+        results = [None] * len(goals_batches)
+
+        def run(index: int):
+            results[index] = self.inference_server.get_several_next_tactics_batch(self.language_model,
+                                                                                  goals_batches[index],
+                                                                                  number_of_tactics)
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(goals_batches))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_requests_are_batched_and_answered_separately(self):
+        self.inference_server = BatchingInferenceServer(maximum_batch_size=32, maximum_wait_seconds=0.5)
+
+        results = self.run_concurrently([["a"], ["b", "c"], ["d"]])
+
+        self.assertEqual(1, self.language_model.get_several_next_tactics_batch.call_count)
+        self.assertEqual(([["b tactic 0", "b tactic 1"], ["c tactic 0", "c tactic 1"]], [[0.0, 1.0], [0.0, 1.0]]),
+                         results[1])
+        self.assertEqual(["d tactic 0", "d tactic 1"], results[2][0][0])
+        statistics = self.inference_server.get_statistics()
+        self.assertEqual(3, statistics.requests)
+        self.assertEqual(1, statistics.batches)
+        self.assertEqual(4.0, statistics.average_batch_size)
+
+    def test_batches_do_not_exceed_maximum_batch_size(self):
+        self.inference_server = BatchingInferenceServer(maximum_batch_size=2, maximum_wait_seconds=0.5)
+
+        results = self.run_concurrently([["a"], ["b"], ["c"], ["d"], ["e", "f", "g"]])
+
+        for call in self.language_model.get_several_next_tactics_batch.call_args_list:
+            goals_batch = call.args[0]
+            self.assertTrue(len(goals_batch) <= 2 or len(goals_batch) == 3)
+        self.assertEqual(["e tactic 0", "e tactic 1"], results[4][0][0])
+        self.assertEqual(7, self.inference_server.get_statistics().batched_goals)
+
+    def test_errors_are_raised_in_every_request_of_the_batch(self):
+        self.inference_server = BatchingInferenceServer(maximum_wait_seconds=0)
+        self.language_model.get_several_next_tactics_batch.side_effect = RuntimeError("out of memory")
+        batching_language_model = BatchingProofSearchLanguageModel(self.language_model, self.inference_server)
+
+        with self.assertRaises(RuntimeError):
+            batching_language_model.get_several_next_tactics("a", 2)
+
+    def test_batching_language_model_returns_tactics_of_single_goal(self):
+        self.inference_server = BatchingInferenceServer(maximum_wait_seconds=0)
+        batching_language_model = BatchingProofSearchLanguageModel(self.language_model, self.inference_server)
+
+        tactics, scores = batching_language_model.get_several_next_tactics("a", 3)
+
+        self.assertEqual(["a tactic 0", "a tactic 1", "a tactic 2"], tactics)
+        self.assertEqual([0.0, 1.0, 2.0], scores)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, ANY
+
+from openai import RateLimitError
+
+from domain.language_model.FormalizationLanguageModel import FormalizationLanguageModel
+from domain.language_model.OpenAIChatClient import OpenAIChatClient
+from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
+from domain.lean.ILeanEvaluator import ILeanEvaluator
+
+
+class TestFormalizationLanguageModel(unittest.TestCase):
+
+    def setUp(self):
+        self.lean_evaluator = MagicMock(spec=ILeanEvaluator)
+        self.lean_evaluator.evaluate.side_effect = lambda formal_theorem_statement: formal_theorem_statement
+        self.lean_evaluation_interpreter = MagicMock(spec=ILeanEvaluationInterpreter)
+        self.correct_formal_theorem_statements = {"theorem correct : 1 = 1 := by"}
+        self.lean_evaluation_interpreter.has_errors.side_effect = \
+            lambda evaluation_output: evaluation_output not in self.correct_formal_theorem_statements
+        self.openai_chat_client = MagicMock(spec=OpenAIChatClient)
+
+    def set_responses(self, responses_per_request: list[list[str]]):
+        self.openai_chat_client.create_chat_completions.side_effect = [
+            [f"[FORMAL]\n{response}" for response in responses] for responses in responses_per_request
+        ]
+
+    def build_formalization_language_model(self, candidates_per_request: int,
+                                           verification_parallelism: int = 1) -> FormalizationLanguageModel:
+        return FormalizationLanguageModel("model", "key", self.lean_evaluator, self.lean_evaluation_interpreter,
+                                          candidates_per_request, verification_parallelism, self.openai_chat_client)
+
+    def test_formalize_theorem_statement_requests_several_candidates_per_call(self):
+        self.set_responses([["theorem wrong : 1 = 2 := by", "theorem wrong : 1 = 2 := by",
+                                          "theorem correct : 1 = 1 := by"]])
+        formalization_language_model = self.build_formalization_language_model(3)
+
+        formal_theorem_statement, successful = formalization_language_model.formalize_theorem_statement("1 = 1")
+
+        self.assertEqual(("theorem correct : 1 = 1 := by", True), (formal_theorem_statement, successful))
+        self.openai_chat_client.create_chat_completions.assert_called_once_with("model", ANY, 1, 512, 3)
+        # the duplicated candidate is only checked once
+        self.assertEqual(2, self.lean_evaluator.evaluate.call_count)
+
+    def test_formalize_theorem_statement_stops_after_maximum_number_of_attempts(self):
+        self.set_responses([
+            [f"theorem wrong_{request}_{candidate} : 1 = 2 := by" for candidate in range(3)] for request in range(3)
+        ])
+        formalization_language_model = self.build_formalization_language_model(3)
+
+        _, successful = formalization_language_model.formalize_theorem_statement("1 = 2")
+
+        self.assertFalse(successful)
+        self.assertEqual([3, 3, 2], [call.args[4] for call in
+                                     self.openai_chat_client.create_chat_completions.call_args_list])
+
+    def test_formalize_theorem_statement_returns_first_verified_candidate_in_parallel(self):
+        self.set_responses([["theorem slow : 1 = 2 := by", "theorem correct : 1 = 1 := by"]])
+        slow_evaluation_finished = threading.Event()
+
+        def evaluate(formal_theorem_statement):
+            if formal_theorem_statement == "theorem slow : 1 = 2 := by":
+                slow_evaluation_finished.wait(5)
+            return formal_theorem_statement
+
+        self.lean_evaluator.evaluate.side_effect = evaluate
+        formalization_language_model = self.build_formalization_language_model(2, 2)
+
+        formal_theorem_statement, successful = formalization_language_model.formalize_theorem_statement("1 = 1")
+        # the correct candidate was returned while the slow one was still being checked
+        self.assertFalse(slow_evaluation_finished.is_set())
+        slow_evaluation_finished.set()
+
+        self.assertEqual(("theorem correct : 1 = 1 := by", True), (formal_theorem_statement, successful))
+
+    def test_formalize_theorem_statement_stops_when_model_cannot_be_queried(self):
+        self.openai_chat_client.create_chat_completions.side_effect = TimeoutError()
+        formalization_language_model = self.build_formalization_language_model(2)
+
+        self.assertEqual(("", False), formalization_language_model.formalize_theorem_statement("1 = 1"))
+        self.openai_chat_client.create_chat_completions.assert_called_once()
+
+    def test_deformalize_proof_is_unsuccessful_when_model_cannot_be_queried(self):
+        self.openai_chat_client.create_chat_completions.side_effect = RateLimitError(
+            "rate limited", response=MagicMock(status_code=429), body=None
+        )
+        formalization_language_model = self.build_formalization_language_model(1)
+
+        self.assertEqual(("", False), formalization_language_model.deformalize_proof("theorem a : 1 = 1 := by"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from domain.language_model.model_configuration.LanguageModelCache import LanguageModelCache
+from domain.language_model.model_configuration.NonLoraModelAndPath import NonLoraModelAndPath
+
+
+class TestLanguageModelCache(unittest.TestCase):
+
+    @staticmethod
+    def build_loader(size_in_bytes: int, shared_memory_footprint: tuple[str, int] | None = None) -> MagicMock:
+        language_model = MagicMock()
+        language_model.get_memory_footprint_bytes.return_value = size_in_bytes
+        language_model.get_shared_memory_footprint.return_value = shared_memory_footprint
+        return MagicMock(return_value=language_model)
+
+    def test_get_or_load_loads_once(self):
+        language_model_cache = LanguageModelCache()
+        loader = self.build_loader(10)
+
+        first_language_model = language_model_cache.get_or_load("a", loader)
+        second_language_model = language_model_cache.get_or_load("a", loader)
+
+        self.assertIs(first_language_model, second_language_model)
+        loader.assert_called_once()
+        statistics = language_model_cache.get_statistics()
+        self.assertEqual(1, statistics.hits)
+        self.assertEqual(1, statistics.loads)
+        self.assertEqual(1, statistics.loaded_models)
+        self.assertEqual(10, statistics.loaded_bytes)
+
+    def test_get_or_load_evicts_least_recently_used_over_budget(self):
+        language_model_cache = LanguageModelCache(memory_budget_bytes=25)
+        loader_a = self.build_loader(10)
+        loader_b = self.build_loader(10)
+        loader_c = self.build_loader(10)
+
+        language_model_cache.get_or_load("a", loader_a)
+        language_model_cache.get_or_load("b", loader_b)
+        language_model_cache.get_or_load("a", loader_a)
+        language_model_cache.get_or_load("c", loader_c)
+        language_model_cache.get_or_load("a", loader_a)
+        language_model_cache.get_or_load("b", loader_b)
+
+        self.assertEqual(1, loader_a.call_count)
+        self.assertEqual(2, loader_b.call_count)
+        statistics = language_model_cache.get_statistics()
+        self.assertEqual(2, statistics.evictions)
+        self.assertEqual(2, statistics.loaded_models)
+        self.assertEqual(20, statistics.loaded_bytes)
+
+    def test_get_or_load_keeps_model_larger_than_budget(self):
+        language_model_cache = LanguageModelCache(memory_budget_bytes=5)
+        loader = self.build_loader(10)
+
+        language_model_cache.get_or_load("a", loader)
+        language_model_cache.get_or_load("a", loader)
+
+        loader.assert_called_once()
+        self.assertEqual(0, language_model_cache.get_statistics().evictions)
+
+    def test_get_or_load_loads_models_concurrently_and_each_model_once(self):
+        language_model_cache = LanguageModelCache()
+        is_loading = threading.Event()
+        can_finish_loading = threading.Event()
+        language_model = MagicMock()
+        language_model.get_memory_footprint_bytes.return_value = 10
+        language_model.get_shared_memory_footprint.return_value = None
+
+        def load_slowly():
+            is_loading.set()
+            can_finish_loading.wait(5)
+            return language_model
+
+        slow_loader = MagicMock(side_effect=load_slowly)
+        language_models = []
+        threads = [threading.Thread(target=lambda: language_models.append(
+            language_model_cache.get_or_load("a", slow_loader))) for _ in range(2)]
+        threads[0].start()
+        is_loading.wait(5)
+        threads[1].start()
+
+        # the load of "a" does not block the load of another model
+        language_model_cache.get_or_load("b", self.build_loader(10))
+        self.assertTrue(threads[0].is_alive())
+        can_finish_loading.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual([language_model, language_model], language_models)
+        slow_loader.assert_called_once()
+        self.assertEqual(2, language_model_cache.get_statistics().loads)
+
+    def test_get_or_load_raises_load_error_and_loads_again_next_time(self):
+        language_model_cache = LanguageModelCache()
+        loader = self.build_loader(10)
+        loader.side_effect = [ValueError("no such model"), loader.return_value]
+
+        with self.assertRaises(ValueError):
+            language_model_cache.get_or_load("a", loader)
+        language_model = language_model_cache.get_or_load("a", loader)
+
+        self.assertIs(loader.return_value, language_model)
+        self.assertEqual(2, loader.call_count)
+
+    def test_get_or_load_counts_shared_weights_once_until_last_model_sharing_them_is_evicted(self):
+        language_model_cache = LanguageModelCache(memory_budget_bytes=135)
+        loader_a = self.build_loader(10, ("base", 100))
+        loader_b = self.build_loader(10, ("base", 100))
+        loader_c = self.build_loader(20)
+
+        language_model_cache.get_or_load("a", loader_a)
+        language_model_cache.get_or_load("b", loader_b)
+        self.assertEqual(120, language_model_cache.get_statistics().loaded_bytes)
+
+        language_model_cache.get_or_load("c", loader_c)
+        self.assertEqual(130, language_model_cache.get_statistics().loaded_bytes)
+        loader_a.return_value.release.assert_called_once()
+        loader_b.return_value.release.assert_not_called()
+
+        language_model_cache.get_or_load("a", loader_a)
+        language_model_cache.get_or_load("c", loader_c)
+        language_model_cache.get_or_load("d", self.build_loader(30))
+
+        statistics = language_model_cache.get_statistics()
+        self.assertEqual(50, statistics.loaded_bytes)
+        self.assertEqual(2, statistics.loaded_models)
+        loader_b.return_value.release.assert_called_once()
+
+    def build_loader_with_draft(self, language_model_cache: LanguageModelCache, size_in_bytes: int,
+                                draft_loader: MagicMock) -> MagicMock:
+        loader = self.build_loader(size_in_bytes)
+        language_model = loader.return_value
+        loader.side_effect = lambda: language_model_cache.get_or_load("draft", draft_loader) and language_model
+        return loader
+
+    def test_get_or_load_does_not_evict_draft_model_while_its_target_is_loaded(self):
+        language_model_cache = LanguageModelCache(memory_budget_bytes=20)
+        draft_loader = self.build_loader(5)
+        target_loader = self.build_loader_with_draft(language_model_cache, 10, draft_loader)
+
+        language_model_cache.get_or_load("target", target_loader, ("draft",))
+        language_model_cache.get_or_load("a", self.build_loader(10))
+        draft_loader.return_value.release.assert_not_called()
+        target_loader.return_value.release.assert_called_once()
+
+        language_model_cache.get_or_load("b", self.build_loader(10))
+        draft_loader.return_value.release.assert_called_once()
+        self.assertEqual(20, language_model_cache.get_statistics().loaded_bytes)
+
+    @patch("domain.language_model.model_configuration.LanguageModelCache.time")
+    def test_unload_idle_models_keeps_draft_model_of_loaded_target(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        mock_time.perf_counter.return_value = 0.0
+        language_model_cache = LanguageModelCache(idle_unload_seconds=60, idle_check_interval_seconds=0)
+        draft_loader = self.build_loader(5)
+        language_model_cache.get_or_load("target", self.build_loader_with_draft(language_model_cache, 10,
+                                                                                draft_loader), ("draft",))
+        mock_time.monotonic.return_value = 130.0
+        language_model_cache.get_or_load("target", MagicMock())
+
+        mock_time.monotonic.return_value = 170.0
+        language_model_cache.unload_idle_models()
+
+        draft_loader.return_value.release.assert_not_called()
+        self.assertEqual(2, language_model_cache.get_statistics().loaded_models)
+
+    @patch("domain.language_model.model_configuration.LanguageModelCache.time")
+    def test_unload_idle_models(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        mock_time.perf_counter.return_value = 0.0
+        language_model_cache = LanguageModelCache(idle_unload_seconds=60, idle_check_interval_seconds=0)
+        language_model_cache.get_or_load("a", self.build_loader(10))
+        mock_time.monotonic.return_value = 130.0
+        language_model_cache.get_or_load("b", self.build_loader(10))
+
+        mock_time.monotonic.return_value = 170.0
+        language_model_cache.unload_idle_models()
+
+        statistics = language_model_cache.get_statistics()
+        self.assertEqual(1, statistics.idle_unloads)
+        self.assertEqual(1, statistics.loaded_models)
+        self.assertEqual(10, statistics.loaded_bytes)
+
+    @patch("domain.language_model.model_configuration.NonLoraModelAndPath.ProofSearchLanguageModel")
+    def test_model_and_path_loads_lazily(self, mock_language_model_class):
+        mock_language_model_class.return_value.get_memory_footprint_bytes.return_value = 10
+        mock_language_model_class.return_value.get_shared_memory_footprint.return_value = None
+        model_and_path = NonLoraModelAndPath("model_path", "base_model", "cpu", MagicMock(), MagicMock(),
+                                             LanguageModelCache())
+
+        mock_language_model_class.assert_not_called()
+        language_model = model_and_path.get_language_model()
+
+        mock_language_model_class.assert_called_once()
+        self.assertIs(mock_language_model_class.return_value, language_model)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from domain.language_model.model_factory.LoraModelAndTokenizerFactory import LoraModelAndTokenizerFactory
+
+FACTORY_MODULE = "domain.language_model.model_factory.LoraModelAndTokenizerFactory"
+
+
+@patch(f"{FACTORY_MODULE}.PeftModel")
+@patch(f"{FACTORY_MODULE}.transformers")
+@patch(f"{FACTORY_MODULE}.PeftConfig")
+class TestLoraModelAndTokenizerFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_directory.cleanup()
+
+    @staticmethod
+    def build_peft_model(mock_peft_model_class) -> MagicMock:
+        peft_model = MagicMock()
+        mock_peft_model_class.from_pretrained.return_value.to.return_value = peft_model
+
+        def save_pretrained(path, safe_serialization):
+            os.makedirs(path)
+
+        peft_model.merge_and_unload.return_value.save_pretrained.side_effect = save_pretrained
+        return peft_model
+
+    def test_get_model_without_merge_returns_peft_model(self, mock_peft_config, mock_transformers,
+                                                        mock_peft_model_class):
+        peft_model = self.build_peft_model(mock_peft_model_class)
+
+        model = LoraModelAndTokenizerFactory().get_model("adapter", "pythia", "cpu", 100)
+
+        self.assertIs(peft_model, model)
+        peft_model.merge_and_unload.assert_not_called()
+
+    def test_get_model_with_merge_saves_and_reuses_merged_weights(self, mock_peft_config, mock_transformers,
+                                                                  mock_peft_model_class):
+        mock_peft_config.from_pretrained.return_value.base_model_name_or_path = "EleutherAI/pythia-160m"
+        peft_model = self.build_peft_model(mock_peft_model_class)
+        factory = LoraModelAndTokenizerFactory(True, self.cache_directory.name)
+
+        merged_model = factory.get_model("adapter", "pythia", "cpu", 100)
+
+        self.assertIs(peft_model.merge_and_unload.return_value, merged_model)
+        merged_model.save_pretrained.assert_called_once()
+        self.assertTrue(merged_model.save_pretrained.call_args.kwargs["safe_serialization"])
+        self.assertEqual(1, len(os.listdir(self.cache_directory.name)))
+
+        factory.get_model("adapter", "pythia", "cpu", 100)
+
+        mock_peft_model_class.from_pretrained.assert_called_once()
+        merged_model_path = os.path.join(self.cache_directory.name, os.listdir(self.cache_directory.name)[0])
+        mock_transformers.GPTNeoXForCausalLM.from_pretrained.assert_called_with(merged_model_path)
+
+    def test_get_model_with_merge_without_cache_directory_merges_every_time(self, mock_peft_config,
+                                                                            mock_transformers,
+                                                                            mock_peft_model_class):
+        peft_model = self.build_peft_model(mock_peft_model_class)
+        factory = LoraModelAndTokenizerFactory(True)
+
+        factory.get_model("adapter", "pythia", "cpu", 100)
+        factory.get_model("adapter", "pythia", "cpu", 100)
+
+        self.assertEqual(2, peft_model.merge_and_unload.call_count)
+        peft_model.merge_and_unload.return_value.save_pretrained.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
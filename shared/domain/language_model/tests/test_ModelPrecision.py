@@ -0,0 +1,49 @@
+import unittest
+
+import torch
+
+from domain.language_model.model_factory.ModelPrecision import ModelPrecision, BF16_PRECISION, INT8_PRECISION
+
+
+class TestModelPrecision(unittest.TestCase):
+
+    def test_apply_bf16_converts_weights(self):
+        model = ModelPrecision.apply(torch.nn.Sequential(torch.nn.Linear(4, 4)), BF16_PRECISION, "cpu")
+
+        self.assertEqual(torch.bfloat16, model[0].weight.dtype)
+
+    def test_apply_int8_quantizes_linear_layers(self):
+        model = torch.nn.Sequential(torch.nn.Linear(4, 4), torch.nn.ReLU(), torch.nn.Linear(4, 2))
+        expected_output = model(torch.ones(1, 4))
+
+        quantized_model = ModelPrecision.apply(model, INT8_PRECISION, "cpu")
+
+        self.assertIsInstance(quantized_model[0], torch.ao.nn.quantized.dynamic.Linear)
+        self.assertTrue(torch.allclose(expected_output, quantized_model(torch.ones(1, 4)), atol=0.05))
+
+    def test_get_memory_footprint_bytes_counts_packed_int8_weights(self):
+        model = torch.nn.Sequential(torch.nn.Linear(64, 32), torch.nn.LayerNorm(32))
+
+        quantized_model = ModelPrecision.apply(model, INT8_PRECISION, "cpu")
+
+        # int8 weights, fp32 bias, fp32 scale, int64 zero point, fp32 layer norm
+        self.assertEqual(64 * 32 + 32 * 4 + 4 + 8 + 2 * 32 * 4,
+                         ModelPrecision.get_memory_footprint_bytes(quantized_model))
+
+    def test_get_memory_footprint_bytes_counts_tied_weights_once(self):
+        model = torch.nn.Sequential(torch.nn.Linear(4, 4, bias=False), torch.nn.Linear(4, 4, bias=False))
+        model[1].weight = model[0].weight
+
+        self.assertEqual(4 * 4 * 4, ModelPrecision.get_memory_footprint_bytes(model))
+
+    def test_apply_int8_on_gpu_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            ModelPrecision.apply(torch.nn.Linear(4, 4), INT8_PRECISION, "cuda")
+
+    def test_validate_unknown_precision_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            ModelPrecision.validate("int4")
+
+
+if __name__ == '__main__':
+    unittest.main()
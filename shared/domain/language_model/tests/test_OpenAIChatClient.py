@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from openai import BadRequestError
+
+from domain.language_model.OpenAIChatClient import OpenAIChatClient
+
+
+class StubOpenAIServer:
+    """
+    Local HTTP server answering chat completion requests. It waits latency_seconds before answering, and answers
+    the first number_of_rate_limited_requests requests with a 429.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, number_of_rate_limited_requests: int = 0,
+                 status_code: int = 200):
+        self.latency_seconds = latency_seconds
+        self.number_of_rate_limited_requests = number_of_rate_limited_requests
+        self.status_code = status_code
+        self.number_of_requests = 0
+        self.number_of_requests_in_flight = 0
+        self.maximum_number_of_requests_in_flight = 0
+        self.lock = threading.Lock()
+
+        stub_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub_server.lock:
+                    stub_server.number_of_requests += 1
+                    request_number = stub_server.number_of_requests
+                    stub_server.number_of_requests_in_flight += 1
+                    stub_server.maximum_number_of_requests_in_flight = max(
+                        stub_server.maximum_number_of_requests_in_flight, stub_server.number_of_requests_in_flight
+                    )
+                time.sleep(stub_server.latency_seconds)
+                with stub_server.lock:
+                    stub_server.number_of_requests_in_flight -= 1
+
+                if request_number <= stub_server.number_of_rate_limited_requests:
+                    self.__send(429, {"error": {"message": "rate limited", "type": "requests"}},
+                                {"retry-after": "0"})
+                elif stub_server.status_code != 200:
+                    self.__send(stub_server.status_code, {"error": {"message": "bad request", "type": "invalid"}})
+                else:
+                    self.__send(200, {
+                        "id": "completion", "object": "chat.completion", "created": 0, "model": request["model"],
+                        "choices": [{"index": index, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": f"answer {index}"}}
+                                    for index in range(request.get("n", 1))]
+                    })
+
+            def __send(self, status_code: int, body: dict, headers: dict | None = None):
+                encoded_body = json.dumps(body).encode()
+                try:
+                    self.send_response(status_code)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(encoded_body)))
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(encoded_body)
+                except ConnectionError:  # the client gave up on the request, e.g. at its deadline
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http_server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.http_server.server_address[1]}/v1"
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+
+    def shutdown(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+
+class TestOpenAIChatClient(unittest.TestCase):
+
+    def setUp(self):
+        self.stub_server = None
+        self.openai_chat_client = None
+
+    def tearDown(self):
+        if self.openai_chat_client is not None:
+            self.openai_chat_client.close()
+        if self.stub_server is not None:
+            self.stub_server.shutdown()
+
+    def build_client(self, stub_server: StubOpenAIServer, **kwargs) -> OpenAIChatClient:
+        self.stub_server = stub_server
+        self.openai_chat_client = OpenAIChatClient("key", stub_server.base_url, initial_backoff_seconds=0.01,
+                                                   **kwargs)
+        return self.openai_chat_client
+
+    def test_create_chat_completions_returns_every_choice(self):
+        openai_chat_client = self.build_client(StubOpenAIServer())
+
+        self.assertEqual(["answer 0", "answer 1", "answer 2"],
+                         openai_chat_client.create_chat_completions("model", "prompt", 1, 16, 3))
+
+    def test_create_chat_completions_retries_rate_limited_requests(self):
+        openai_chat_client = self.build_client(StubOpenAIServer(number_of_rate_limited_requests=2))
+
+        self.assertEqual(["answer 0"], openai_chat_client.create_chat_completions("model", "prompt", 1, 16))
+        self.assertEqual(3, self.stub_server.number_of_requests)
+
+    def test_create_chat_completions_raises_after_maximum_attempts(self):
+        openai_chat_client = self.build_client(StubOpenAIServer(number_of_rate_limited_requests=10),
+                                               maximum_attempts=3)
+
+        with self.assertRaises(Exception):
+            openai_chat_client.create_chat_completions("model", "prompt", 1, 16)
+        self.assertEqual(3, self.stub_server.number_of_requests)
+
+    def test_create_chat_completions_does_not_retry_client_errors(self):
+        openai_chat_client = self.build_client(StubOpenAIServer(status_code=400))
+
+        with self.assertRaises(BadRequestError):
+            openai_chat_client.create_chat_completions("model", "prompt", 1, 16)
+        self.assertEqual(1, self.stub_server.number_of_requests)
+
+    def test_create_chat_completions_stops_at_deadline(self):
+        openai_chat_client = self.build_client(StubOpenAIServer(latency_seconds=1.0))
+
+        start_time = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            openai_chat_client.create_chat_completions("model", "prompt", 1, 16, deadline_seconds=0.3)
+        self.assertLess(time.monotonic() - start_time, 0.9)
+
+    def test_concurrent_calls_respect_maximum_concurrent_requests(self):
+        openai_chat_client = self.build_client(StubOpenAIServer(latency_seconds=0.1), maximum_concurrent_requests=2)
+
+        threads = [threading.Thread(target=openai_chat_client.create_chat_completions,
+                                    args=("model", "prompt", 1, 16)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(6, self.stub_server.number_of_requests)
+        self.assertEqual(2, self.stub_server.maximum_number_of_requests_in_flight)
+
+
+if __name__ == '__main__':
+    unittest.main()
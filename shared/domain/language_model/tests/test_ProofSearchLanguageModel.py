@@ -1,6 +1,8 @@
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
+import torch
+
 from domain.language_model.ProofSearchLanguageModel import ProofSearchLanguageModel, THEOREM_WAS_PROVED_TACTIC, \
     ERROR_TACTIC
 from domain.language_model.model_factory.NonLoraModelAndTokenizerFactory import NonLoraModelAndTokenizerFactory
@@ -72,3 +74,153 @@ sorry
         actual_next_tactic = self.proof_search_language_model.get_next_tactic(theorem)
         self.assertNotEqual(THEOREM_WAS_PROVED_TACTIC, actual_next_tactic)
         self.assertNotEqual(ERROR_TACTIC, actual_next_tactic)
+
+    def test_get_several_next_tactics_batch_groups_tactics_and_scores_by_goal(self):
+        tokenizer = self.model_and_tokenizer_factory.get_tokenizer.return_value
+        tokenizer.eos_token_id = 5
+        tokenizer.pad_token_id = 5
+        tokenizer.return_value.to.return_value = {
+            "input_ids": torch.zeros((2, 3), dtype=torch.long),
+            "attention_mask": torch.ones((2, 3), dtype=torch.long)
+        }
+        tokenizer.batch_decode.return_value = ["tactic 1", "tactic 2", "tactic 3", "tactic 4"]
+
+        generated_tokens = torch.tensor([[1, 2], [3, 5], [5, 5], [4, 0]])
+        step_scores = (torch.randn((4, 6)), torch.randn((4, 6)))
+        self.mock_model.generate.return_value = MagicMock(
+            sequences=torch.cat((torch.zeros((4, 3), dtype=torch.long), generated_tokens), dim=1),
+            scores=step_scores
+        )
+
+        tactics, scores = self.proof_search_language_model.get_several_next_tactics_batch(["goal 1", "goal 2"], 2)
+
+        log_probs = [torch.nn.functional.log_softmax(step_score, dim=-1) for step_score in step_scores]
+        expected_scores = [
+            log_probs[0][0, 1].item() + log_probs[1][0, 2].item(),
+            log_probs[0][1, 3].item() + log_probs[1][1, 5].item(),
+            log_probs[0][2, 5].item(),
+            log_probs[0][3, 4].item() + log_probs[1][3, 0].item()
+        ]
+        self.assertEqual([["tactic 1", "tactic 2"], ["tactic 3", "tactic 4"]], tactics)
+        self.assertEqual(2, len(scores))
+        for actual_score, expected_score in zip(scores[0] + scores[1], expected_scores):
+            self.assertAlmostEqual(expected_score, actual_score, places=5)
+
+    def test_get_several_next_tactics_ignores_tokens_after_eos(self):
+        tokenizer = self.model_and_tokenizer_factory.get_tokenizer.return_value
+        tokenizer.eos_token_id = 5
+        tokenizer.pad_token_id = 5
+        tokenizer.return_value.to.return_value = {
+            "input_ids": torch.zeros((1, 2), dtype=torch.long),
+            "attention_mask": torch.ones((1, 2), dtype=torch.long)
+        }
+        tokenizer.batch_decode.return_value = ["tactic 1"]
+
+        first_step_scores = torch.randn((1, 6))
+        second_step_scores = torch.full((1, 6), float("-inf"))
+        self.mock_model.generate.return_value = MagicMock(
+            sequences=torch.tensor([[0, 0, 5, 1, 1]]),
+            scores=(first_step_scores, second_step_scores)
+        )
+
+        tactics, scores = self.proof_search_language_model.get_several_next_tactics("goal", 1)
+
+        self.assertEqual(["tactic 1"], tactics)
+        self.assertAlmostEqual(torch.nn.functional.log_softmax(first_step_scores, dim=-1)[0, 5].item(), scores[0],
+                               places=5)
+
+    def test_get_several_next_tactics_cuts_tactics_at_separator_and_ignores_padding(self):
+        tokenizer = self.model_and_tokenizer_factory.get_tokenizer.return_value
+        tokenizer.eos_token_id = 5
+        tokenizer.pad_token_id = 0
+        tokenizer.return_value.to.return_value = {
+            "input_ids": torch.ones((1, 2), dtype=torch.long),
+            "attention_mask": torch.ones((1, 2), dtype=torch.long)
+        }
+        tokenizer.batch_decode.return_value = ["simp [h]\n"]
+
+        step_scores = (torch.randn((1, 6)), torch.randn((1, 6)), torch.randn((1, 6)))
+        self.mock_model.generate.return_value = MagicMock(
+            sequences=torch.tensor([[1, 1, 3, 4, 0]]),
+            scores=step_scores
+        )
+
+        tactics, scores = self.proof_search_language_model.get_several_next_tactics("goal", 1)
+
+        self.assertEqual(["simp [h]"], tactics)
+        log_probs = [torch.nn.functional.log_softmax(step_score, dim=-1) for step_score in step_scores]
+        self.assertAlmostEqual(log_probs[0][0, 3].item() + log_probs[1][0, 4].item(), scores[0], places=5)
+
+    @patch("domain.language_model.TacticStoppingCriteria.TacticStoppingCriteria.find_stop_token_ids")
+    def test_get_several_next_tactics_ignores_padding_after_stop_token_when_padding_is_eos(
+            self,
+            mock_find_stop_token_ids
+    ):
+        mock_find_stop_token_ids.return_value = [4]
+        language_model = ProofSearchLanguageModel(self.finetuned_model_path, "base_model", "cpu",
+                                                  self.model_and_tokenizer_factory, self.lean_evaluator,
+                                                  self.lean_evaluation_interpreter)
+        tokenizer = self.model_and_tokenizer_factory.get_tokenizer.return_value
+        tokenizer.eos_token_id = 5
+        tokenizer.pad_token_id = 5
+        tokenizer.return_value.to.return_value = {
+            "input_ids": torch.ones((1, 2), dtype=torch.long),
+            "attention_mask": torch.ones((1, 2), dtype=torch.long)
+        }
+        tokenizer.batch_decode.return_value = ["simp\n"]
+
+        # the padding of a finished sequence is not sampled, so its log-probability can be -inf
+        step_scores = (torch.randn((1, 6)), torch.randn((1, 6)), torch.full((1, 6), float("-inf")))
+        self.mock_model.generate.return_value = MagicMock(
+            sequences=torch.tensor([[1, 1, 3, 4, 5]]),
+            scores=step_scores
+        )
+
+        tactics, scores = language_model.get_several_next_tactics("goal", 1)
+
+        self.assertEqual(["simp"], tactics)
+        log_probs = [torch.nn.functional.log_softmax(step_score, dim=-1) for step_score in step_scores]
+        self.assertAlmostEqual(log_probs[0][0, 3].item() + log_probs[1][0, 4].item(), scores[0], places=5)
+
+    def test_get_tactic_scores_only_sums_tactic_tokens(self):
+        tokenizer = self.model_and_tokenizer_factory.get_tokenizer.return_value
+        tokenizer.pad_token_id = 0
+        token_ids = {"goal": [1, 2], "a": [3], "a b": [3, 4]}
+        tokenizer.side_effect = lambda text, add_special_tokens=True: {"input_ids": token_ids[text]}
+        # every position predicts token 3 with probability 1/2 and the other tokens uniformly
+        logits = torch.zeros(2, 4, 5)
+        logits[:, :, 3] = torch.log(torch.tensor(4.0))
+        self.mock_model.return_value.logits = logits
+
+        scores = self.proof_search_language_model.get_tactic_scores("goal", ["a", "a b"])
+
+        input_ids = self.mock_model.call_args.kwargs["input_ids"]
+        self.assertEqual([[1, 2, 3, 0], [1, 2, 3, 4]], input_ids.tolist())
+        self.assertAlmostEqual(torch.log(torch.tensor(0.5)).item(), scores[0], places=5)
+        self.assertAlmostEqual(torch.log(torch.tensor(0.5 * 0.125)).item(), scores[1], places=5)
+
+    def test_get_several_next_tactics_batch_with_draft_model_uses_assisted_generation(self):
+        draft_model_and_tokenizer_factory = MagicMock(spec=NonLoraModelAndTokenizerFactory)
+        draft_model = draft_model_and_tokenizer_factory.get_model.return_value
+        draft_language_model = ProofSearchLanguageModel("draft_path", "base_model", "cpu",
+                                                        draft_model_and_tokenizer_factory, self.lean_evaluator,
+                                                        self.lean_evaluation_interpreter)
+        language_model = ProofSearchLanguageModel(self.finetuned_model_path, "base_model", "cpu",
+                                                  self.model_and_tokenizer_factory, self.lean_evaluator,
+                                                  self.lean_evaluation_interpreter,
+                                                  draft_language_model=draft_language_model)
+        tokenizer = self.model_and_tokenizer_factory.get_tokenizer.return_value
+        tokenizer.return_value.to.return_value = {"input_ids": torch.tensor([[1, 2]]),
+                                                  "attention_mask": torch.tensor([[1, 1]])}
+        tokenizer.decode.return_value = "simp"
+        self.mock_model.generate.return_value = MagicMock(sequences=torch.tensor([[1, 2, 3, 4]]), scores=())
+
+        tactics_per_goal, scores_per_goal = language_model.get_several_next_tactics_batch(["goal 1", "goal 2"], 3)
+
+        self.assertEqual([["simp"] * 3, ["simp"] * 3], tactics_per_goal)
+        self.assertEqual(6, self.mock_model.generate.call_count)
+        self.assertIs(draft_model, self.mock_model.generate.call_args.kwargs["assistant_model"])
+        statistics = language_model.get_speculative_decoding_statistics()
+        self.assertEqual(6, statistics.generate_calls)
+        self.assertEqual(12, statistics.generated_tokens)
+        self.assertIsNone(draft_language_model.get_speculative_decoding_statistics())
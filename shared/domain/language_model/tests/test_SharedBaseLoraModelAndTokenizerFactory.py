@@ -0,0 +1,117 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import torch
+
+from domain.language_model.model_factory.LoraAdapterModel import LoraAdapterModel
+from domain.language_model.model_factory.SharedBaseLoraModelAndTokenizerFactory import \
+    SharedBaseLoraModelAndTokenizerFactory
+
+FACTORY_MODULE = "domain.language_model.model_factory.SharedBaseLoraModelAndTokenizerFactory"
+
+
+class TestSharedBaseLoraModelAndTokenizerFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.peft_model = MagicMock()
+        self.peft_model.peft_config = dict()
+        self.peft_model.to.return_value = self.peft_model
+
+        def load_adapter(model_path, adapter_name):
+            self.peft_model.peft_config[adapter_name] = MagicMock()
+
+        self.peft_model.load_adapter.side_effect = load_adapter
+
+    @patch(f"{FACTORY_MODULE}.PeftModel")
+    @patch(f"{FACTORY_MODULE}.transformers")
+    @patch(f"{FACTORY_MODULE}.PeftConfig")
+    def test_get_model_loads_base_model_once(self, mock_peft_config, mock_transformers, mock_peft_model_class):
+        mock_peft_config.from_pretrained.return_value.base_model_name_or_path = "EleutherAI/pythia-160m"
+
+        def from_pretrained(base_model, model_path, adapter_name):
+            self.peft_model.peft_config[adapter_name] = MagicMock()
+            return self.peft_model
+
+        mock_peft_model_class.from_pretrained.side_effect = from_pretrained
+        factory = SharedBaseLoraModelAndTokenizerFactory()
+
+        first_model = factory.get_model("user/first-1.0", "pythia", "cpu", 100)
+        second_model = factory.get_model("user/second", "pythia", "cpu", 100)
+        factory.get_model("user/first-1.0", "pythia", "cpu", 100)
+
+        mock_transformers.GPTNeoXForCausalLM.from_pretrained.assert_called_once()
+        mock_peft_model_class.from_pretrained.assert_called_once()
+        self.peft_model.load_adapter.assert_called_once_with("user/second", adapter_name="user_second")
+        self.assertEqual("user_first_1_0", first_model.get_adapter_name())
+
+        second_model.generate("input_ids", max_new_tokens=1)
+        self.peft_model.set_adapter.assert_called_with("user_second")
+        self.peft_model.generate.assert_called_with("input_ids", max_new_tokens=1)
+        first_model.generate("input_ids")
+        self.peft_model.set_adapter.assert_called_with("user_first_1_0")
+
+    @patch(f"{FACTORY_MODULE}.PeftModel")
+    @patch(f"{FACTORY_MODULE}.transformers")
+    @patch(f"{FACTORY_MODULE}.PeftConfig")
+    def test_get_model_does_not_share_base_model_with_other_vocabulary(self, mock_peft_config, mock_transformers,
+                                                                       mock_peft_model_class):
+        mock_peft_config.from_pretrained.return_value.base_model_name_or_path = "EleutherAI/pythia-160m"
+        mock_peft_model_class.from_pretrained.return_value = self.peft_model
+        factory = SharedBaseLoraModelAndTokenizerFactory()
+
+        factory.get_model("first", "pythia", "cpu", 100)
+        factory.get_model("second", "pythia", "cpu", 101)
+
+        self.assertEqual(2, mock_transformers.GPTNeoXForCausalLM.from_pretrained.call_count)
+
+    @patch(f"{FACTORY_MODULE}.PeftModel")
+    @patch(f"{FACTORY_MODULE}.transformers")
+    @patch(f"{FACTORY_MODULE}.PeftConfig")
+    def test_get_model_drops_base_model_once_all_its_adapters_are_released(self, mock_peft_config, mock_transformers,
+                                                                          mock_peft_model_class):
+        mock_peft_config.from_pretrained.return_value.base_model_name_or_path = "EleutherAI/pythia-160m"
+        mock_peft_model_class.from_pretrained.return_value = self.peft_model
+        factory = SharedBaseLoraModelAndTokenizerFactory()
+
+        first_model = factory.get_model("first", "pythia", "cpu", 100)
+        second_model = factory.get_model("second", "pythia", "cpu", 100)
+        self.assertEqual(first_model.get_base_model_key(), second_model.get_base_model_key())
+
+        first_model.release()
+        self.assertEqual(1, factory.get_number_of_base_models())
+        second_model.release()
+        self.assertEqual(0, factory.get_number_of_base_models())
+
+        factory.get_model("first", "pythia", "cpu", 100)
+        self.assertEqual(2, mock_transformers.GPTNeoXForCausalLM.from_pretrained.call_count)
+
+    def test_adapter_model_base_model_footprint_only_counts_base_model_weights(self):
+        self.peft_model.named_parameters.return_value = [
+            ("base_model.model.layer.weight", torch.nn.Parameter(torch.zeros(10))),
+            ("base_model.model.layer.lora_A.first.weight", torch.nn.Parameter(torch.zeros(2))),
+        ]
+        self.peft_model.buffers.return_value = [torch.zeros(3)]
+        adapter_model = LoraAdapterModel(self.peft_model, "first", threading.Lock(), "pythia:100")
+
+        self.assertEqual((10 + 3) * 4, adapter_model.get_base_model_footprint_bytes())
+
+    def test_adapter_model_parameters_only_contain_adapter_weights(self):
+        adapter_weight = torch.nn.Parameter(torch.zeros(2))
+        self.peft_model.named_parameters.return_value = [
+            ("base_model.model.layer.weight", torch.nn.Parameter(torch.zeros(10))),
+            ("base_model.model.layer.lora_A.first.weight", adapter_weight),
+            ("base_model.model.layer.lora_A.second.weight", torch.nn.Parameter(torch.zeros(2))),
+        ]
+        mock_peft_config = MagicMock()
+        with patch(f"{FACTORY_MODULE}.PeftConfig", mock_peft_config), \
+                patch(f"{FACTORY_MODULE}.transformers"), \
+                patch(f"{FACTORY_MODULE}.PeftModel") as mock_peft_model_class:
+            mock_peft_model_class.from_pretrained.return_value = self.peft_model
+            adapter_model = SharedBaseLoraModelAndTokenizerFactory().get_model("first", "pythia", "cpu", 100)
+
+        self.assertEqual([adapter_weight], list(adapter_model.parameters()))
+
+
+if __name__ == '__main__':
+    unittest.main()
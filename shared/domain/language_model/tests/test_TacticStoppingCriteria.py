@@ -0,0 +1,35 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+import torch
+
+from domain.language_model.TacticStoppingCriteria import TacticStoppingCriteria
+
+
+class TestTacticStoppingCriteria(TestCase):
+    def test_call_stops_only_sequences_whose_last_token_is_a_stop_token(self):
+        tactic_stopping_criteria = TacticStoppingCriteria([7], 2)
+
+        should_stop = tactic_stopping_criteria(torch.tensor([[1, 1, 3, 7], [1, 1, 3, 4]]), None)
+
+        self.assertEqual([True, False], should_stop.tolist())
+
+    def test_call_does_not_stop_on_first_generated_token(self):
+        tactic_stopping_criteria = TacticStoppingCriteria([7], 2)
+
+        should_stop = tactic_stopping_criteria(torch.tensor([[1, 1, 7]]), None)
+
+        self.assertEqual([False], should_stop.tolist())
+
+    def test_find_stop_token_ids_returns_tokens_containing_a_separator(self):
+        tokenizer = MagicMock()
+        tokenizer.__len__.return_value = 4
+        tokenizer.batch_decode.return_value = ["simp", "\n", "]\n", " h"]
+
+        stop_token_ids = TacticStoppingCriteria.find_stop_token_ids(tokenizer, ("\n",))
+
+        self.assertEqual([1, 2], stop_token_ids)
+        tokenizer.batch_decode.assert_called_once_with([[0], [1], [2], [3]])
+
+    def test_find_stop_token_ids_returns_nothing_without_separators(self):
+        self.assertEqual([], TacticStoppingCriteria.find_stop_token_ids(MagicMock(), ()))
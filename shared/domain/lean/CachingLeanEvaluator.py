@@ -0,0 +1,199 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import override
+
+from lean_interact.interface import LeanError
+
+from domain.EasyLogger import EasyLogger
+from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
+from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanEvaluationCacheStatistics import LeanEvaluationCacheStatistics
+from domain.lean.LeanInteractFacade import ENV_INIT_CODE
+from domain.lean.LeanProofState import LeanProofState
+
+
+class CachingLeanEvaluator(ILeanEvaluator, ILeanEvaluationInterpreter):
+    """
+    Memoizes the outputs of another Lean evaluator. Entries are keyed by a hash of the environment header
+    and the code, evicted in LRU order once either the entry count or the byte budget is exceeded, and
+    dropped whenever the wrapped evaluator rebuilds its environment. The cache can be shared by concurrent
+    proof searches; the evaluations themselves run outside of its lock.
+    """
+    DEFAULT_MAXIMUM_ENTRIES = 4096
+    DEFAULT_MAXIMUM_BYTES = 64 * 1024 * 1024
+
+    def __init__(
+            self,
+            lean_evaluator: ILeanEvaluator,
+            lean_evaluation_interpreter: ILeanEvaluationInterpreter,
+            environment_header: str = ENV_INIT_CODE,
+            maximum_entries: int = DEFAULT_MAXIMUM_ENTRIES,
+            maximum_bytes: int = DEFAULT_MAXIMUM_BYTES
+    ):
+        self.__logger = EasyLogger()
+        self.__lean_evaluator = lean_evaluator
+        self.__lean_evaluation_interpreter = lean_evaluation_interpreter
+        self.__environment_header = environment_header
+        self.__maximum_entries = maximum_entries
+        self.__maximum_bytes = maximum_bytes
+
+        self.__lock = threading.Lock()
+        self.__key_to_output_and_size: OrderedDict[str, tuple[object, int]] = OrderedDict()
+        self.__size_in_bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        # hits and misses of each thread, a proof search runs on a single thread but shares the cache
+        self.__thread_statistics = threading.local()
+        self.__environment_generation = lean_evaluator.get_environment_generation()
+
+    @override
+    def evaluate(self, lean_code: str):
+        key = self.__build_key(lean_code)
+        with self.__lock:
+            self.__invalidate_if_environment_changed()
+            if key in self.__key_to_output_and_size:
+                self.__count(1, 0)
+                self.__key_to_output_and_size.move_to_end(key)
+                self.__logger.debug(f"Lean evaluation cache hit for key {key}")
+                return self.__key_to_output_and_size[key][0]
+            self.__count(0, 1)
+
+        lean_output = self.__lean_evaluator.evaluate(lean_code)
+
+        with self.__lock:
+            self.__invalidate_if_environment_changed()
+            if not isinstance(lean_output, LeanError):  # server failures are transient, they should be retried
+                self.__store(key, lean_output, len(lean_code.encode()) + len(str(lean_output).encode()))
+        return lean_output
+
+    @override
+    def evaluate_many(self, lean_codes: list[str]) -> list:
+        keys = [self.__build_key(lean_code) for lean_code in lean_codes]
+        key_to_output = dict()
+        missed_key_to_code = dict()
+        with self.__lock:
+            self.__invalidate_if_environment_changed()
+            for key, lean_code in zip(keys, lean_codes):
+                if key in self.__key_to_output_and_size:
+                    self.__count(1, 0)
+                    self.__key_to_output_and_size.move_to_end(key)
+                    key_to_output[key] = self.__key_to_output_and_size[key][0]
+                elif key in missed_key_to_code:
+                    self.__count(1, 0)
+                else:
+                    self.__count(0, 1)
+                    missed_key_to_code[key] = lean_code
+
+        missed_outputs = self.__lean_evaluator.evaluate_many(list(missed_key_to_code.values()))
+
+        with self.__lock:
+            self.__invalidate_if_environment_changed()
+            for (key, lean_code), lean_output in zip(missed_key_to_code.items(), missed_outputs):
+                key_to_output[key] = lean_output
+                if not isinstance(lean_output, LeanError):
+                    self.__store(key, lean_output, len(lean_code.encode()) + len(str(lean_output).encode()))
+
+        return [key_to_output[key] for key in keys]
+
+    # proof states only exist inside the REPL process, so tactic runs are never cached
+    @override
+    def start_proof(self, lean_code: str) -> LeanProofState | None:
+        return self.__lean_evaluator.start_proof(lean_code)
+
+    @override
+    def run_tactic(self, proof_state: LeanProofState, tactic: str) -> tuple[object, LeanProofState | None]:
+        return self.__lean_evaluator.run_tactic(proof_state, tactic)
+
+    @override
+    def run_tactics(
+            self,
+            proof_states_and_tactics: list[tuple[LeanProofState, str]]
+    ) -> list[tuple[object, LeanProofState | None]]:
+        return self.__lean_evaluator.run_tactics(proof_states_and_tactics)
+
+    @override
+    def get_environment_generation(self) -> int:
+        return self.__lean_evaluator.get_environment_generation()
+
+    @override
+    def is_theorem_solved(self, evaluation_output) -> bool:
+        return self.__lean_evaluation_interpreter.is_theorem_solved(evaluation_output)
+
+    @override
+    def has_errors(self, evaluation_output) -> bool:
+        return self.__lean_evaluation_interpreter.has_errors(evaluation_output)
+
+    @override
+    def get_error(self, evaluation_output) -> str:
+        return self.__lean_evaluation_interpreter.get_error(evaluation_output)
+
+    @override
+    def get_goals(self, tactic_output) -> list[str]:
+        return self.__lean_evaluation_interpreter.get_goals(tactic_output)
+
+    @override
+    def is_proof_state_unavailable(self, tactic_output) -> bool:
+        return self.__lean_evaluation_interpreter.is_proof_state_unavailable(tactic_output)
+
+    @override
+    def is_timeout(self, evaluation_output) -> bool:
+        return self.__lean_evaluation_interpreter.is_timeout(evaluation_output)
+
+    @override
+    def is_transient_error(self, evaluation_output) -> bool:
+        return self.__lean_evaluation_interpreter.is_transient_error(evaluation_output)
+
+    def get_statistics(self) -> LeanEvaluationCacheStatistics:
+        with self.__lock:
+            return LeanEvaluationCacheStatistics(
+                self.__hits,
+                self.__misses,
+                len(self.__key_to_output_and_size),
+                self.__size_in_bytes
+            )
+
+    def get_thread_hits_and_misses(self) -> tuple[int, int]:
+        """
+        Hits and misses of the evaluations made by the calling thread since it started.
+        """
+        return getattr(self.__thread_statistics, "hits", 0), getattr(self.__thread_statistics, "misses", 0)
+
+    def clear(self):
+        with self.__lock:
+            self.__clear()
+
+    def __clear(self):
+        self.__key_to_output_and_size.clear()
+        self.__size_in_bytes = 0
+
+    def __count(self, hits: int, misses: int):
+        self.__hits += hits
+        self.__misses += misses
+        self.__thread_statistics.hits = getattr(self.__thread_statistics, "hits", 0) + hits
+        self.__thread_statistics.misses = getattr(self.__thread_statistics, "misses", 0) + misses
+
+    def __build_key(self, lean_code: str) -> str:
+        return hashlib.sha256((self.__environment_header + "\0" + lean_code).encode()).hexdigest()
+
+    def __store(self, key: str, lean_output, size_in_bytes: int):
+        if size_in_bytes > self.__maximum_bytes:
+            return
+        if key in self.__key_to_output_and_size:  # a concurrent miss on the same code already stored it
+            self.__key_to_output_and_size.move_to_end(key)
+            return
+
+        self.__key_to_output_and_size[key] = (lean_output, size_in_bytes)
+        self.__size_in_bytes += size_in_bytes
+
+        while (len(self.__key_to_output_and_size) > self.__maximum_entries
+               or self.__size_in_bytes > self.__maximum_bytes):
+            _, (_, evicted_size_in_bytes) = self.__key_to_output_and_size.popitem(last=False)
+            self.__size_in_bytes -= evicted_size_in_bytes
+
+    def __invalidate_if_environment_changed(self):
+        environment_generation = self.__lean_evaluator.get_environment_generation()
+        if environment_generation != self.__environment_generation:
+            self.__logger.debug("The Lean environment was rebuilt. Will clear the Lean evaluation cache.")
+            self.__clear()
+            self.__environment_generation = environment_generation
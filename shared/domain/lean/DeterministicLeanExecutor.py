@@ -0,0 +1,81 @@
+import time
+import zlib
+from typing import override
+
+from domain.EasyLogger import EasyLogger
+from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
+from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanInteractFacade import GOALS_LIST_MESSAGE_PREFIX
+
+MESSAGES_KEY = "messages"
+MESSAGE_DATA_KEY = "data"
+SOLVED_KEY = "solved"
+ERROR_KEY = "error"
+
+DETERMINISTIC_LEAN_ERROR = "Deterministic lean error"
+GOAL_FORMAT = "⊢ goal {} of {}"
+
+
+class DeterministicLeanExecutor(ILeanEvaluator, ILeanEvaluationInterpreter):
+    """
+    Replacement for MockLeanExecutor which gives the same answer every time, so it can be used in benchmarks.
+    Every known theorem statement has a fixed list of proof tactics. A program is solved once it applies all of them
+    in order. A different tactic either fails or leaves the goal unchanged, depending on a hash of the tactic.
+    """
+
+    def __init__(self, statement_to_proof_tactics: dict[str, list[str]], evaluation_latency_seconds: float = 0.0):
+        self.__logger = EasyLogger()
+        self.__statement_to_proof_tactics = statement_to_proof_tactics
+        self.__evaluation_latency_seconds = evaluation_latency_seconds
+        self.__number_of_evaluations = 0
+
+    @override
+    def evaluate(self, lean_code: str):
+        self.__number_of_evaluations += 1
+        if self.__evaluation_latency_seconds > 0:
+            time.sleep(self.__evaluation_latency_seconds)
+
+        statement = next((statement for statement in self.__statement_to_proof_tactics
+                          if lean_code.startswith(statement)), None)
+        if statement is None:
+            return DeterministicLeanExecutor.__build_error_output()
+        proof_tactics = self.__statement_to_proof_tactics[statement]
+
+        number_of_applied_tactics = 0
+        for tactic in [line.strip() for line in lean_code[len(statement):].split("\n") if line.strip() != ""]:
+            if number_of_applied_tactics == len(proof_tactics):  # there are no goals left
+                return DeterministicLeanExecutor.__build_error_output()
+            if tactic == proof_tactics[number_of_applied_tactics]:
+                number_of_applied_tactics += 1
+            elif zlib.crc32(tactic.encode()) % 2 == 0:
+                return DeterministicLeanExecutor.__build_error_output()
+
+        if number_of_applied_tactics == len(proof_tactics):
+            return {MESSAGES_KEY: [], SOLVED_KEY: True, ERROR_KEY: None}
+        goal = DeterministicLeanExecutor.get_goal(statement, number_of_applied_tactics)
+        return {MESSAGES_KEY: [{MESSAGE_DATA_KEY: GOALS_LIST_MESSAGE_PREFIX + goal}], SOLVED_KEY: False,
+                ERROR_KEY: None}
+
+    @override
+    def is_theorem_solved(self, evaluation_output) -> bool:
+        return evaluation_output[SOLVED_KEY]
+
+    @override
+    def has_errors(self, evaluation_output) -> bool:
+        return evaluation_output[ERROR_KEY] is not None
+
+    @override
+    def get_error(self, evaluation_output) -> str:
+        return evaluation_output[ERROR_KEY] or ""
+
+    def get_number_of_evaluations(self) -> int:
+        return self.__number_of_evaluations
+
+    @staticmethod
+    def get_goal(statement: str, number_of_applied_tactics: int) -> str:
+        return GOAL_FORMAT.format(number_of_applied_tactics, statement)
+
+    @staticmethod
+    def __build_error_output() -> dict:
+        return {MESSAGES_KEY: [{MESSAGE_DATA_KEY: DETERMINISTIC_LEAN_ERROR}], SOLVED_KEY: False,
+                ERROR_KEY: DETERMINISTIC_LEAN_ERROR}
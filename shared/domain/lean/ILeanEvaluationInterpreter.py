@@ -7,3 +7,27 @@ class ILeanEvaluationInterpreter:
 
     def get_error(self, evaluation_output) -> str:
         pass
+
+    def get_goals(self, tactic_output) -> list[str]:
+        pass
+
+    def is_proof_state_unavailable(self, tactic_output) -> bool:
+        """
+        Whether a tactic could not be run because its proof state no longer exists (e.g. the environment
+        was rebuilt), in which case the caller should fall back to elaborating the whole program.
+        """
+        return False
+
+    def is_timeout(self, evaluation_output) -> bool:
+        """
+        Whether the evaluation was stopped because it ran out of wall-clock time. Unlike the other errors, this
+        depends on the load of the machine, so the output should not be remembered as the outcome of the code.
+        """
+        return False
+
+    def is_transient_error(self, evaluation_output) -> bool:
+        """
+        Whether the evaluation failed in the evaluator rather than in the Lean code (e.g. a crashed or recycled
+        server, or a timeout), so the same code may give another output next time.
+        """
+        return self.is_timeout(evaluation_output)
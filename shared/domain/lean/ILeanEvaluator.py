@@ -1,3 +1,40 @@
+from domain.lean.LeanProofState import LeanProofState
+
+
 class ILeanEvaluator:
     def evaluate(self, lean_code: str):
         pass
+
+    def evaluate_many(self, lean_codes: list[str]) -> list:
+        """
+        Evaluates several independent pieces of code, returning the outputs in the same order.
+        Evaluators which can run code in parallel should override this.
+        """
+        return [self.evaluate(lean_code) for lean_code in lean_codes]
+
+    def start_proof(self, lean_code: str) -> LeanProofState | None:
+        """
+        Elaborates a theorem (possibly with a partial proof) and returns a handle to the proof state
+        after its last tactic, or None if the evaluator does not support tactic mode or the code is invalid.
+        """
+        return None
+
+    def run_tactic(self, proof_state: LeanProofState, tactic: str) -> tuple[object, LeanProofState | None]:
+        """
+        Applies a single tactic to an existing proof state.
+        Returns the tactic output and a handle to the resulting proof state (None if the tactic failed).
+        """
+        pass
+
+    def run_tactics(
+            self,
+            proof_states_and_tactics: list[tuple[LeanProofState, str]]
+    ) -> list[tuple[object, LeanProofState | None]]:
+        return [self.run_tactic(proof_state, tactic) for proof_state, tactic in proof_states_and_tactics]
+
+    def get_environment_generation(self) -> int:
+        """
+        Incremented every time the evaluator rebuilds its Lean environment, so that callers holding
+        evaluation results (e.g. caches) know when to drop them.
+        """
+        return 0
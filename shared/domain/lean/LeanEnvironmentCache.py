@@ -0,0 +1,83 @@
+import re
+from collections import OrderedDict
+from typing import Callable
+
+from domain.EasyLogger import EasyLogger
+
+IMPORT_KEYWORD = "import"
+
+HEADER_KEYWORDS = (IMPORT_KEYWORD, "open", "set_option")
+
+COMMENT_PREFIX = "--"
+
+
+class LeanEnvironmentCache:
+    """
+    Maps environment headers (the import, set_option and open lines before a theorem) to the number of the REPL
+    environment built from them, so that every distinct header is only elaborated once. At most
+    maximum_environments are remembered, in LRU order. The REPL cannot free an environment, so evicted ones stay in
+    its memory until the REPL is recycled.
+    """
+    DEFAULT_MAXIMUM_ENVIRONMENTS = 16
+
+    def __init__(self, maximum_environments: int = DEFAULT_MAXIMUM_ENVIRONMENTS):
+        self.__logger = EasyLogger()
+        self.__maximum_environments = maximum_environments
+        self.__header_to_env_number: OrderedDict[str, int] = OrderedDict()
+
+    def get_or_build(self, environment_header: str, build_environment: Callable[[], int | None]) -> int | None:
+        """
+        Returns the environment of the header, built with build_environment if it isn't known yet. Headers whose
+        environment couldn't be built (None) are not remembered.
+        """
+        if environment_header in self.__header_to_env_number:
+            self.__header_to_env_number.move_to_end(environment_header)
+            return self.__header_to_env_number[environment_header]
+
+        self.__logger.debug(f"Will build the Lean environment of this header: {environment_header}")
+        env_number = build_environment()
+        if env_number is None:
+            return None
+
+        self.__header_to_env_number[environment_header] = env_number
+        while len(self.__header_to_env_number) > self.__maximum_environments:
+            evicted_header, _ = self.__header_to_env_number.popitem(last=False)
+            self.__logger.debug(f"Evicted the Lean environment of this header: {evicted_header}")
+        return env_number
+
+    def get_size(self) -> int:
+        return len(self.__header_to_env_number)
+
+    def clear(self):
+        self.__header_to_env_number.clear()
+
+    @staticmethod
+    def split_header(lean_code: str) -> tuple[str, str]:
+        """
+        Splits Lean code into its normalized environment header and the rest of the code. The header lines have their
+        whitespace collapsed and duplicates removed, with the imports first, so equivalent headers are equal strings.
+        "open ... in" and "set_option ... in" only apply to the next command, so they are not part of the header.
+        """
+        lines = lean_code.split("\n")
+        header_lines = []
+        number_of_header_lines = 0
+        for line in lines:
+            stripped_line = " ".join(line.split())
+            if stripped_line == "" or stripped_line.startswith(COMMENT_PREFIX):
+                number_of_header_lines += 1
+                continue
+            if (stripped_line.split(" ")[0] not in HEADER_KEYWORDS
+                    or re.search(r"\sin(\s|$)", stripped_line) is not None):
+                break
+            header_lines.append(stripped_line)
+            number_of_header_lines += 1
+
+        if not header_lines:
+            return "", lean_code
+        import_lines = [line for line in header_lines if LeanEnvironmentCache.is_import(line)]
+        other_lines = [line for line in header_lines if not LeanEnvironmentCache.is_import(line)]
+        return "\n".join(dict.fromkeys(import_lines + other_lines)), "\n".join(lines[number_of_header_lines:])
+
+    @staticmethod
+    def is_import(header_line: str) -> bool:
+        return header_line.split(" ")[0] == IMPORT_KEYWORD
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class LeanEvaluationCacheStatistics:
+    hits: int
+    misses: int
+    entries: int
+    size_in_bytes: int
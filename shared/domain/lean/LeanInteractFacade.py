@@ -1,13 +1,23 @@
+import hashlib
+import json
+import os
 import subprocess
-from typing import override
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import override, Callable
 
-from lean_interact import LeanREPLConfig, TempRequireProject, AutoLeanServer, Command, LeanServer
-from lean_interact.interface import LeanError, CommandResponse
+import psutil
+from lean_interact import LeanREPLConfig, TempRequireProject, AutoLeanServer, Command, LeanServer, ProofStep, \
+    PickleEnvironment, UnpickleEnvironment
+from lean_interact.interface import LeanError, CommandResponse, ProofStepResponse
 from pydantic import PydanticUserError
 
 from domain.EasyLogger import EasyLogger
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanEnvironmentCache import LeanEnvironmentCache
+from domain.lean.LeanProofState import LeanProofState
 from exception.LeanException import LeanException
 
 UNSTARTED_PROOF_DEFAULT_ERROR = "unexpected end of input; expected '{'"
@@ -18,6 +28,37 @@ ERROR_LEAN_MESSAGE_SEVERITY = "error"
 
 UNKNOWN_ENVIRONMENT_LEAN_ERROR_MESSAGE = "Unknown environment."
 
+UNAVAILABLE_PROOF_STATE_LEAN_ERROR_MESSAGE = "The proof state belongs to a previous Lean environment."
+
+LEAN_SERVER_ERROR_MESSAGE = "The lean server returned an error"
+
+LEAN_TIMEOUT_ERROR_MESSAGE = "The lean server did not respond in time"
+
+INVALID_ENVIRONMENT_HEADER_LEAN_ERROR_MESSAGE = "The imports, options and opens before the theorem are invalid"
+
+# errors of the REPL or of its environments rather than of the Lean code, the same code may succeed next time
+TRANSIENT_LEAN_ERROR_MESSAGES = (UNKNOWN_ENVIRONMENT_LEAN_ERROR_MESSAGE, UNAVAILABLE_PROOF_STATE_LEAN_ERROR_MESSAGE,
+                                 LEAN_SERVER_ERROR_MESSAGE, LEAN_TIMEOUT_ERROR_MESSAGE,
+                                 INVALID_ENVIRONMENT_HEADER_LEAN_ERROR_MESSAGE)
+
+MAX_HEARTBEATS_COMMAND_FORMAT = "set_option maxHeartbeats {}\n{}"
+
+MAX_HEARTBEATS_TACTIC_FORMAT = "set_option maxHeartbeats {} in {}"
+
+COMPLETED_PROOF_STATUS = "Completed"
+
+ERROR_PROOF_STATUS_PREFIX = "Error"
+
+GOALS_SEPARATOR = "\n\n"
+
+LAKE_MANIFEST_FILE_NAME = "lake-manifest.json"
+
+MATHLIB_PACKAGE_NAME = "mathlib"
+
+ENVIRONMENT_SNAPSHOT_EXTENSION = ".olean"
+
+SORRY_TACTIC = "sorry"
+
 ENV_INIT_CODE = """
                     import Mathlib
                     import Aesop
@@ -29,35 +70,83 @@ ENV_INIT_CODE = """
 
 
 class LeanInteractFacade(ILeanEvaluator, ILeanEvaluationInterpreter):
+    """
+    Runs Lean code on a lean-interact REPL with the ENV_INIT_CODE environment loaded. The REPL is recycled once its
+    resident memory exceeds maximum_memory_mb or once at least maximum_server_error_rate of the last
+    server_error_window calls failed inside the server. The replacement REPL imports Mathlib on a background thread
+    while the current one keeps serving, and is swapped in once it is ready, so for a while both are running.
+    Every command and tactic runs with at most max_heartbeats heartbeats (0 for no limit) and command_timeout_seconds
+    of wall-clock time. A REPL which runs out of time is killed and replaced, and the evaluation returns a timeout
+    error, see is_timeout.
+    Code can start with its own environment header (imports, options and opens). The environment of every distinct
+    header is built once, on top of the ENV_INIT_CODE environment, and kept in a LeanEnvironmentCache.
+    With an environment_snapshot_directory, the environment is pickled there after its first initialization and
+    unpickled on later starts. Snapshots are keyed by the Lean toolchain, the Mathlib revision and ENV_INIT_CODE.
+    """
     MAXIMUM_RUN_ATTEMPTS = 3
-    RESET_CACHE_STEPS = 30
+    DEFAULT_MAXIMUM_MEMORY_MB = 12 * 1024
+    DEFAULT_MEMORY_CHECK_INTERVAL = 10
+    DEFAULT_MAXIMUM_SERVER_ERROR_RATE = 0.2
+    DEFAULT_SERVER_ERROR_WINDOW = 20
+    DEFAULT_COMMAND_TIMEOUT_SECONDS = 60.0
+    DEFAULT_MAX_HEARTBEATS = 200000
 
-    def __init__(self, test_mode=False):
+    def __init__(
+            self,
+            test_mode=False,
+            maximum_memory_mb: float = DEFAULT_MAXIMUM_MEMORY_MB,
+            memory_check_interval: int = DEFAULT_MEMORY_CHECK_INTERVAL,
+            maximum_server_error_rate: float = DEFAULT_MAXIMUM_SERVER_ERROR_RATE,
+            server_error_window: int = DEFAULT_SERVER_ERROR_WINDOW,
+            lean_server_factory: Callable[[], LeanServer] | None = None,
+            environment_snapshot_directory: str | None = None,
+            command_timeout_seconds: float | None = DEFAULT_COMMAND_TIMEOUT_SECONDS,
+            max_heartbeats: int = DEFAULT_MAX_HEARTBEATS,
+            maximum_environments: int = LeanEnvironmentCache.DEFAULT_MAXIMUM_ENVIRONMENTS
+    ):
         self.__logger = EasyLogger()
         self.__test_mode = test_mode
+        self.__maximum_memory_mb = maximum_memory_mb
+        self.__memory_check_interval = memory_check_interval
+        self.__maximum_server_error_rate = maximum_server_error_rate
+        self.__lean_server_factory = lean_server_factory or LeanInteractFacade.build_lean_server
+        self.__environment_snapshot_directory = environment_snapshot_directory
+        self.__command_timeout_seconds = command_timeout_seconds
+        self.__max_heartbeats = max_heartbeats
+
+        self.__environment_generation = 0
+        self.__lean_server: LeanServer | None = None
+        self.__env_number = 0
+        self.__environment_cache = LeanEnvironmentCache(maximum_environments)
+        self.__number_of_calls = 0
+        self.__server_errors: deque[bool] = deque(maxlen=server_error_window)
+        self.__standby_executor = ThreadPoolExecutor(max_workers=1)
+        self.__standby_lean_environment: Future | None = None
         if not test_mode:
             self.__initialize_lean_environment()
-        self.__reset_cache_count = 0
 
     @override
     def evaluate(self, lean_code: str):
         self.__logger.debug(f"Will run this Lean code: {lean_code}")
 
-        self.__reset_cache_count += 1
-        if self.__reset_cache_count == self.RESET_CACHE_STEPS and not self.__test_mode:
-            self.__logger.debug(f"Will reset Lean cache")
-            self.__initialize_lean_environment()
-            self.__reset_cache_count = 0
+        self.__recycle_lean_environment_if_needed()
 
         # lean_code = "import Mathlib\n\n" + lean_code
+        environment_header, lean_code = LeanEnvironmentCache.split_header(lean_code)
 
         ran_successfully = False
         run_attempts = 0
         lean_output = None
         while not ran_successfully and run_attempts < LeanInteractFacade.MAXIMUM_RUN_ATTEMPTS:
+            env_number = self.__get_env_number(environment_header)
+            if env_number is None:
+                return LeanError(message=INVALID_ENVIRONMENT_HEADER_LEAN_ERROR_MESSAGE)
             self.__logger.debug(f"Will run code on the lean server")
-            lean_output = self.__run_lean_code_safely(lean_code, True)
+            lean_output = self.__run_lean_code_safely(self.__lean_server, lean_code, env_number,
+                                                      self.__command_timeout_seconds, self.__max_heartbeats)
             self.__logger.debug(f"Finished running code on the lean server")
+            if self.is_timeout(lean_output):
+                return lean_output  # the same code would only time out again
             if isinstance(lean_output, LeanError):
                 if lean_output.message == UNKNOWN_ENVIRONMENT_LEAN_ERROR_MESSAGE:
                     self.__logger.debug(
@@ -69,16 +158,65 @@ class LeanInteractFacade(ILeanEvaluator, ILeanEvaluationInterpreter):
                 ran_successfully = True
             run_attempts += 1
 
+        self.__record_call(isinstance(lean_output, LeanError) and lean_output.message == LEAN_SERVER_ERROR_MESSAGE)
         self.__logger.debug(f"lean server output: {lean_output}")
         return lean_output
 
+    @override
+    def start_proof(self, lean_code: str) -> LeanProofState | None:
+        # the proof state of the sorry is the one left after the last tactic of the given code
+        lean_output = self.evaluate(lean_code + "\n" + SORRY_TACTIC)
+        if isinstance(lean_output, LeanError) or len(lean_output.sorries) == 0:
+            return None
+        if lean_output.sorries[-1].proof_state is None:
+            return None
+        return LeanProofState(self.__environment_generation, lean_output.sorries[-1].proof_state)
+
+    @override
+    def run_tactic(self, proof_state: LeanProofState, tactic: str) -> tuple[object, LeanProofState | None]:
+        self.__logger.debug(f"Will run tactic {tactic} on proof state {proof_state}")
+        self.__recycle_lean_environment_if_needed()
+        if proof_state.environment_generation != self.__environment_generation:
+            return LeanError(message=UNAVAILABLE_PROOF_STATE_LEAN_ERROR_MESSAGE), None
+
+        if self.__max_heartbeats > 0:
+            tactic = MAX_HEARTBEATS_TACTIC_FORMAT.format(self.__max_heartbeats, tactic)
+        try:
+            tactic_output = self.__lean_server.run(ProofStep(proof_state=proof_state.proof_state, tactic=tactic),
+                                                   timeout=self.__command_timeout_seconds)
+        except TimeoutError as error:
+            self.__replace_timed_out_lean_server(error)
+            return LeanError(message=LEAN_TIMEOUT_ERROR_MESSAGE), None
+        except (ValueError, PydanticUserError) as error:
+            self.__logger.error(f"Running Lean tactic failed: {error}")
+            self.__record_call(True)
+            return LeanError(message=LEAN_SERVER_ERROR_MESSAGE), None
+        self.__record_call(False)
+
+        self.__logger.debug(f"lean server tactic output: {tactic_output}")
+        if not isinstance(tactic_output, ProofStepResponse):
+            return tactic_output, None
+        return tactic_output, LeanProofState(self.__environment_generation, tactic_output.proof_state)
+
+    @override
+    def get_environment_generation(self) -> int:
+        return self.__environment_generation
+
     @override
     def is_theorem_solved(self, repl_output) -> bool:
+        if isinstance(repl_output, LeanError):
+            return False
+        if isinstance(repl_output, ProofStepResponse):
+            return repl_output.proof_status == COMPLETED_PROOF_STATUS
         return repl_output.lean_code_is_valid()
         # return not self.has_errors(repl_output) and "Goals accomplished" in repl_output["messages"][-1]
 
     @override
     def has_errors(self, repl_output) -> bool:
+        if isinstance(repl_output, LeanError):
+            return True
+        if isinstance(repl_output, ProofStepResponse) and repl_output.proof_status.startswith(ERROR_PROOF_STATUS_PREFIX):
+            return True
         for message in repl_output.messages:
             if (message.severity == ERROR_LEAN_MESSAGE_SEVERITY and not message.data.startswith(GOALS_LIST_MESSAGE_PREFIX) and not
             message.data.startswith(UNSTARTED_PROOF_DEFAULT_ERROR)):
@@ -88,13 +226,141 @@ class LeanInteractFacade(ILeanEvaluator, ILeanEvaluationInterpreter):
     @override
     def get_error(self, evaluation_output) -> str:
         self.__logger.debug(f"Will get error of this evaluation output: {evaluation_output}")
+        if isinstance(evaluation_output, LeanError):
+            return evaluation_output.message
         for message in evaluation_output.messages:
             if (message.severity == ERROR_LEAN_MESSAGE_SEVERITY and not message.data.startswith(GOALS_LIST_MESSAGE_PREFIX) and not
             message.data.startswith(UNSTARTED_PROOF_DEFAULT_ERROR)):
                 return message.data
         raise LeanException("There are no errors in the provided evaluation output")
 
+    @override
+    def get_goals(self, tactic_output) -> list[str]:
+        return tactic_output.goals
+
+    @override
+    def is_proof_state_unavailable(self, tactic_output) -> bool:
+        return isinstance(tactic_output, LeanError) and tactic_output.message == UNAVAILABLE_PROOF_STATE_LEAN_ERROR_MESSAGE
+
+    @override
+    def is_timeout(self, evaluation_output) -> bool:
+        return isinstance(evaluation_output, LeanError) and evaluation_output.message == LEAN_TIMEOUT_ERROR_MESSAGE
+
+    # the REPL also answers a failed tactic with a LeanError, so only the errors raised by this facade are transient
+    @override
+    def is_transient_error(self, evaluation_output) -> bool:
+        return isinstance(evaluation_output, LeanError) and evaluation_output.message in TRANSIENT_LEAN_ERROR_MESSAGES
+
+    @staticmethod
+    def build_lean_server() -> LeanServer:
+        lean_config = LeanREPLConfig(project=TempRequireProject("mathlib"), verbose=True)
+        # return AutoLeanServer(lean_config)
+        return LeanServer(lean_config)
+
+    def __recycle_lean_environment_if_needed(self):
+        if self.__test_mode:
+            return
+
+        if self.__standby_lean_environment is not None and self.__standby_lean_environment.done():
+            standby_lean_server, standby_env_number = self.__standby_lean_environment.result()
+            self.__standby_lean_environment = None
+            if standby_lean_server is not None:
+                self.__logger.debug("The standby Lean environment is ready. Will switch to it.")
+                self.__replace_lean_environment(standby_lean_server, standby_env_number)
+                return
+
+        if self.__lean_server is None or not self.__lean_server.is_alive():
+            # nothing can be evaluated until a new server is ready
+            self.__logger.debug("The Lean server is not running. Will wait for a new Lean environment.")
+            if self.__standby_lean_environment is not None:
+                self.__replace_lean_environment(*self.__standby_lean_environment.result())
+                self.__standby_lean_environment = None
+            else:
+                self.__initialize_lean_environment()
+            return
+
+        if self.__standby_lean_environment is None and self.__should_recycle_lean_environment():
+            self.__logger.debug("Will prepare a standby Lean environment")
+            self.__standby_lean_environment = self.__standby_executor.submit(self.__start_lean_environment)
+
+    def __replace_timed_out_lean_server(self, error: TimeoutError):
+        self.__logger.error(f"Lean timed out after {self.__command_timeout_seconds} seconds: {error}")
+        # lean-interact kills the server after a timeout; the replacement is used as soon as it is ready
+        if not self.__test_mode and self.__standby_lean_environment is None:
+            self.__standby_lean_environment = self.__standby_executor.submit(self.__start_lean_environment)
+
+    def __should_recycle_lean_environment(self) -> bool:
+        if self.__number_of_calls > 0 and self.__number_of_calls % self.__memory_check_interval == 0:
+            memory_usage_mb = LeanInteractFacade.get_memory_usage_mb(self.__lean_server)
+            if memory_usage_mb > self.__maximum_memory_mb:
+                self.__logger.debug(f"The Lean server uses {memory_usage_mb:.0f} MB of memory")
+                return True
+
+        if len(self.__server_errors) == self.__server_errors.maxlen:
+            server_error_rate = sum(self.__server_errors) / len(self.__server_errors)
+            if server_error_rate >= self.__maximum_server_error_rate:
+                self.__logger.debug(f"{server_error_rate:.0%} of the recent Lean server calls failed")
+                return True
+        return False
+
+    def __record_call(self, failed_in_server: bool):
+        self.__number_of_calls += 1
+        self.__server_errors.append(failed_in_server)
+
     def __initialize_lean_environment(self):
+        self.__replace_lean_environment(*self.__start_lean_environment())
+
+    def __replace_lean_environment(self, lean_server: LeanServer | None, env_number: int):
+        if self.__lean_server is not None and self.__lean_server is not lean_server:
+            self.__lean_server.kill()
+        self.__lean_server = lean_server
+        self.__env_number = env_number
+        self.__environment_cache.clear()
+        self.__environment_generation += 1
+        self.__number_of_calls = 0
+        self.__server_errors.clear()
+
+    def __get_env_number(self, environment_header: str) -> int | None:
+        if environment_header == "":
+            return self.__env_number
+        return self.__environment_cache.get_or_build(environment_header,
+                                                     lambda: self.__build_environment(environment_header))
+
+    def __build_environment(self, environment_header: str) -> int | None:
+        """
+        Builds the environment of a header on top of the ENV_INIT_CODE environment. Only headers with other imports
+        need a fresh environment, since imports can't be added to an existing one.
+        """
+        base_environment_header, _ = LeanEnvironmentCache.split_header(ENV_INIT_CODE)
+        base_header_lines = base_environment_header.split("\n")
+        header_lines = environment_header.split("\n")
+        import_lines = [line for line in header_lines if LeanEnvironmentCache.is_import(line)]
+        other_lines = [line for line in header_lines if not LeanEnvironmentCache.is_import(line)]
+
+        if set(import_lines) <= set(base_header_lines):
+            if not other_lines:
+                return self.__env_number
+            header_lean_output = self.__run_lean_code_safely(self.__lean_server, "\n".join(other_lines),
+                                                             self.__env_number)
+        else:
+            base_import_lines = [line for line in base_header_lines if LeanEnvironmentCache.is_import(line)]
+            base_other_lines = [line for line in base_header_lines if not LeanEnvironmentCache.is_import(line)]
+            header_lean_output = self.__run_lean_code_safely(
+                self.__lean_server,
+                "\n".join(dict.fromkeys(base_import_lines + import_lines + base_other_lines + other_lines)),
+                None
+            )
+
+        if self.has_errors(header_lean_output):
+            self.__logger.error(f"Building the environment of a header failed: {header_lean_output}")
+            return None
+        return header_lean_output.env
+
+    def __start_lean_environment(self) -> tuple[LeanServer | None, int]:
+        """
+        Starts a new Lean server and loads ENV_INIT_CODE on it. Returns the server and the number of the loaded
+        environment, or no server if it couldn't be started.
+        """
         self.__logger.debug(f"Will run clear-lean-cache")
         try:
             subprocess.run(["clear-lean-cache"], check=True)
@@ -103,32 +369,130 @@ class LeanInteractFacade(ILeanEvaluator, ILeanEvaluationInterpreter):
             self.__logger.error(f"Could not complete clear-lean-cache: {e}")
 
         try:
-            lean_config = LeanREPLConfig(project=TempRequireProject("mathlib"), verbose=True)
-            # self.__lean_server = AutoLeanServer(lean_config)
-            self.__lean_server = LeanServer(lean_config)
+            lean_server = self.__lean_server_factory()
             # self.__lean_server.clear_session_cache(force=True)
-
         except (Exception, RuntimeError) as error:  # the library can throw many types of errors
             self.__logger.error(f"Initializing Lean env with lean-interact failed: {error}")
-            self.__env_number = 0
-            return
+            return None, 0
+
+        environment_snapshot_path = self.__get_environment_snapshot_path(lean_server)
+        if environment_snapshot_path is not None and os.path.exists(environment_snapshot_path):
+            env_number = self.__load_environment_snapshot(lean_server, environment_snapshot_path)
+            if env_number is not None:
+                return lean_server, env_number
 
         self.__logger.debug("will run env init code on the Lean server")
-        env_init_lean_output = self.__run_lean_code_safely(ENV_INIT_CODE, False)
+        env_init_lean_output = self.__run_lean_code_safely(lean_server, ENV_INIT_CODE, None)
         self.__logger.debug(f"env init lean output: {env_init_lean_output}")
 
         if isinstance(env_init_lean_output, LeanError):
-            self.__env_number = 0
-        else:
-            self.__env_number = env_init_lean_output.env
+            return lean_server, 0
+        if environment_snapshot_path is not None:
+            self.__save_environment_snapshot(lean_server, env_init_lean_output.env, environment_snapshot_path)
+        return lean_server, env_init_lean_output.env
+
+    def __get_environment_snapshot_path(self, lean_server: LeanServer) -> str | None:
+        if self.__environment_snapshot_directory is None:
+            return None
+        mathlib_revision = LeanInteractFacade.get_mathlib_revision(lean_server.config.working_dir)
+        if lean_server.lean_version is None or mathlib_revision is None:
+            self.__logger.debug("Unknown Lean or Mathlib version. Will not use an environment snapshot.")
+            return None
+
+        snapshot_key = hashlib.sha256(
+            "\0".join((lean_server.lean_version, mathlib_revision, ENV_INIT_CODE)).encode()
+        ).hexdigest()
+        return os.path.join(self.__environment_snapshot_directory, snapshot_key + ENVIRONMENT_SNAPSHOT_EXTENSION)
+
+    def __load_environment_snapshot(self, lean_server: LeanServer, environment_snapshot_path: str) -> int | None:
+        self.__logger.debug(f"Will unpickle the Lean environment from {environment_snapshot_path}")
+        try:
+            unpickle_output = lean_server.run(UnpickleEnvironment(unpickle_env_from=environment_snapshot_path))
+        except (ValueError, PydanticUserError) as error:
+            unpickle_output = LeanError(message=str(error))
+
+        if isinstance(unpickle_output, LeanError) or not unpickle_output.lean_code_is_valid():
+            self.__logger.error(f"Unpickling the Lean environment failed: {unpickle_output}. Will delete the snapshot.")
+            try:
+                os.remove(environment_snapshot_path)
+            except OSError:
+                pass
+            return None
+        return unpickle_output.env
+
+    def __save_environment_snapshot(self, lean_server: LeanServer, env_number: int, environment_snapshot_path: str):
+        self.__logger.debug(f"Will pickle the Lean environment to {environment_snapshot_path}")
+        # several servers of a pool can save the same snapshot at once
+        temporary_path = f"{environment_snapshot_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.__environment_snapshot_directory, exist_ok=True)
+            pickle_output = lean_server.run(PickleEnvironment(env=env_number, pickle_to=temporary_path))
+            if isinstance(pickle_output, LeanError):
+                self.__logger.error(f"Pickling the Lean environment failed: {pickle_output.message}")
+                return
+            os.replace(temporary_path, environment_snapshot_path)
+        except (OSError, ValueError, PydanticUserError) as error:
+            self.__logger.error(f"Saving the Lean environment snapshot failed: {error}")
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    @staticmethod
+    def get_memory_usage_mb(lean_server: LeanServer) -> float:
+        """
+        Returns the resident memory of the REPL process of lean_server and of its children, in MB. lean-interact 0.6
+        has no API for it, so the process is found from the pid of the subprocess of the server.
+        """
+        repl_subprocess = getattr(lean_server, "_proc", None)
+        if repl_subprocess is None:
+            return 0.0
+        try:
+            repl_process = psutil.Process(repl_subprocess.pid)
+            processes = [repl_process] + repl_process.children(recursive=True)
+        except psutil.Error:
+            return 0.0
+        memory_usage_bytes = 0
+        for process in processes:
+            try:
+                memory_usage_bytes += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return memory_usage_bytes / (1024 * 1024)
+
+    @staticmethod
+    def get_mathlib_revision(project_directory: str) -> str | None:
+        try:
+            with open(os.path.join(project_directory, LAKE_MANIFEST_FILE_NAME)) as lake_manifest_file:
+                lake_manifest = json.load(lake_manifest_file)
+        except (OSError, ValueError):
+            return None
+        return next((package.get("rev") for package in lake_manifest.get("packages", [])
+                     if package.get("name") == MATHLIB_PACKAGE_NAME), None)
 
-    def __run_lean_code_safely(self, lean_code: str, use_env: bool) -> CommandResponse | LeanError:
+    def __run_lean_code_safely(
+            self,
+            lean_server: LeanServer | None,
+            lean_code: str,
+            env_number: int | None,
+            timeout_seconds: float | None = None,
+            max_heartbeats: int = 0
+    ) -> CommandResponse | LeanError:
+        if lean_server is None:
+            return LeanError(message=LEAN_SERVER_ERROR_MESSAGE)
+        # set_option maxHeartbeats in the env init code only disables the limit by default. Commands have no
+        # set_options in lean-interact 0.6, so the option is set by the code itself, for all its declarations
+        if max_heartbeats > 0:
+            lean_code = MAX_HEARTBEATS_COMMAND_FORMAT.format(max_heartbeats, lean_code)
         try:
             self.__logger.debug(f"Will run this code on the Lean server: {lean_code}")
-            if use_env:
-                return self.__lean_server.run(Command(cmd=lean_code, all_tactics=True, env=self.__env_number))
+            if env_number is not None:
+                return lean_server.run(Command(cmd=lean_code, all_tactics=True, env=env_number),
+                                       timeout=timeout_seconds)
             else:
-                return self.__lean_server.run(Command(cmd=lean_code, all_tactics=True))
+                return lean_server.run(Command(cmd=lean_code, all_tactics=True), timeout=timeout_seconds)
+        except TimeoutError as error:
+            self.__replace_timed_out_lean_server(error)
+            return LeanError(message=LEAN_TIMEOUT_ERROR_MESSAGE)
         except (ValueError, PydanticUserError) as error:
             self.__logger.error(f"Running Lean code failed: {error}")
-            return LeanError(message="The lean server returned an error")
+            return LeanError(message=LEAN_SERVER_ERROR_MESSAGE)
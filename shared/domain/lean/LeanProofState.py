@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class LeanProofState:
+    """
+    Handle to a proof state living inside a Lean REPL process. It is only valid for the
+    environment generation (and, for pools, the server) that created it.
+    """
+    environment_generation: int
+    proof_state: int
+    lean_server_index: int = 0
@@ -0,0 +1,121 @@
+import dataclasses
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import override, Callable
+
+from domain.EasyLogger import EasyLogger
+from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
+from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanInteractFacade import LeanInteractFacade
+from domain.lean.LeanProofState import LeanProofState
+
+
+class LeanServerPool(ILeanEvaluator, ILeanEvaluationInterpreter):
+    """
+    Keeps several warm Lean REPL processes (each with the ENV_INIT_CODE environment loaded)
+    and spreads evaluations across them. Proof states live inside one process, so tactics are
+    always run on the server which created their proof state.
+    """
+
+    def __init__(self, pool_size: int, lean_server_factory: Callable[[], LeanInteractFacade] = LeanInteractFacade):
+        self.__logger = EasyLogger()
+        self.__pool_size = pool_size
+        self.__executor = ThreadPoolExecutor(max_workers=pool_size)
+
+        self.__logger.debug(f"Will start {pool_size} Lean servers")
+        self.__lean_servers = list(self.__executor.map(lambda _: lean_server_factory(), range(pool_size)))
+        self.__idle_lean_server_indexes = set(range(pool_size))
+        self.__idle_lean_server_condition = threading.Condition()
+        self.__logger.debug(f"Started {pool_size} Lean servers")
+
+    @override
+    def evaluate(self, lean_code: str):
+        lean_server_index = self.__acquire_lean_server()
+        try:
+            return self.__lean_servers[lean_server_index].evaluate(lean_code)
+        finally:
+            self.__release_lean_server(lean_server_index)
+
+    @override
+    def evaluate_many(self, lean_codes: list[str]) -> list:
+        return list(self.__executor.map(self.evaluate, lean_codes))
+
+    @override
+    def start_proof(self, lean_code: str) -> LeanProofState | None:
+        lean_server_index = self.__acquire_lean_server()
+        try:
+            proof_state = self.__lean_servers[lean_server_index].start_proof(lean_code)
+        finally:
+            self.__release_lean_server(lean_server_index)
+        if proof_state is None:
+            return None
+        return dataclasses.replace(proof_state, lean_server_index=lean_server_index)
+
+    @override
+    def run_tactic(self, proof_state: LeanProofState, tactic: str) -> tuple[object, LeanProofState | None]:
+        lean_server_index = self.__acquire_lean_server(proof_state.lean_server_index)
+        try:
+            tactic_output, new_proof_state = self.__lean_servers[lean_server_index].run_tactic(proof_state, tactic)
+        finally:
+            self.__release_lean_server(lean_server_index)
+        if new_proof_state is None:
+            return tactic_output, None
+        return tactic_output, dataclasses.replace(new_proof_state, lean_server_index=lean_server_index)
+
+    @override
+    def run_tactics(
+            self,
+            proof_states_and_tactics: list[tuple[LeanProofState, str]]
+    ) -> list[tuple[object, LeanProofState | None]]:
+        return list(self.__executor.map(lambda proof_state_and_tactic: self.run_tactic(*proof_state_and_tactic),
+                                        proof_states_and_tactics))
+
+    @override
+    def get_environment_generation(self) -> int:
+        return sum(lean_server.get_environment_generation() for lean_server in self.__lean_servers)
+
+    @override
+    def is_theorem_solved(self, evaluation_output) -> bool:
+        return self.__lean_servers[0].is_theorem_solved(evaluation_output)
+
+    @override
+    def has_errors(self, evaluation_output) -> bool:
+        return self.__lean_servers[0].has_errors(evaluation_output)
+
+    @override
+    def get_error(self, evaluation_output) -> str:
+        return self.__lean_servers[0].get_error(evaluation_output)
+
+    @override
+    def get_goals(self, tactic_output) -> list[str]:
+        return self.__lean_servers[0].get_goals(tactic_output)
+
+    @override
+    def is_proof_state_unavailable(self, tactic_output) -> bool:
+        return self.__lean_servers[0].is_proof_state_unavailable(tactic_output)
+
+    @override
+    def is_timeout(self, evaluation_output) -> bool:
+        return self.__lean_servers[0].is_timeout(evaluation_output)
+
+    @override
+    def is_transient_error(self, evaluation_output) -> bool:
+        return self.__lean_servers[0].is_transient_error(evaluation_output)
+
+    def get_pool_size(self) -> int:
+        return self.__pool_size
+
+    def __acquire_lean_server(self, lean_server_index: int | None = None) -> int:
+        with self.__idle_lean_server_condition:
+            while True:
+                if lean_server_index is None and self.__idle_lean_server_indexes:
+                    return self.__idle_lean_server_indexes.pop()
+                if lean_server_index in self.__idle_lean_server_indexes:
+                    self.__idle_lean_server_indexes.remove(lean_server_index)
+                    return lean_server_index
+                self.__idle_lean_server_condition.wait()
+
+    def __release_lean_server(self, lean_server_index: int):
+        with self.__idle_lean_server_condition:
+            self.__idle_lean_server_indexes.add(lean_server_index)
+            self.__idle_lean_server_condition.notify_all()
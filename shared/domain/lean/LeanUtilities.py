@@ -4,7 +4,9 @@ import re
 from domain.EasyLogger import EasyLogger
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
-from domain.lean.LeanInteractFacade import GOALS_LIST_MESSAGE_PREFIX
+from domain.lean.LeanEnvironmentCache import LeanEnvironmentCache
+from domain.lean.LeanInteractFacade import GOALS_LIST_MESSAGE_PREFIX, GOALS_SEPARATOR, ENV_INIT_CODE
+from domain.lean.LeanProofState import LeanProofState
 
 MESSAGE_DATA_KEY = "data"
 
@@ -15,6 +17,8 @@ GOAL_PROOFSTEP_FORMAT = "[GOAL]{}[PROOFSTEP]"
 class LeanUtilities:
     PROVED_FORMATTED_PROGRAM = f"[GOAL]no goals[PROOFSTEP]"
     ERROR_FORMATTED_PROGRAM = "error"
+    TIMEOUT_FORMATTED_PROGRAM = "timeout"
+    TRANSIENT_ERROR_FORMATTED_PROGRAM = "transient_error"
 
     logger = EasyLogger()
 
@@ -26,13 +30,98 @@ class LeanUtilities:
     ) -> str:
         LeanUtilities.logger.debug(f"Formatting program for: {program}")
         repl_output = lean_evaluator.evaluate(program)
+        return LeanUtilities.format_repl_output(repl_output, lean_evaluation_interpreter)
 
+    @staticmethod
+    def build_formatted_programs(
+            programs: list[str],
+            lean_evaluator: ILeanEvaluator,
+            lean_evaluation_interpreter: ILeanEvaluationInterpreter
+    ) -> list[str]:
+        LeanUtilities.logger.debug(f"Formatting {len(programs)} programs")
+        repl_outputs = lean_evaluator.evaluate_many(programs)
+        return [LeanUtilities.format_repl_output(repl_output, lean_evaluation_interpreter)
+                for repl_output in repl_outputs]
+
+    @staticmethod
+    def build_formatted_programs_from_proof_states(
+            programs: list[str],
+            proof_states: list[LeanProofState | None],
+            tactics: list[str],
+            lean_evaluator: ILeanEvaluator,
+            lean_evaluation_interpreter: ILeanEvaluationInterpreter
+    ) -> list[tuple[str, LeanProofState | None]]:
+        """
+        Formats programs[i] + "\n" + tactics[i] like build_formatted_programs, but only elaborates the tactic,
+        on top of the proof state reached by programs[i]. Falls back to elaborating the whole program when that
+        proof state is missing or no longer available. Also returns the proof states reached by the tactics.
+        """
+        formatted_programs_and_proof_states: list[tuple[str, LeanProofState | None] | None] = [None] * len(tactics)
+
+        indexes_with_proof_state = [index for index, proof_state in enumerate(proof_states) if proof_state is not None]
+        tactic_outputs_and_proof_states = lean_evaluator.run_tactics(
+            [(proof_states[index], tactics[index]) for index in indexes_with_proof_state]
+        )
+        for index, (tactic_output, new_proof_state) in zip(indexes_with_proof_state, tactic_outputs_and_proof_states):
+            if lean_evaluation_interpreter.is_proof_state_unavailable(tactic_output):
+                LeanUtilities.logger.debug(f"Proof state {proof_states[index]} is gone. Will check the whole program.")
+                continue
+            formatted_programs_and_proof_states[index] = (
+                LeanUtilities.format_tactic_output(tactic_output, lean_evaluation_interpreter),
+                new_proof_state
+            )
+
+        fallback_indexes = [index for index, formatted_program_and_proof_state
+                            in enumerate(formatted_programs_and_proof_states) if formatted_program_and_proof_state is None]
+        fallback_formatted_programs = LeanUtilities.build_formatted_programs(
+            [programs[index] + "\n" + tactics[index] for index in fallback_indexes],
+            lean_evaluator,
+            lean_evaluation_interpreter
+        )
+        for index, formatted_program in zip(fallback_indexes, fallback_formatted_programs):
+            formatted_programs_and_proof_states[index] = (formatted_program, None)
+
+        return formatted_programs_and_proof_states
+
+    @staticmethod
+    def format_tactic_output(tactic_output, lean_evaluation_interpreter: ILeanEvaluationInterpreter) -> str:
+        LeanUtilities.logger.debug(f"Tactic output: {tactic_output}")
+
+        if lean_evaluation_interpreter.is_theorem_solved(tactic_output):
+            LeanUtilities.logger.debug("The theorem has been proven.")
+            return LeanUtilities.PROVED_FORMATTED_PROGRAM
+
+        if lean_evaluation_interpreter.is_timeout(tactic_output):
+            LeanUtilities.logger.debug("Tactic output timed out.")
+            return LeanUtilities.TIMEOUT_FORMATTED_PROGRAM
+
+        if lean_evaluation_interpreter.is_transient_error(tactic_output):
+            LeanUtilities.logger.debug("Tactic output has an error of the Lean evaluator.")
+            return LeanUtilities.TRANSIENT_ERROR_FORMATTED_PROGRAM
+
+        if lean_evaluation_interpreter.has_errors(tactic_output):
+            LeanUtilities.logger.debug("Tactic output has errors.")
+            return LeanUtilities.ERROR_FORMATTED_PROGRAM
+
+        # the goals are separated like in the "unsolved goals" message, so both formats give the same string
+        return GOAL_PROOFSTEP_FORMAT.format(GOALS_SEPARATOR.join(lean_evaluation_interpreter.get_goals(tactic_output)))
+
+    @staticmethod
+    def format_repl_output(repl_output, lean_evaluation_interpreter: ILeanEvaluationInterpreter) -> str:
         LeanUtilities.logger.debug(f"REPL output: {repl_output}")
 
         if lean_evaluation_interpreter.is_theorem_solved(repl_output):
             LeanUtilities.logger.debug("The theorem has been proven.")
             return LeanUtilities.PROVED_FORMATTED_PROGRAM
 
+        if lean_evaluation_interpreter.is_timeout(repl_output):
+            LeanUtilities.logger.debug("REPL output timed out.")
+            return LeanUtilities.TIMEOUT_FORMATTED_PROGRAM
+
+        if lean_evaluation_interpreter.is_transient_error(repl_output):
+            LeanUtilities.logger.debug("REPL output has an error of the Lean evaluator.")
+            return LeanUtilities.TRANSIENT_ERROR_FORMATTED_PROGRAM
+
         if lean_evaluation_interpreter.has_errors(repl_output):
             LeanUtilities.logger.debug("REPL output has errors.")
             return LeanUtilities.ERROR_FORMATTED_PROGRAM
@@ -51,7 +140,34 @@ class LeanUtilities:
             LeanUtilities.logger.error(f"Error while building formatted program: {e}")
             return LeanUtilities.ERROR_FORMATTED_PROGRAM
 
+    @staticmethod
+    def normalize_theorem_statement(theorem_statement: str) -> str:
+        # neither the whitespace nor the name of the theorem changes what has to be proved, unlike the header
+        environment_header, theorem = LeanEnvironmentCache.split_header(theorem_statement)
+        normalized_theorem = re.sub(r"^theorem \S+", "theorem", " ".join(theorem.split()))
+        if environment_header == "":
+            return normalized_theorem
+        return environment_header + "\n" + normalized_theorem
+
     @staticmethod
     def extract_theorem_statement(theorem: str) -> str:
         match = re.search(r'(theorem .*? by)', theorem)
         return match.group(1) if match else None
+
+    @staticmethod
+    def extract_theorem_statement_with_header(theorem: str) -> str | None:
+        """
+        Like extract_theorem_statement, but keeps the imports, options and opens written before the theorem, except
+        the ones which ENV_INIT_CODE already provides.
+        """
+        theorem_statement = LeanUtilities.extract_theorem_statement(theorem)
+        if theorem_statement is None:
+            return None
+
+        environment_header, _ = LeanEnvironmentCache.split_header(theorem[:theorem.index(theorem_statement)])
+        base_environment_header, _ = LeanEnvironmentCache.split_header(ENV_INIT_CODE)
+        base_header_lines = set(base_environment_header.split("\n"))
+        header_lines = [line for line in environment_header.split("\n") if line and line not in base_header_lines]
+        if not header_lines:
+            return theorem_statement
+        return "\n".join(header_lines) + "\n" + theorem_statement
@@ -0,0 +1,128 @@
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from lean_interact.interface import LeanError
+
+from domain.lean.CachingLeanEvaluator import CachingLeanEvaluator
+from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
+from domain.lean.ILeanEvaluator import ILeanEvaluator
+
+
+class TestCachingLeanEvaluator(TestCase):
+    def setUp(self):
+        self.lean_evaluator = MagicMock(spec=ILeanEvaluator)
+        self.lean_evaluator.get_environment_generation.return_value = 1
+        self.lean_evaluator.evaluate.side_effect = lambda lean_code: f"output of {lean_code}"
+        self.lean_evaluator.evaluate_many.side_effect = lambda lean_codes: [f"output of {lean_code}"
+                                                                            for lean_code in lean_codes]
+        self.lean_evaluation_interpreter = MagicMock(spec=ILeanEvaluationInterpreter)
+
+    def test_evaluate_returns_cached_output_for_repeated_code(self):
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter)
+
+        first_output = caching_lean_evaluator.evaluate("theorem a : 1 = 1 := by")
+        second_output = caching_lean_evaluator.evaluate("theorem a : 1 = 1 := by")
+
+        self.assertEqual(first_output, second_output)
+        self.lean_evaluator.evaluate.assert_called_once()
+        statistics = caching_lean_evaluator.get_statistics()
+        self.assertEqual(1, statistics.hits)
+        self.assertEqual(1, statistics.misses)
+
+    def test_evaluate_evicts_least_recently_used_entry_when_full(self):
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter,
+                                                      maximum_entries=2)
+
+        caching_lean_evaluator.evaluate("first")
+        caching_lean_evaluator.evaluate("second")
+        caching_lean_evaluator.evaluate("first")
+        caching_lean_evaluator.evaluate("third")
+        caching_lean_evaluator.evaluate("first")
+        caching_lean_evaluator.evaluate("second")
+
+        self.assertEqual(4, self.lean_evaluator.evaluate.call_count)
+        self.assertEqual(2, caching_lean_evaluator.get_statistics().entries)
+
+    def test_evaluate_respects_byte_budget(self):
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter,
+                                                      maximum_bytes=40)
+
+        caching_lean_evaluator.evaluate("first")
+        caching_lean_evaluator.evaluate("second")
+
+        statistics = caching_lean_evaluator.get_statistics()
+        self.assertEqual(1, statistics.entries)
+        self.assertLessEqual(statistics.size_in_bytes, 40)
+
+    def test_evaluate_counts_the_size_of_concurrently_missed_code_once(self):
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter)
+        caching_lean_evaluator.evaluate("second")
+        single_entry_size_in_bytes = caching_lean_evaluator.get_statistics().size_in_bytes
+        caching_lean_evaluator.clear()
+
+        def evaluate(lean_code):
+            if self.lean_evaluator.evaluate.call_count == 2:  # another search misses the same code meanwhile
+                caching_lean_evaluator.evaluate(lean_code)
+            return f"output of {lean_code}"
+
+        self.lean_evaluator.evaluate.side_effect = evaluate
+        caching_lean_evaluator.evaluate("second")
+
+        statistics = caching_lean_evaluator.get_statistics()
+        self.assertEqual(3, self.lean_evaluator.evaluate.call_count)
+        self.assertEqual(1, statistics.entries)
+        self.assertEqual(single_entry_size_in_bytes, statistics.size_in_bytes)
+
+    def test_get_thread_hits_and_misses_only_counts_evaluations_of_calling_thread(self):
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter)
+        caching_lean_evaluator.evaluate("first")
+
+        thread = threading.Thread(target=lambda: caching_lean_evaluator.evaluate_many(["first", "second"]))
+        thread.start()
+        thread.join(5)
+        caching_lean_evaluator.evaluate("second")
+
+        self.assertEqual((1, 1), caching_lean_evaluator.get_thread_hits_and_misses())
+        statistics = caching_lean_evaluator.get_statistics()
+        self.assertEqual((2, 2), (statistics.hits, statistics.misses))
+
+    def test_evaluate_clears_cache_when_environment_is_rebuilt(self):
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter)
+
+        caching_lean_evaluator.evaluate("first")
+        self.lean_evaluator.get_environment_generation.return_value = 2
+        caching_lean_evaluator.evaluate("first")
+
+        self.assertEqual(2, self.lean_evaluator.evaluate.call_count)
+
+    def test_evaluate_does_not_cache_lean_server_errors(self):
+        self.lean_evaluator.evaluate.side_effect = None
+        self.lean_evaluator.evaluate.return_value = LeanError(message="The lean server returned an error")
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter)
+
+        caching_lean_evaluator.evaluate("first")
+        caching_lean_evaluator.evaluate("first")
+
+        self.assertEqual(2, self.lean_evaluator.evaluate.call_count)
+
+    def test_evaluate_uses_environment_header_in_key(self):
+        first_caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter,
+                                                            environment_header="import Mathlib")
+        second_caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter,
+                                                             environment_header="import Aesop")
+
+        self.assertNotEqual(first_caching_lean_evaluator._CachingLeanEvaluator__build_key("first"),
+                            second_caching_lean_evaluator._CachingLeanEvaluator__build_key("first"))
+
+    def test_evaluate_many_only_forwards_missed_codes(self):
+        caching_lean_evaluator = CachingLeanEvaluator(self.lean_evaluator, self.lean_evaluation_interpreter)
+        caching_lean_evaluator.evaluate("first")
+
+        outputs = caching_lean_evaluator.evaluate_many(["first", "second", "second"])
+
+        self.assertEqual(["output of first", "output of second", "output of second"], outputs)
+        self.lean_evaluator.evaluate_many.assert_called_once_with(["second"])
+        statistics = caching_lean_evaluator.get_statistics()
+        self.assertEqual(2, statistics.hits)
+        self.assertEqual(2, statistics.misses)
@@ -0,0 +1,40 @@
+import zlib
+from unittest import TestCase
+
+from domain.lean.DeterministicLeanExecutor import DeterministicLeanExecutor
+from domain.lean.LeanUtilities import LeanUtilities, GOAL_PROOFSTEP_FORMAT
+
+STATEMENT = "theorem a (x : ℕ) (h : x = 6) : x + 1 = 7 := by"
+
+
+class TestDeterministicLeanExecutor(TestCase):
+    def setUp(self):
+        self.deterministic_lean_executor = DeterministicLeanExecutor({STATEMENT: ["subst h", "norm_num"]})
+
+    def test_evaluate_returns_goal_after_applied_proof_tactics(self):
+        formatted_program = LeanUtilities.build_formatted_program(STATEMENT + "\nsubst h",
+                                                                  self.deterministic_lean_executor,
+                                                                  self.deterministic_lean_executor)
+
+        self.assertEqual(GOAL_PROOFSTEP_FORMAT.format(DeterministicLeanExecutor.get_goal(STATEMENT, 1)),
+                         formatted_program)
+
+    def test_evaluate_solves_theorem_after_all_proof_tactics(self):
+        formatted_program = LeanUtilities.build_formatted_program(STATEMENT + "\nsubst h\nnorm_num",
+                                                                  self.deterministic_lean_executor,
+                                                                  self.deterministic_lean_executor)
+
+        self.assertEqual(LeanUtilities.PROVED_FORMATTED_PROGRAM, formatted_program)
+
+    def test_evaluate_gives_same_answer_for_other_tactics_every_time(self):
+        tactic = next(f"tactic_{index}" for index in range(100) if zlib.crc32(f"tactic_{index}".encode()) % 2 == 0)
+
+        outputs = [self.deterministic_lean_executor.evaluate(STATEMENT + "\n" + tactic) for _ in range(3)]
+
+        self.assertTrue(all(self.deterministic_lean_executor.has_errors(output) for output in outputs))
+        self.assertEqual(3, self.deterministic_lean_executor.get_number_of_evaluations())
+
+    def test_evaluate_returns_error_for_unknown_theorem(self):
+        output = self.deterministic_lean_executor.evaluate("theorem b : 1 = 1 := by")
+
+        self.assertTrue(self.deterministic_lean_executor.has_errors(output))
@@ -0,0 +1,54 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from domain.lean.LeanEnvironmentCache import LeanEnvironmentCache
+
+
+class TestLeanEnvironmentCache(TestCase):
+    def test_split_header_returns_normalized_header_and_rest_of_code(self):
+        lean_code = """open  Finset
+-- custom imports
+import Mathlib.Tactic
+set_option maxRecDepth 1000
+open Finset
+
+theorem test (n : ℕ) : n = n := by
+rfl"""
+
+        environment_header, rest_of_code = LeanEnvironmentCache.split_header(lean_code)
+
+        self.assertEqual("import Mathlib.Tactic\nopen Finset\nset_option maxRecDepth 1000", environment_header)
+        self.assertEqual("theorem test (n : ℕ) : n = n := by\nrfl", rest_of_code)
+
+    def test_split_header_keeps_options_and_opens_of_the_next_command_in_the_code(self):
+        lean_code = "open Finset in\ntheorem test (n : ℕ) : n = n := by\nrfl"
+
+        self.assertEqual(("", lean_code), LeanEnvironmentCache.split_header(lean_code))
+
+    def test_get_or_build_builds_every_header_once(self):
+        lean_environment_cache = LeanEnvironmentCache()
+        build_environment = MagicMock(return_value=3)
+
+        self.assertEqual(3, lean_environment_cache.get_or_build("open Finset", build_environment))
+        self.assertEqual(3, lean_environment_cache.get_or_build("open Finset", build_environment))
+        build_environment.assert_called_once()
+
+    def test_get_or_build_does_not_remember_failed_headers(self):
+        lean_environment_cache = LeanEnvironmentCache()
+        build_environment = MagicMock(return_value=None)
+
+        self.assertIsNone(lean_environment_cache.get_or_build("import Unknown", build_environment))
+        self.assertIsNone(lean_environment_cache.get_or_build("import Unknown", build_environment))
+        self.assertEqual(2, build_environment.call_count)
+        self.assertEqual(0, lean_environment_cache.get_size())
+
+    def test_get_or_build_evicts_least_recently_used_environments(self):
+        lean_environment_cache = LeanEnvironmentCache(maximum_environments=2)
+        lean_environment_cache.get_or_build("open A", lambda: 1)
+        lean_environment_cache.get_or_build("open B", lambda: 2)
+        lean_environment_cache.get_or_build("open A", lambda: 10)
+        lean_environment_cache.get_or_build("open C", lambda: 3)
+
+        self.assertEqual(1, lean_environment_cache.get_or_build("open A", lambda: 10))
+        self.assertEqual(20, lean_environment_cache.get_or_build("open B", lambda: 20))
+        self.assertEqual(2, lean_environment_cache.get_size())
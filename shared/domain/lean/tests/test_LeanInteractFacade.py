@@ -0,0 +1,289 @@
+import json
+import os
+import subprocess
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch, create_autospec
+
+from lean_interact import Command, LeanServer, PickleEnvironment, ProofStep, UnpickleEnvironment
+from lean_interact.interface import LeanError, ProofStepResponse, CommandResponse
+
+from domain.lean.LeanInteractFacade import LeanInteractFacade, ENV_INIT_CODE
+from domain.lean.LeanProofState import LeanProofState
+from domain.lean.LeanUtilities import LeanUtilities
+
+
+class TestLeanInteractFacade(TestCase):
+    def setUp(self):
+        self.lean_interact_facade = LeanInteractFacade(test_mode=True)
+
+    def test_is_theorem_solved_returns_true_if_proof_step_completed_the_proof(self):
+        tactic_output = ProofStepResponse(proof_status="Completed", proof_state=3, goals=[])
+        self.assertTrue(self.lean_interact_facade.is_theorem_solved(tactic_output))
+        self.assertFalse(self.lean_interact_facade.has_errors(tactic_output))
+
+    def test_is_theorem_solved_returns_false_if_proof_step_left_goals(self):
+        tactic_output = ProofStepResponse(proof_status="Incomplete: open goals remain", proof_state=3,
+                                          goals=["x : ℕ\n⊢ x = 6"])
+        self.assertFalse(self.lean_interact_facade.is_theorem_solved(tactic_output))
+        self.assertFalse(self.lean_interact_facade.has_errors(tactic_output))
+        self.assertEqual(["x : ℕ\n⊢ x = 6"], self.lean_interact_facade.get_goals(tactic_output))
+
+    def test_has_errors_returns_true_for_lean_errors(self):
+        lean_error = LeanError(message="Lean error:\nunknown tactic")
+        self.assertTrue(self.lean_interact_facade.has_errors(lean_error))
+        self.assertFalse(self.lean_interact_facade.is_theorem_solved(lean_error))
+        self.assertEqual("Lean error:\nunknown tactic", self.lean_interact_facade.get_error(lean_error))
+        self.assertFalse(self.lean_interact_facade.is_transient_error(lean_error))
+        self.assertFalse(self.lean_interact_facade.is_timeout(lean_error))
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_only_server_failures_of_tactics_are_transient_errors_in_incremental_mode(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(lean_server_factory=lambda: build_lean_server(lean_servers))
+
+        def run(request, **_):
+            if not isinstance(request, ProofStep):
+                return CommandResponse(env=1)
+            if request.tactic.endswith("simpx"):
+                return LeanError(message="Lean error:\n<input>:1:0: unknown tactic")
+            raise ValueError("The Lean server closed the connection")
+
+        lean_servers[0].run.side_effect = run
+        proof_state = LeanProofState(lean_interact_facade.get_environment_generation(), 0)
+
+        formatted_programs_and_proof_states = LeanUtilities.build_formatted_programs_from_proof_states(
+            ["theorem test : 1 = 1 := by", "theorem test : 1 = 1 := by"], [proof_state, proof_state],
+            ["simpx", "simp"], lean_interact_facade, lean_interact_facade
+        )
+
+        self.assertEqual([(LeanUtilities.ERROR_FORMATTED_PROGRAM, None),
+                          (LeanUtilities.TRANSIENT_ERROR_FORMATTED_PROGRAM, None)],
+                         formatted_programs_and_proof_states)
+
+    def test_run_tactic_reports_proof_states_of_previous_environments_as_unavailable(self):
+        tactic_output, new_proof_state = self.lean_interact_facade.run_tactic(LeanProofState(5, 0), "simp")
+
+        self.assertIsNone(new_proof_state)
+        self.assertTrue(self.lean_interact_facade.is_proof_state_unavailable(tactic_output))
+
+    def test_get_memory_usage_mb_measures_the_repl_process(self):
+        lean_server = build_lean_server([])
+
+        self.assertGreater(LeanInteractFacade.get_memory_usage_mb(lean_server), 1)
+        lean_server._proc = None
+        self.assertEqual(0.0, LeanInteractFacade.get_memory_usage_mb(lean_server))
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_evaluate_keeps_using_the_same_lean_server_below_the_memory_limit(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(maximum_memory_mb=1024 * 1024, memory_check_interval=1,
+                                                  lean_server_factory=lambda: build_lean_server(lean_servers))
+
+        for _ in range(40):
+            lean_interact_facade.evaluate("theorem test : 1 = 1 := by rfl")
+
+        self.assertEqual(1, len(lean_servers))
+        self.assertEqual(1, lean_interact_facade.get_environment_generation())
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_evaluate_switches_to_a_standby_lean_server_above_the_memory_limit(self, _):
+        lean_servers = []
+        # the REPL process of the fake servers is the test process, which uses more than 1 MB
+        lean_interact_facade = LeanInteractFacade(maximum_memory_mb=1, memory_check_interval=1,
+                                                  lean_server_factory=lambda: build_lean_server(lean_servers))
+
+        call_until_environment_generation(lean_interact_facade, 2,
+                                          lambda: lean_interact_facade.evaluate("theorem test : 1 = 1 := by rfl"))
+        lean_interact_facade.evaluate("theorem test : 1 = 1 := by rfl")
+
+        self.assertEqual(2, len(lean_servers))
+        lean_servers[0].kill.assert_called_once()
+        self.assertEqual(1, lean_servers[1].run.call_args_list[-1].args[0].env)
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_run_tactic_switches_to_a_standby_lean_server_after_many_server_errors(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(maximum_server_error_rate=0.5, server_error_window=4,
+                                                  lean_server_factory=lambda: build_lean_server(lean_servers))
+        lean_servers[0].run.side_effect = ValueError("broken pipe")
+
+        for _ in range(4):
+            tactic_output, _ = lean_interact_facade.run_tactic(LeanProofState(1, 0), "simp")
+            self.assertTrue(lean_interact_facade.has_errors(tactic_output))
+        call_until_environment_generation(lean_interact_facade, 2,
+                                          lambda: lean_interact_facade.run_tactic(LeanProofState(1, 0), "simp"))
+
+        self.assertEqual(2, len(lean_servers))
+        lean_servers[0].kill.assert_called_once()
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_environment_snapshot_is_saved_once_and_reused(self, _):
+        with tempfile.TemporaryDirectory() as directory:
+            lean_servers = []
+            for _ in range(2):
+                LeanInteractFacade(
+                    lean_server_factory=lambda: build_snapshot_lean_server(lean_servers, directory, "mathlib-1"),
+                    environment_snapshot_directory=os.path.join(directory, "snapshots")
+                )
+
+            self.assertEqual(1, len(os.listdir(os.path.join(directory, "snapshots"))))
+            self.assertEqual([Command, PickleEnvironment], get_request_types(lean_servers[0]))
+            self.assertEqual([UnpickleEnvironment], get_request_types(lean_servers[1]))
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_environment_snapshot_of_another_mathlib_revision_is_not_used(self, _):
+        with tempfile.TemporaryDirectory() as directory:
+            lean_servers = []
+            for mathlib_revision in ("mathlib-1", "mathlib-2"):
+                LeanInteractFacade(
+                    lean_server_factory=lambda: build_snapshot_lean_server(lean_servers, directory, mathlib_revision),
+                    environment_snapshot_directory=directory
+                )
+
+            self.assertEqual([Command, PickleEnvironment], get_request_types(lean_servers[1]))
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_environment_snapshot_that_cannot_be_unpickled_is_replaced(self, _):
+        with tempfile.TemporaryDirectory() as directory:
+            lean_servers = []
+            LeanInteractFacade(
+                lean_server_factory=lambda: build_snapshot_lean_server(lean_servers, directory, "mathlib-1"),
+                environment_snapshot_directory=directory
+            )
+
+            def build_failing_lean_server():
+                lean_server = build_snapshot_lean_server(lean_servers, directory, "mathlib-1")
+                run = lean_server.run.side_effect
+                lean_server.run.side_effect = lambda request, **_: LeanError(message="corrupted") \
+                    if isinstance(request, UnpickleEnvironment) else run(request)
+                return lean_server
+
+            lean_interact_facade = LeanInteractFacade(lean_server_factory=build_failing_lean_server,
+                                                      environment_snapshot_directory=directory)
+
+            self.assertEqual([UnpickleEnvironment, Command, PickleEnvironment], get_request_types(lean_servers[1]))
+            self.assertEqual(1, len([file_name for file_name in os.listdir(directory) if file_name.endswith(".olean")]))
+            lean_interact_facade.evaluate("theorem test : 1 = 1 := by rfl")
+            self.assertEqual(4, lean_servers[1].run.call_args.args[0].env)
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_evaluate_reports_timeouts_and_replaces_the_lean_server(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(command_timeout_seconds=5, max_heartbeats=1000,
+                                                  lean_server_factory=lambda: build_lean_server(lean_servers))
+
+        def run_until_timeout(*_, **__):
+            lean_servers[0].is_alive.return_value = False  # lean-interact kills the server which timed out
+            raise TimeoutError("The Lean server did not respond in time")
+
+        lean_servers[0].run.side_effect = run_until_timeout
+
+        lean_output = lean_interact_facade.evaluate("theorem test : 1 = 1 := by simp")
+
+        self.assertTrue(lean_interact_facade.is_timeout(lean_output))
+        self.assertTrue(lean_interact_facade.has_errors(lean_output))
+        self.assertEqual(2, lean_servers[0].run.call_count)  # the env init code, then the code without retries
+        # lean-interact sends the dump of the request to the REPL
+        request = lean_servers[0].run.call_args.args[0].model_dump(exclude_none=True, by_alias=True)
+        self.assertEqual({"cmd": "set_option maxHeartbeats 1000\ntheorem test : 1 = 1 := by simp", "env": 1,
+                          "allTactics": True}, request)
+        self.assertEqual(5, lean_servers[0].run.call_args.kwargs["timeout"])
+
+        lean_output = lean_interact_facade.evaluate("theorem test : 1 = 1 := by rfl")
+        self.assertFalse(lean_interact_facade.has_errors(lean_output))
+        self.assertEqual(2, len(lean_servers))
+        self.assertEqual(2, lean_interact_facade.get_environment_generation())
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_run_tactic_limits_the_heartbeats_of_the_tactic(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(max_heartbeats=1000,
+                                                  lean_server_factory=lambda: build_lean_server(lean_servers))
+
+        lean_interact_facade.run_tactic(LeanProofState(1, 0), "simp")
+
+        self.assertEqual("set_option maxHeartbeats 1000 in simp", lean_servers[0].run.call_args.args[0].tactic)
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_evaluate_builds_the_environment_of_a_header_once_on_top_of_the_base_environment(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(lean_server_factory=lambda: build_lean_server(lean_servers))
+        lean_servers[0].run.return_value = CommandResponse(env=2)
+
+        for _ in range(3):
+            lean_interact_facade.evaluate("open Finset\ntheorem test : 1 = 1 := by rfl")
+
+        commands = [run_call.args[0] for run_call in lean_servers[0].run.call_args_list]
+        self.assertEqual(5, len(commands))  # the env init code, the header, then the theorem three times
+        self.assertEqual(("open Finset", 1), (commands[1].cmd, commands[1].env))
+        self.assertEqual(("set_option maxHeartbeats 200000\ntheorem test : 1 = 1 := by rfl", 2),
+                         (commands[-1].cmd, commands[-1].env))
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_evaluate_builds_a_fresh_environment_for_other_imports(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(lean_server_factory=lambda: build_lean_server(lean_servers))
+
+        lean_interact_facade.evaluate("import Mathlib\nimport Custom.Module\ntheorem test : 1 = 1 := by rfl")
+
+        header_command = lean_servers[0].run.call_args_list[1].args[0]
+        self.assertIsNone(header_command.env)
+        self.assertTrue(header_command.cmd.startswith("import Mathlib\nimport Aesop\nimport Custom.Module\n"))
+
+    @patch("domain.lean.LeanInteractFacade.subprocess.run")
+    def test_evaluate_reports_invalid_headers(self, _):
+        lean_servers = []
+        lean_interact_facade = LeanInteractFacade(lean_server_factory=lambda: build_lean_server(lean_servers))
+        lean_servers[0].run.return_value = LeanError(message="unknown module prefix 'Custom'")
+
+        lean_output = lean_interact_facade.evaluate("import Custom.Module\ntheorem test : 1 = 1 := by rfl")
+
+        self.assertTrue(lean_interact_facade.has_errors(lean_output))
+        self.assertEqual(2, lean_servers[0].run.call_count)
+
+
+def build_lean_server(lean_servers: list):
+    lean_server = create_autospec(LeanServer, instance=True)
+    # the pinned lean-interact 0.6 has no get_memory_usage, the memory of the REPL process is measured instead
+    del lean_server.get_memory_usage
+    lean_server._proc = MagicMock(spec=subprocess.Popen, pid=os.getpid())
+    lean_server.config = MagicMock()
+    lean_server.is_alive.return_value = True
+    lean_server.run.return_value = CommandResponse(env=1)
+    lean_servers.append(lean_server)
+    return lean_server
+
+
+def call_until_environment_generation(lean_interact_facade: LeanInteractFacade, environment_generation: int, call):
+    deadline = time.monotonic() + 5
+    while lean_interact_facade.get_environment_generation() < environment_generation:
+        if time.monotonic() > deadline:
+            raise TimeoutError("The standby Lean server wasn't used")
+        call()
+        time.sleep(0.01)
+
+
+def build_snapshot_lean_server(lean_servers: list, project_directory: str, mathlib_revision: str):
+    with open(os.path.join(project_directory, "lake-manifest.json"), "w") as lake_manifest_file:
+        json.dump({"packages": [{"name": "mathlib", "rev": mathlib_revision}]}, lake_manifest_file)
+
+    def run(request, **_):
+        if isinstance(request, PickleEnvironment):
+            with open(request.pickle_to, "w") as snapshot_file:
+                snapshot_file.write("environment")
+            return CommandResponse(env=request.env)
+        if isinstance(request, UnpickleEnvironment):
+            return CommandResponse(env=7)
+        return CommandResponse(env=4)
+
+    lean_server = build_lean_server(lean_servers)
+    lean_server.config.working_dir = project_directory
+    lean_server.lean_version = "v4.19.0"
+    lean_server.run.side_effect = run
+    return lean_server
+
+
+def get_request_types(lean_server) -> list[type]:
+    return [type(run_call.args[0]) for run_call in lean_server.run.call_args_list]
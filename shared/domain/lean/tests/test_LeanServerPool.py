@@ -0,0 +1,62 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from domain.lean.LeanInteractFacade import LeanInteractFacade
+from domain.lean.LeanProofState import LeanProofState
+from domain.lean.LeanServerPool import LeanServerPool
+
+
+class TestLeanServerPool(TestCase):
+    def setUp(self):
+        self.lean_servers = []
+
+    def __build_lean_server(self) -> LeanInteractFacade:
+        lean_server = MagicMock(spec=LeanInteractFacade)
+        lean_server.evaluate.side_effect = lambda lean_code: f"output of {lean_code}"
+        lean_server.get_environment_generation.return_value = 1
+        lean_server.start_proof.return_value = LeanProofState(1, 0)
+        lean_server.run_tactic.side_effect = lambda proof_state, tactic: (tactic, LeanProofState(1, 1))
+        self.lean_servers.append(lean_server)
+        return lean_server
+
+    def test_init_starts_requested_number_of_lean_servers(self):
+        lean_server_pool = LeanServerPool(3, self.__build_lean_server)
+
+        self.assertEqual(3, len(self.lean_servers))
+        self.assertEqual(3, lean_server_pool.get_environment_generation())
+
+    def test_evaluate_many_returns_outputs_in_order(self):
+        lean_server_pool = LeanServerPool(2, self.__build_lean_server)
+
+        lean_codes = [f"code {index}" for index in range(10)]
+        self.assertEqual([f"output of {lean_code}" for lean_code in lean_codes],
+                         lean_server_pool.evaluate_many(lean_codes))
+
+    def test_evaluate_many_runs_on_several_lean_servers_concurrently(self):
+        lean_server_pool = LeanServerPool(2, self.__build_lean_server)
+        barrier = threading.Barrier(2, timeout=5)
+
+        def evaluate_when_both_servers_are_busy(lean_code: str) -> str:
+            barrier.wait()
+            time.sleep(0.01)
+            return lean_code
+
+        for lean_server in self.lean_servers:
+            lean_server.evaluate.side_effect = evaluate_when_both_servers_are_busy
+
+        self.assertEqual(["first", "second"], lean_server_pool.evaluate_many(["first", "second"]))
+        for lean_server in self.lean_servers:
+            lean_server.evaluate.assert_called_once()
+
+    def test_run_tactics_runs_each_tactic_on_the_server_owning_its_proof_state(self):
+        lean_server_pool = LeanServerPool(3, self.__build_lean_server)
+
+        proof_state = lean_server_pool.start_proof("theorem a : 1 = 1 := by")
+        outputs = lean_server_pool.run_tactics([(proof_state, "simp"), (proof_state, "rfl")])
+
+        owner_lean_server = self.lean_servers[proof_state.lean_server_index]
+        self.assertEqual(2, owner_lean_server.run_tactic.call_count)
+        self.assertEqual([("simp", LeanProofState(1, 1, proof_state.lean_server_index)),
+                          ("rfl", LeanProofState(1, 1, proof_state.lean_server_index))], outputs)
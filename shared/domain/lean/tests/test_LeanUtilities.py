@@ -3,6 +3,7 @@ from unittest.mock import MagicMock
 
 from domain.lean.ILeanEvaluationInterpreter import ILeanEvaluationInterpreter
 from domain.lean.ILeanEvaluator import ILeanEvaluator
+from domain.lean.LeanProofState import LeanProofState
 from domain.lean.LeanUtilities import LeanUtilities
 
 
@@ -38,6 +39,8 @@ class TestLeanUtilities(TestCase):
             {'severity': 'error', 'pos': {'line': 2, 'column': 8}, 'endPos': {'line': 2, 'column': 30},
              'data': "unsolved goals\ncase succ.hab\nn✝ : ℕ\n⊢ 2 ∣ 4"}], 'env': 0}
         mock_evaluation_interpreter = MagicMock(spec=ILeanEvaluationInterpreter)
+        mock_evaluation_interpreter.is_timeout.return_value = False
+        mock_evaluation_interpreter.is_transient_error.return_value = False
         mock_evaluation_interpreter.has_errors.return_value = False
         mock_evaluation_interpreter.is_theorem_solved.return_value = False
 
@@ -58,6 +61,9 @@ n✝ : ℕ
         mock_evaluator = MagicMock(spec=ILeanEvaluator)
 
         mock_evaluation_interpreter = MagicMock(spec=ILeanEvaluationInterpreter)
+
+        mock_evaluation_interpreter.is_timeout.return_value = False
+        mock_evaluation_interpreter.is_transient_error.return_value = False
         mock_evaluation_interpreter.has_errors.return_value = False
         mock_evaluation_interpreter.is_theorem_solved.return_value = True
 
@@ -72,6 +78,9 @@ rw [h]"""
         mock_evaluator = MagicMock(spec=ILeanEvaluator)
 
         mock_evaluation_interpreter = MagicMock(spec=ILeanEvaluationInterpreter)
+
+        mock_evaluation_interpreter.is_timeout.return_value = False
+        mock_evaluation_interpreter.is_transient_error.return_value = False
         mock_evaluation_interpreter.has_errors.return_value = True
         mock_evaluation_interpreter.is_theorem_solved.return_value = False
 
@@ -81,10 +90,85 @@ abcde"""
                                                                                                       mock_evaluator,
                                                                                                       mock_evaluation_interpreter))
 
+    def test_build_formatted_programs_from_proof_states_formats_goals_of_tactic_outputs(self):
+        mock_evaluator = MagicMock(spec=ILeanEvaluator)
+        tactic_output = MagicMock()
+        new_proof_state = LeanProofState(1, 2)
+        mock_evaluator.run_tactics.return_value = [(tactic_output, new_proof_state)]
+        mock_evaluation_interpreter = MagicMock(spec=ILeanEvaluationInterpreter)
+        mock_evaluation_interpreter.is_timeout.return_value = False
+        mock_evaluation_interpreter.is_transient_error.return_value = False
+        mock_evaluation_interpreter.is_proof_state_unavailable.return_value = False
+        mock_evaluation_interpreter.is_theorem_solved.return_value = False
+        mock_evaluation_interpreter.has_errors.return_value = False
+        mock_evaluation_interpreter.get_goals.return_value = ["x : ℕ\n⊢ x = 6", "y : ℕ\n⊢ y = 7"]
+        mock_evaluator.evaluate_many.return_value = []
+
+        actual = LeanUtilities.build_formatted_programs_from_proof_states(
+            ["theorem a : b := by"], [LeanProofState(1, 1)], ["intro x"], mock_evaluator, mock_evaluation_interpreter
+        )
+
+        self.assertEqual([("[GOAL]x : ℕ\n⊢ x = 6\n\ny : ℕ\n⊢ y = 7[PROOFSTEP]", new_proof_state)], actual)
+        mock_evaluator.run_tactics.assert_called_once_with([(LeanProofState(1, 1), "intro x")])
+
+    def test_build_formatted_programs_from_proof_states_falls_back_to_whole_program(self):
+        mock_evaluator = MagicMock(spec=ILeanEvaluator)
+        mock_evaluator.run_tactics.return_value = [(MagicMock(), None)]
+        mock_evaluator.evaluate_many.return_value = [MagicMock(), MagicMock()]
+        mock_evaluation_interpreter = MagicMock(spec=ILeanEvaluationInterpreter)
+        mock_evaluation_interpreter.is_timeout.return_value = False
+        mock_evaluation_interpreter.is_transient_error.return_value = False
+        mock_evaluation_interpreter.is_proof_state_unavailable.return_value = True
+        mock_evaluation_interpreter.is_theorem_solved.return_value = True
+
+        actual = LeanUtilities.build_formatted_programs_from_proof_states(
+            ["theorem a : b := by", "theorem c : d := by"], [LeanProofState(0, 1), None], ["simp", "rfl"],
+            mock_evaluator, mock_evaluation_interpreter
+        )
+
+        self.assertEqual([(LeanUtilities.PROVED_FORMATTED_PROGRAM, None), (LeanUtilities.PROVED_FORMATTED_PROGRAM, None)],
+                         actual)
+        mock_evaluator.evaluate_many.assert_called_once_with(["theorem a : b := by\nsimp", "theorem c : d := by\nrfl"])
+
     def test_extract_theorem_statement_returns_none_if_no_theorem(self):
         actual = LeanUtilities.extract_theorem_statement("no theorem here")
         self.assertIsNone(actual)
 
+    def test_extract_theorem_statement_with_header_keeps_header_lines_missing_from_env_init_code(self):
+        full_code = """import Mathlib
+import Mathlib.Data.Real.Sqrt
+open Finset
+theorem my_theorem (n : ℕ) : ∑ i in range n, 0 = 0 := by
+simp"""
+
+        actual = LeanUtilities.extract_theorem_statement_with_header(full_code)
+        self.assertEqual("import Mathlib.Data.Real.Sqrt\nopen Finset\n"
+                         "theorem my_theorem (n : ℕ) : ∑ i in range n, 0 = 0 := by", actual)
+
+    def test_extract_theorem_statement_with_header_returns_only_theorem_for_default_header(self):
+        full_code = """import Mathlib
+theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by
+linarith"""
+
+        actual = LeanUtilities.extract_theorem_statement_with_header(full_code)
+        self.assertEqual("theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by", actual)
+
+    def test_normalize_theorem_statement_ignores_theorem_name_and_whitespace(self):
+        self.assertEqual("theorem (x : Nat) : x = x := by",
+                         LeanUtilities.normalize_theorem_statement("theorem my_theorem  (x : Nat) :\n x = x := by"))
+
+    def test_normalize_theorem_statement_ignores_theorem_name_after_header(self):
+        first_statement = "import Mathlib.Data.Real.Sqrt\nopen Real\ntheorem first (x : ℝ) : √(x ^ 2) = |x| := by"
+        second_statement = "import  Mathlib.Data.Real.Sqrt\nopen Real\n\ntheorem second (x : ℝ) : √(x ^ 2) = |x| := by"
+        other_header_statement = "open Real\ntheorem first (x : ℝ) : √(x ^ 2) = |x| := by"
+
+        self.assertEqual("import Mathlib.Data.Real.Sqrt\nopen Real\ntheorem (x : ℝ) : √(x ^ 2) = |x| := by",
+                         LeanUtilities.normalize_theorem_statement(first_statement))
+        self.assertEqual(LeanUtilities.normalize_theorem_statement(first_statement),
+                         LeanUtilities.normalize_theorem_statement(second_statement))
+        self.assertNotEqual(LeanUtilities.normalize_theorem_statement(first_statement),
+                            LeanUtilities.normalize_theorem_statement(other_header_statement))
+
     def test_extract_theorem_statement_returns_theorem_if_it_exists(self):
         full_code = """import Mathlib
 theorem my_theorem (x : Nat) (h : x = 2 * 3) : x + 1 = 7 := by
@@ -1,9 +1,11 @@
-from sqlalchemy import Engine, select
+import time
+
+from sqlalchemy import Engine, select, func, delete, inspect, text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 
 from domain.EasyLogger import EasyLogger
-from repository.orm.Entities import ProofEntity, LanguageModelEntity, FormalizationEntity
+from repository.orm.Entities import ProofEntity, LanguageModelEntity, FormalizationEntity, TacticOutcomeEntity
 
 from service.InformalProofSearchResult import InformalProofSearchResult
 
@@ -66,14 +68,23 @@ class TheoremRepository:
         finally:
             session.close()
 
-    def add_incomplete_proof(self, theorem: str, user_id: str, did_user_provide_partial_proof: bool) -> int:
+    def add_incomplete_proof(
+            self,
+            theorem: str,
+            user_id: str,
+            did_user_provide_partial_proof: bool,
+            model_name: str | None = None,
+            normalized_statement_hash: str | None = None
+    ) -> int:
         proof = ProofEntity(
             original_theorem_statement=theorem,
             formal_proof="",
             did_user_provide_partial_proof=did_user_provide_partial_proof,
             user_id=user_id,
             statement_formalization_id=None,
-            proof_formalization_id=None
+            proof_formalization_id=None,
+            model_name=model_name,
+            normalized_statement_hash=normalized_statement_hash
         )
         session = self.__session_local()
 
@@ -89,6 +100,54 @@ class TheoremRepository:
 
         return proof.proof_id
 
+    def add_complete_proof(
+            self,
+            theorem: str,
+            user_id: str,
+            model_name: str,
+            normalized_statement_hash: str,
+            formal_proof: str
+    ) -> int:
+        proof = ProofEntity(
+            original_theorem_statement=theorem,
+            formal_proof=formal_proof,
+            did_user_provide_partial_proof=False,
+            user_id=user_id,
+            statement_formalization_id=None,
+            proof_formalization_id=None,
+            successful=True,
+            model_name=model_name,
+            normalized_statement_hash=normalized_statement_hash
+        )
+        session = self.__session_local()
+
+        try:
+            session.add(proof)
+            session.commit()
+            session.refresh(proof)
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+            return TheoremRepository.INVALID_ID
+        finally:
+            session.close()
+
+        return proof.proof_id
+
+    def find_successful_proof(self, normalized_statement_hash: str, model_name: str) -> ProofEntity | None:
+        session = self.__session_local()
+        try:
+            statement = select(ProofEntity).where(
+                ProofEntity.normalized_statement_hash == normalized_statement_hash,
+                ProofEntity.model_name == model_name,
+                ProofEntity.successful.is_(True)
+            ).limit(1)
+            return session.execute(statement).scalar()
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+            return None
+        finally:
+            session.close()
+
     def add_incomplete_informal_proof(self, user_id: str, informal_theorem: str) -> int:
         proof = ProofEntity(
             original_theorem_statement=informal_theorem,
@@ -112,10 +171,20 @@ class TheoremRepository:
 
         return proof.proof_id
 
-    def add_formalization(self, informal_text: str, formal_text: str) -> int:
+    def add_formalization(
+            self,
+            informal_text: str,
+            formal_text: str,
+            informal_text_hash: str | None = None,
+            formal_text_hash: str | None = None,
+            is_proof: bool = False
+    ) -> int:
         formalization = FormalizationEntity(
             informal_text=informal_text,
-            formal_text=formal_text
+            formal_text=formal_text,
+            informal_text_hash=informal_text_hash,
+            formal_text_hash=formal_text_hash,
+            is_proof=is_proof
         )
         session = self.__session_local()
 
@@ -149,7 +218,27 @@ class TheoremRepository:
         finally:
             session.close()
 
-    def update_complete_proof(self, proof_id, proof: str, successful: bool) -> None:
+    def find_formal_statement(self, informal_text_hash: str) -> str | None:
+        """
+        Returns the latest non-empty formalization of the theorem statement with this hash.
+        """
+        return self.__find_formalization_text(
+            FormalizationEntity.formal_text,
+            FormalizationEntity.informal_text_hash == informal_text_hash,
+            FormalizationEntity.is_proof.is_(False)
+        )
+
+    def find_informal_proof(self, formal_text_hash: str) -> str | None:
+        """
+        Returns the latest non-empty deformalization of the formal proof with this hash.
+        """
+        return self.__find_formalization_text(
+            FormalizationEntity.informal_text,
+            FormalizationEntity.formal_text_hash == formal_text_hash,
+            FormalizationEntity.is_proof.is_(True)
+        )
+
+    def update_complete_proof(self, proof_id, proof: str, successful: bool, search_trace: str | None = None) -> None:
         session = self.__session_local()
 
         try:
@@ -160,6 +249,7 @@ class TheoremRepository:
                 raise ValueError(f"Proof with id={proof_id} does not exist")
             old_proof_entity.formal_proof = proof
             old_proof_entity.successful = successful
+            old_proof_entity.search_trace = search_trace
 
             session.commit()
         except SQLAlchemyError as error:
@@ -173,7 +263,8 @@ class TheoremRepository:
             informal_proof_search_result: InformalProofSearchResult,
             statement_formalization_id: int,
             proof_deformalization_id: int,
-            informal_theorem: str
+            informal_theorem: str,
+            search_trace: str | None = None
     ):
         session = self.__session_local()
 
@@ -189,10 +280,149 @@ class TheoremRepository:
             old_proof_entity.proof_formalization_id = proof_deformalization_id
             old_proof_entity.original_theorem_statement = informal_theorem
             old_proof_entity.statement_formalization_id = statement_formalization_id
+            old_proof_entity.search_trace = search_trace
+
+            session.commit()
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+        finally:
+            session.close()
+
+    def upgrade_proof_table(self):
+        """
+        Adds the columns and indexes of ProofEntity which are missing in databases created before they existed.
+        Safe to call on every start.
+        """
+        self.__add_missing_columns(ProofEntity, ["model_name", "normalized_statement_hash", "search_trace"])
+        self.__create_missing_indexes(ProofEntity)
+
+    def upgrade_formalization_table(self):
+        """
+        Like upgrade_proof_table, for the columns and indexes of FormalizationEntity.
+        """
+        self.__add_missing_columns(FormalizationEntity, ["informal_text_hash", "formal_text_hash", "is_proof"])
+        self.__create_missing_indexes(FormalizationEntity)
 
+    def upgrade_language_model_table(self):
+        """
+        Like upgrade_proof_table, for the columns of LanguageModelEntity.
+        """
+        self.__add_missing_columns(LanguageModelEntity, ["merge_lora", "precision", "draft_model_name"])
+
+    def create_tactic_outcome_table(self):
+        try:
+            TacticOutcomeEntity.__table__.create(self.__db_engine, checkfirst=True)
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+
+    def get_tactic_outcomes(self, outcome_keys: list[str]) -> dict[str, str]:
+        """
+        Returns the stored outcomes among outcome_keys and marks them as recently used.
+        """
+        if not outcome_keys:
+            return dict()
+
+        session = self.__session_local()
+        try:
+            statement = select(TacticOutcomeEntity).where(TacticOutcomeEntity.outcome_key.in_(outcome_keys))
+            tactic_outcomes = [row[0] for row in session.execute(statement).all()]
+            outcome_key_to_outcome = {tactic_outcome.outcome_key: tactic_outcome.outcome
+                                      for tactic_outcome in tactic_outcomes}
+
+            last_used_at = time.time()
+            for tactic_outcome in tactic_outcomes:
+                tactic_outcome.last_used_at = last_used_at
             session.commit()
+
+            return outcome_key_to_outcome
         except SQLAlchemyError as error:
             self.__logger.error(f"SQL Alchemy error: {error}.")
+            return dict()
         finally:
             session.close()
 
+    def add_tactic_outcomes(self, model_name: str, outcome_key_to_outcome: dict[str, str]) -> int:
+        """
+        Stores the outcomes whose key is not stored yet and returns how many were stored.
+        """
+        if not outcome_key_to_outcome:
+            return 0
+
+        session = self.__session_local()
+        try:
+            existing_keys_statement = select(TacticOutcomeEntity.outcome_key).where(
+                TacticOutcomeEntity.outcome_key.in_(list(outcome_key_to_outcome.keys()))
+            )
+            existing_keys = {row[0] for row in session.execute(existing_keys_statement).all()}
+
+            last_used_at = time.time()
+            new_tactic_outcomes = [
+                TacticOutcomeEntity(outcome_key=outcome_key, model_name=model_name, outcome=outcome,
+                                    last_used_at=last_used_at)
+                for outcome_key, outcome in outcome_key_to_outcome.items() if outcome_key not in existing_keys
+            ]
+            session.add_all(new_tactic_outcomes)
+            session.commit()
+            return len(new_tactic_outcomes)
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+            return 0
+        finally:
+            session.close()
+
+    def trim_tactic_outcomes(self, maximum_entries: int):
+        """
+        Evicts the least recently used outcomes while there are more than maximum_entries.
+        """
+        session = self.__session_local()
+        try:
+            count_statement = select(func.count()).select_from(TacticOutcomeEntity)
+            number_of_entries = session.execute(count_statement).scalar()
+            if number_of_entries > maximum_entries:
+                least_recently_used_ids = select(TacticOutcomeEntity.tactic_outcome_id).order_by(
+                    TacticOutcomeEntity.last_used_at
+                ).limit(number_of_entries - maximum_entries)
+                session.execute(delete(TacticOutcomeEntity).where(
+                    TacticOutcomeEntity.tactic_outcome_id.in_(least_recently_used_ids)
+                ))
+
+            session.commit()
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+        finally:
+            session.close()
+
+    def __add_missing_columns(self, entity, column_names: list[str]):
+        table = entity.__table__
+        try:
+            existing_column_names = {column["name"] for column in inspect(self.__db_engine).get_columns(table.name)}
+            with self.__db_engine.begin() as connection:
+                for column_name in column_names:
+                    if column_name in existing_column_names:
+                        continue
+                    column_type = table.columns[column_name].type.compile(dialect=self.__db_engine.dialect)
+                    self.__logger.info(f"Will add the column {column_name} to the table {table.name}")
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_name} {column_type}"))
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+
+    def __create_missing_indexes(self, entity):
+        try:
+            for index in entity.__table__.indexes:
+                index.create(self.__db_engine, checkfirst=True)
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+
+    def __find_formalization_text(self, text_column, *conditions) -> str | None:
+        session = self.__session_local()
+        try:
+            statement = select(text_column).where(
+                *conditions,
+                text_column != ""
+            ).order_by(FormalizationEntity.formalization_id.desc()).limit(1)
+            return session.execute(statement).scalar()
+        except SQLAlchemyError as error:
+            self.__logger.error(f"SQL Alchemy error: {error}.")
+            return None
+        finally:
+            session.close()
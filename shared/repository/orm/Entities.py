@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -12,6 +12,11 @@ class LanguageModelEntity(Base):
     base_model_name = Column(String)
     used_lora = Column(Boolean)
     hf_path = Column(String)
+    merge_lora = Column(Boolean, default=False)
+    # fp32, fp16, bf16 or int8, see ModelPrecision; null keeps the default of the model factory
+    precision = Column(String, nullable=True)
+    # model_name of a smaller model with the same tokenizer, used for speculative decoding
+    draft_model_name = Column(String, nullable=True)
 
 class FormalizationEntity(Base):
     __tablename__ = 'formalization'
@@ -19,6 +24,10 @@ class FormalizationEntity(Base):
     formalization_id = Column(Integer, primary_key=True, autoincrement=True)
     informal_text = Column(String)
     formal_text = Column(String)
+    informal_text_hash = Column(String(64), index=True)
+    formal_text_hash = Column(String(64), index=True)
+    # False for theorem statement formalizations, True for proof deformalizations
+    is_proof = Column(Boolean, default=False)
 
 
 class ProofEntity(Base):
@@ -32,3 +41,20 @@ class ProofEntity(Base):
     statement_formalization_id = Column(Integer, ForeignKey('formalization.formalization_id'), nullable=True)
     proof_formalization_id = Column(Integer, ForeignKey('formalization.formalization_id'), nullable=True)
     successful = Column(Boolean)
+    model_name = Column(String, nullable=True)
+    normalized_statement_hash = Column(String(64), nullable=True)
+    search_trace = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index('ix_proof_normalized_statement_hash_model_name', 'normalized_statement_hash', 'model_name'),
+    )
+
+
+class TacticOutcomeEntity(Base):
+    __tablename__ = 'tactic_outcome'
+
+    tactic_outcome_id = Column(Integer, primary_key=True, autoincrement=True)
+    outcome_key = Column(String(64), unique=True, index=True)
+    model_name = Column(String)
+    outcome = Column(String)
+    last_used_at = Column(Float, index=True)
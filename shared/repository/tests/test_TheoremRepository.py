@@ -1,8 +1,9 @@
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
-from sqlalchemy import Engine
+from sqlalchemy import Engine, create_engine, inspect, text
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import StaticPool
 
 from domain.EasyLogger import EasyLogger
 from repository.TheoremRepository import TheoremRepository
@@ -187,4 +188,120 @@ class TestTheoremRepository(TestCase):
         )
         self.assertEqual(expected_formalization_entity, response)
 
+    def test_get_tactic_outcomes_returns_added_outcomes(self):
+        theorem_repository = TheoremRepository(self.__build_in_memory_db_engine(), EasyLogger())
+        theorem_repository.create_tactic_outcome_table()
 
+        number_of_new_entries = theorem_repository.add_tactic_outcomes(
+            "model1", {"first": "error", "second": "[GOAL]a[PROOFSTEP]"}
+        )
+
+        self.assertEqual(2, number_of_new_entries)
+        self.assertEqual(0, theorem_repository.add_tactic_outcomes("model1", {"first": "error"}))
+        self.assertEqual({"second": "[GOAL]a[PROOFSTEP]"},
+                         theorem_repository.get_tactic_outcomes(["second", "third"]))
+
+    @patch("repository.TheoremRepository.time")
+    def test_trim_tactic_outcomes_evicts_least_recently_used_outcomes(self, mock_time: MagicMock):
+        theorem_repository = TheoremRepository(self.__build_in_memory_db_engine(), EasyLogger())
+        theorem_repository.create_tactic_outcome_table()
+
+        mock_time.time.return_value = 1
+        theorem_repository.add_tactic_outcomes("model1", {"first": "a", "second": "b"})
+        mock_time.time.return_value = 2
+        theorem_repository.get_tactic_outcomes(["first"])
+        mock_time.time.return_value = 3
+        theorem_repository.add_tactic_outcomes("model1", {"third": "c"})
+        theorem_repository.trim_tactic_outcomes(2)
+
+        self.assertEqual({"first": "a", "third": "c"},
+                         theorem_repository.get_tactic_outcomes(["first", "second", "third"]))
+
+    def test_find_successful_proof_returns_only_successful_proofs_of_same_model(self):
+        db_engine = self.__build_in_memory_db_engine()
+        ProofEntity.__table__.create(db_engine)
+        theorem_repository = TheoremRepository(db_engine, EasyLogger())
+
+        unsuccessful_proof_id = theorem_repository.add_incomplete_proof("theorem a : 1 = 1 := by", "user", False,
+                                                                        "model1", "hash")
+        theorem_repository.update_complete_proof(unsuccessful_proof_id, "theorem a : 1 = 1 := by\nsimp", False)
+        self.assertIsNone(theorem_repository.find_successful_proof("hash", "model1"))
+
+        theorem_repository.add_complete_proof("theorem a : 1 = 1 := by", "user", "model2", "hash",
+                                              "theorem a : 1 = 1 := by\nrfl")
+        self.assertIsNone(theorem_repository.find_successful_proof("hash", "model1"))
+        self.assertEqual("theorem a : 1 = 1 := by\nrfl",
+                         theorem_repository.find_successful_proof("hash", "model2").formal_proof)
+
+    def test_find_formal_statement_and_informal_proof_use_only_matching_non_empty_rows(self):
+        db_engine = self.__build_in_memory_db_engine()
+        FormalizationEntity.__table__.create(db_engine)
+        theorem_repository = TheoremRepository(db_engine, EasyLogger())
+
+        theorem_repository.add_formalization("1 = 1", "", "informal_hash", "empty_hash")
+        self.assertIsNone(theorem_repository.find_formal_statement("informal_hash"))
+
+        theorem_repository.add_formalization("1 = 1", "theorem a : 1 = 1 := by", "informal_hash", "statement_hash")
+        theorem_repository.add_formalization("By reflexivity.", "theorem a : 1 = 1 := by\nrfl", "proof_hash",
+                                             "formal_proof_hash", is_proof=True)
+
+        self.assertEqual("theorem a : 1 = 1 := by", theorem_repository.find_formal_statement("informal_hash"))
+        self.assertIsNone(theorem_repository.find_formal_statement("proof_hash"))
+        self.assertEqual("By reflexivity.", theorem_repository.find_informal_proof("formal_proof_hash"))
+        self.assertIsNone(theorem_repository.find_informal_proof("statement_hash"))
+
+    def test_upgrade_proof_table_adds_missing_columns_and_index_to_existing_table(self):
+        db_engine = self.__build_in_memory_db_engine()
+        with db_engine.begin() as connection:
+            connection.execute(text("CREATE TABLE proof (proof_id INTEGER PRIMARY KEY, original_theorem_statement "
+                                    "VARCHAR, formal_proof VARCHAR, did_user_provide_partial_proof BOOLEAN, "
+                                    "user_id VARCHAR, statement_formalization_id INTEGER, "
+                                    "proof_formalization_id INTEGER, successful BOOLEAN)"))
+            connection.execute(text("INSERT INTO proof (proof_id, formal_proof, successful) "
+                                    "VALUES (1, 'theorem a : 1 = 1 := by\nrfl', 1)"))
+        theorem_repository = TheoremRepository(db_engine, EasyLogger())
+
+        theorem_repository.upgrade_proof_table()
+        theorem_repository.upgrade_proof_table()
+
+        column_names = {column["name"] for column in inspect(db_engine).get_columns("proof")}
+        self.assertTrue({"model_name", "normalized_statement_hash", "search_trace"} <= column_names)
+        self.assertIn("ix_proof_normalized_statement_hash_model_name",
+                      {index["name"] for index in inspect(db_engine).get_indexes("proof")})
+        self.assertEqual("theorem a : 1 = 1 := by\nrfl", theorem_repository.retrieve_proof(1).formal_proof)
+
+    def test_upgrade_formalization_table_adds_missing_columns_and_indexes_to_existing_table(self):
+        db_engine = self.__build_in_memory_db_engine()
+        with db_engine.begin() as connection:
+            connection.execute(text("CREATE TABLE formalization (formalization_id INTEGER PRIMARY KEY, "
+                                    "informal_text VARCHAR, formal_text VARCHAR)"))
+        theorem_repository = TheoremRepository(db_engine, EasyLogger())
+
+        theorem_repository.upgrade_formalization_table()
+        theorem_repository.upgrade_formalization_table()
+
+        theorem_repository.add_formalization("1 = 1", "theorem a : 1 = 1 := by", "informal_hash", "statement_hash")
+        self.assertEqual("theorem a : 1 = 1 := by", theorem_repository.find_formal_statement("informal_hash"))
+        self.assertTrue({"ix_formalization_informal_text_hash", "ix_formalization_formal_text_hash"} <=
+                        {index["name"] for index in inspect(db_engine).get_indexes("formalization")})
+
+    def test_upgrade_language_model_table_adds_missing_columns_to_existing_table(self):
+        db_engine = self.__build_in_memory_db_engine()
+        with db_engine.begin() as connection:
+            connection.execute(text("CREATE TABLE language_model (model_id INTEGER PRIMARY KEY, model_name VARCHAR "
+                                    "UNIQUE, base_model_name VARCHAR, used_lora BOOLEAN, hf_path VARCHAR)"))
+            connection.execute(text("INSERT INTO language_model (model_id, model_name, base_model_name, used_lora, "
+                                    "hf_path) VALUES (1, 'model1', 'EleutherAI/pythia-160m', 0, 'user/model1')"))
+        theorem_repository = TheoremRepository(db_engine, EasyLogger())
+        self.assertEqual([], theorem_repository.get_language_models())
+
+        theorem_repository.upgrade_language_model_table()
+        theorem_repository.upgrade_language_model_table()
+
+        language_models = theorem_repository.get_language_models()
+        self.assertEqual(["model1"], [language_model.model_name for language_model in language_models])
+        self.assertFalse(language_models[0].merge_lora)
+
+    @staticmethod
+    def __build_in_memory_db_engine() -> Engine:
+        return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)